@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import socket
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -60,6 +62,8 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "Aaarohan_Backend.urls"
 CORS_ALLOW_ALL_ORIGINS = True  # ⚠️ Dev only, later restrict to your frontend domain
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'ETag']
 
 TEMPLATES = [
     {
@@ -134,10 +138,16 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from role/athlete claims; see authapp/authentication.py
+        'authapp.authentication.ClaimsJWTAuthentication',
     )
 }
 
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'authapp.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'authapp.authentication.ClaimsTokenRefreshSerializer',
+}
+
 # Cloudinary Configuration
 import cloudinary
 import cloudinary.uploader
@@ -157,13 +167,53 @@ cloudinary.config(
     secure=True
 )
 
+# Leaderboard ranking backend (see authapp/ranking.py)
+RANKING_BACKEND = config('RANKING_BACKEND', default='authapp.ranking.InMemoryRankingBackend')
+RANKING_WARM_ON_STARTUP = config('RANKING_WARM_ON_STARTUP', default=True, cast=bool)
+RANKING_SYNC_INTERVAL = config('RANKING_SYNC_INTERVAL', default=5, cast=int)  # seconds
+RANKING_RELOAD_INTERVAL = config('RANKING_RELOAD_INTERVAL', default=300, cast=int)  # seconds
+# Run the rank job inside web workers every N seconds (0: only via manage.py compute_ranks)
+RANK_JOB_INTERVAL = config('RANK_JOB_INTERVAL', default=0, cast=int)  # seconds
+
 # Media files
 MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Performance media upload pipeline (see authapp/media.py)
+# Use authapp.media.LocalMediaBackend to keep uploads on local disk
+MEDIA_UPLOAD_BACKEND = config('MEDIA_UPLOAD_BACKEND', default='authapp.media.CloudinaryMediaBackend')
+MEDIA_STAGING_ROOT = config('MEDIA_STAGING_ROOT', default=str(BASE_DIR / 'media_staging'))
+# Uploaders only claim media staged under the same name; give every host the same
+# name only when MEDIA_STAGING_ROOT is a volume they all mount
+MEDIA_STAGING_HOST = config('MEDIA_STAGING_HOST', default=socket.gethostname())
+MEDIA_UPLOAD_MAX_ATTEMPTS = config('MEDIA_UPLOAD_MAX_ATTEMPTS', default=5, cast=int)
+
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+# Multipart files above this size spool to a temporary file instead of worker memory;
+# large videos should use the chunked upload endpoints
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
+
+# Chunked upload sessions (see authapp/media.py)
+UPLOAD_CHUNK_SIZE = config('UPLOAD_CHUNK_SIZE', default=5242880, cast=int)  # 5MB
+UPLOAD_MAX_FILE_SIZE = config('UPLOAD_MAX_FILE_SIZE', default=524288000, cast=int)  # 500MB
+UPLOAD_SESSION_TTL_HOURS = config('UPLOAD_SESSION_TTL_HOURS', default=24, cast=int)
+
+# Idempotency-Key replay window (see authapp/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+
+# JWT revocation list sync (see authapp/revocation.py)
+TOKEN_REVOCATION_SYNC_INTERVAL = config('TOKEN_REVOCATION_SYNC_INTERVAL', default=5, cast=int)  # seconds
+TOKEN_REVOCATION_RELOAD_INTERVAL = config('TOKEN_REVOCATION_RELOAD_INTERVAL', default=600, cast=int)  # seconds
+
+# Lifetime of emailed one-time tokens (see authapp/one_time_tokens.py)
+PASSWORD_RESET_TOKEN_TTL_HOURS = config('PASSWORD_RESET_TOKEN_TTL_HOURS', default=1, cast=int)
+EMAIL_VERIFICATION_TOKEN_TTL_HOURS = config('EMAIL_VERIFICATION_TOKEN_TTL_HOURS', default=48, cast=int)
+
+# Login password checks (see authapp/passwords.py)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)  # threads under ASGI, 0 = one per CPU
+PASSWORD_HASH_METRICS_INTERVAL = config('PASSWORD_HASH_METRICS_INTERVAL', default=60, cast=int)  # seconds, 0 = off
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AuthappConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authapp"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .ranking import connect_warmup
+        from .jobs import connect_rank_job
+        connect_warmup()
+        connect_rank_job()
@@ -0,0 +1,102 @@
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import User, Athlete
+from .revocation import get_revocation_list
+
+# Stateless JWT authentication
+#
+# Tokens carry the user's role and athlete id as claims, so
+# ClaimsJWTAuthentication builds request.user from the token alone: a User
+# instance with only id, role and is_active loaded, whose athlete relation is
+# preset to an id-only Athlete (or to none). Role checks, hasattr(user,
+# 'athlete'), filtering by the user or athlete and assigning them to foreign
+# keys then cost no query. Other fields load on first access like any
+# deferred field; views that need the whole row call full_user().
+#
+# Claims are stamped when tokens are issued and re-read from the database on
+# every refresh, so role changes, new athlete profiles and deactivations
+# apply within one access token lifetime. Tokens issued without the claims
+# take the regular database lookup. Revoked tokens (password resets,
+# deactivations, logouts) are rejected from the per-worker revocation list,
+# which costs no query either (see revocation.py).
+
+ROLE_CLAIM = 'role'
+ATHLETE_CLAIM = 'athlete_id'
+
+
+def stamp_claims(token, user):
+    athlete = getattr(user, 'athlete', None)
+    token[ROLE_CLAIM] = user.role
+    token[ATHLETE_CLAIM] = athlete.pk if athlete else None
+    return token
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        return stamp_claims(super().for_user(user), user)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        if get_revocation_list().is_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken("Token has been revoked")
+        data = super().validate(attrs)
+        # The refresh token's claims may be stale; restamp the new access token from the database
+        access = AccessToken(data['access'])
+        user = User.objects.select_related('athlete').filter(pk=access[api_settings.USER_ID_CLAIM]).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("User not found or inactive", code='user_inactive')
+        data['access'] = str(stamp_claims(access, user))
+        return data
+
+
+def _partial_instance(model, values):
+    # from_db takes the loaded values in model field order; every other field is deferred
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def claims_user(token):
+    """Request user built from token claims without a query"""
+    user = _partial_instance(User, {
+        'id': token[api_settings.USER_ID_CLAIM], 'role': token[ROLE_CLAIM], 'is_active': True
+    })
+    athlete = None
+    if token[ATHLETE_CLAIM]:
+        athlete = _partial_instance(Athlete, {'id': token[ATHLETE_CLAIM], 'user_id': user.pk})
+        Athlete.user.field.set_cached_value(athlete, user)
+    # Caching None makes user.athlete raise RelatedObjectDoesNotExist without a query
+    User.athlete.related.set_cached_value(user, athlete)
+    return user
+
+
+def full_user(user):
+    """The complete User row behind a request user that may have been built from claims"""
+    if not user.get_deferred_fields():
+        return user
+    return User.objects.get(pk=user.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if get_revocation_list().is_revoked(validated_token):
+            raise InvalidToken("Token has been revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token or ATHLETE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        return claims_user(validated_token)
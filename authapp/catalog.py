@@ -0,0 +1,57 @@
+import threading
+import uuid
+from .models import SystemSettings, Test
+
+# Test catalog cache
+#
+# The active test catalog changes rarely but is read on every app start, so
+# each worker keeps it serialized in memory together with the catalog
+# version it was built from. The version is a SystemSettings row that every
+# Test save or delete replaces (see signals), in the same transaction as the
+# change. A request reads that one row; the catalog is only queried and
+# serialized again when the version differs from the cached one.
+#
+# ETags derive from the version, so clients revalidating an unchanged
+# catalog get a 304 without the catalog being touched at all. QuerySet
+# .update() on Test skips signals; call bump_catalog_version() after one.
+
+CATALOG_VERSION_KEY = 'test_catalog_version'
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def catalog_version():
+    version = SystemSettings.objects.filter(key=CATALOG_VERSION_KEY).values_list('value', flat=True).first()
+    return version or '0'
+
+
+def bump_catalog_version():
+    SystemSettings.objects.update_or_create(
+        key=CATALOG_VERSION_KEY,
+        defaults={'value': uuid.uuid4().hex, 'description': 'Changes whenever a fitness test is saved or deleted'}
+    )
+
+
+def catalog_etag(version, test_id=None):
+    return f'"tests-{version}"' if test_id is None else f'"tests-{version}-{test_id}"'
+
+
+def get_catalog():
+    """(version, [serialized active tests], {test id: serialized test}) for the current version"""
+    global _catalog
+    # Read before the tests: data newer than its version is only rebuilt once more, never served stale
+    version = catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog[0] != version:
+        # serializers imports signals, which import this module
+        from .serializers import TestSerializer
+
+        with _catalog_lock:
+            catalog = _catalog
+            if catalog is None or catalog[0] != version:
+                tests = list(TestSerializer(Test.objects.filter(is_active=True), many=True).data)
+                catalog = (version, tests, {test['id']: test for test in tests})
+                _catalog = catalog
+    return catalog
+
@@ -0,0 +1,258 @@
+from bisect import bisect_right
+from django.db import transaction
+from django.db.models import Min, Max
+from .models import Performance, TestDistribution
+
+# Per-test result distributions
+#
+# Each test keeps a t-digest of its verified values for percentile and
+# quantile queries, plus a fixed-bin histogram for charts. Both live in one
+# TestDistribution row, are folded in incrementally as performances get
+# verified and answer reads without touching Performance.
+#
+# A t-digest cannot forget a value, so withdrawing a verified result only
+# marks the row stale; rebuild_distributions recomputes stale rows. The
+# histogram range starts out provisional: a value outside it widens the
+# range and re-bins the digest's centroids, which approximates the counts,
+# so that also marks the row stale.
+
+DIGEST_COMPRESSION = 100
+HISTOGRAM_BINS = 20
+# Share of the span added beyond a new extreme, so records do not widen the range every time
+RANGE_HEADROOM = 0.1
+REBUILD_BATCH_SIZE = 10000
+
+
+class TDigest:
+    """Merging t-digest over (mean, weight) centroids kept sorted by mean"""
+
+    def __init__(self, centroids=None, compression=DIGEST_COMPRESSION):
+        self.centroids = [list(centroid) for centroid in centroids or []]
+        self.compression = compression
+        self.total = sum(weight for _, weight in self.centroids)
+
+    def update(self, values):
+        """Fold an iterable of values in; sorted batches merge in one pass"""
+        batch = [[value, 1] for value in values]
+        if not batch:
+            return
+        self.centroids = sorted(self.centroids + batch, key=lambda centroid: centroid[0])
+        self.total += len(batch)
+        self._compress()
+
+    def add(self, value):
+        self.update([value])
+
+    def _compress(self):
+        # A centroid at quantile q may hold at most 4 * n * q * (1 - q) / compression
+        merged = []
+        cumulative = 0
+        mean, weight = self.centroids[0]
+        for next_mean, next_weight in self.centroids[1:]:
+            proposed = weight + next_weight
+            q = (cumulative + proposed / 2) / self.total
+            if proposed <= max(1, 4 * self.total * q * (1 - q) / self.compression):
+                mean += (next_mean - mean) * next_weight / proposed
+                weight = proposed
+            else:
+                merged.append([mean, weight])
+                cumulative += weight
+                mean, weight = next_mean, next_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def _points(self, low, high):
+        # Interpolation knots: (value, mass at or below value)
+        points = [(low, 0)]
+        cumulative = 0
+        for mean, weight in self.centroids:
+            points.append((mean, cumulative + weight / 2))
+            cumulative += weight
+        points.append((high, cumulative))
+        return points
+
+    def cdf(self, value, low, high):
+        """Fraction of values at or below `value`; `low`/`high` are the exact extremes"""
+        if not self.total or value < low:
+            return 0.0
+        if value >= high:
+            return 1.0
+        points = self._points(low, high)
+        index = bisect_right([point[0] for point in points], value)
+        (x0, y0), (x1, y1) = points[index - 1], points[index]
+        mass = y0 if x1 == x0 else y0 + (y1 - y0) * (value - x0) / (x1 - x0)
+        return mass / self.total
+
+    def quantile(self, q, low, high):
+        if not self.total:
+            return None
+        points = self._points(low, high)
+        target = q * self.total
+        index = bisect_right([point[1] for point in points], target)
+        if index >= len(points):
+            return high
+        (x0, y0), (x1, y1) = points[index - 1], points[index]
+        return x0 if y1 == y0 else x0 + (x1 - x0) * (target - y0) / (y1 - y0)
+
+
+class Histogram:
+    """Fixed-width bins over [low, high]; values outside land in the end bins"""
+
+    def __init__(self, low, high, counts=None, bins=HISTOGRAM_BINS):
+        self.low = low
+        self.high = high
+        self.counts = list(counts) if counts else [0] * bins
+
+    def bin_of(self, value):
+        width = (self.high - self.low) / len(self.counts)
+        if width <= 0:
+            return 0
+        return min(max(int((value - self.low) / width), 0), len(self.counts) - 1)
+
+    def add(self, value, count=1):
+        self.counts[self.bin_of(value)] += count
+
+    def edges(self):
+        width = (self.high - self.low) / len(self.counts)
+        return [self.low + width * index for index in range(len(self.counts) + 1)]
+
+
+def _locked_distribution(test_id):
+    distribution, _ = TestDistribution.objects.select_for_update().get_or_create(test_id=test_id)
+    return distribution
+
+
+def record_verified_value(test_id, value):
+    """Fold a newly verified value into the test's digest and histogram"""
+    record_verified_values(test_id, [value])
+
+
+@transaction.atomic
+def record_verified_values(test_id, values):
+    """Fold a batch of newly verified values of one test in with a single row update"""
+    values = sorted(values)
+    if not values:
+        return
+    distribution = _locked_distribution(test_id)
+
+    digest = TDigest(distribution.digest)
+    digest.update(values)
+    distribution.digest = digest.centroids
+
+    if distribution.histogram_low is None:
+        # Provisional range until a rebuild calibrates it from real data
+        distribution.histogram_low, distribution.histogram_high = sorted((values[0] * 0.5, values[-1] * 1.5))
+    low, high = distribution.histogram_low, distribution.histogram_high
+    if values[0] < low or values[-1] > high:
+        # Clamping would pile these values into the end bins
+        histogram = _widened_histogram(digest, low, high, values[0], values[-1])
+        distribution.histogram_low, distribution.histogram_high = histogram.low, histogram.high
+        distribution.is_stale = True
+    else:
+        histogram = Histogram(low, high, distribution.histogram)
+        for value in values:
+            histogram.add(value)
+    distribution.histogram = histogram.counts
+
+    distribution.count += len(values)
+    distribution.min_value = values[0] if distribution.min_value is None else min(distribution.min_value, values[0])
+    distribution.max_value = values[-1] if distribution.max_value is None else max(distribution.max_value, values[-1])
+    distribution.save()
+
+
+def _widened_histogram(digest, low, high, smallest, largest):
+    """Histogram over [low, high] stretched past `smallest`/`largest`, filled from the digest"""
+    headroom = (max(high, largest) - min(low, smallest)) * RANGE_HEADROOM
+    if smallest < low:
+        low = smallest - headroom
+    if largest > high:
+        high = largest + headroom
+    histogram = Histogram(low, high)
+    for mean, weight in digest.centroids:
+        histogram.add(mean, weight)
+    return histogram
+
+
+@transaction.atomic
+def withdraw_verified_value(test_id, value):
+    """Account for a value that is no longer verified"""
+    distribution = _locked_distribution(test_id)
+    if distribution.histogram_low is not None:
+        histogram = Histogram(distribution.histogram_low, distribution.histogram_high, distribution.histogram)
+        histogram.add(value, -1)
+        distribution.histogram = histogram.counts
+    distribution.count = max(distribution.count - 1, 0)
+    distribution.is_stale = True
+    distribution.save()
+
+
+@transaction.atomic
+def rebuild_distribution(test_id, batch_size=REBUILD_BATCH_SIZE):
+    """Recompute a test's digest and histogram from its verified performances"""
+    distribution = _locked_distribution(test_id)
+    verified = Performance.objects.filter(test_id=test_id, status='VERIFIED').order_by()
+    bounds = verified.aggregate(low=Min('value'), high=Max('value'))
+
+    digest = TDigest()
+    histogram = Histogram(bounds['low'] or 0.0, bounds['high'] or 0.0)
+    count = 0
+    batch = []
+    for value in verified.values_list('value', flat=True).iterator(chunk_size=batch_size):
+        batch.append(value)
+        if len(batch) == batch_size:
+            count += _fold_batch(digest, histogram, batch)
+            batch = []
+    count += _fold_batch(digest, histogram, batch)
+
+    distribution.digest = digest.centroids
+    distribution.histogram_low = bounds['low']
+    distribution.histogram_high = bounds['high']
+    distribution.histogram = histogram.counts if count else []
+    distribution.count = count
+    distribution.min_value = bounds['low']
+    distribution.max_value = bounds['high']
+    distribution.is_stale = False
+    distribution.save()
+    return distribution
+
+
+def _fold_batch(digest, histogram, batch):
+    # Sorting first lets the digest merge the whole batch in a single pass
+    batch.sort()
+    digest.update(batch)
+    for value in batch:
+        histogram.add(value)
+    return len(batch)
+
+
+def describe_distribution(distribution, test, value=None):
+    """Percentile of `value` and summary of a test's verified results"""
+    low, high = distribution.min_value, distribution.max_value
+    digest = TDigest(distribution.digest)
+
+    data = {
+        "count": distribution.count,
+        "min": low,
+        "max": high,
+        "quantiles": {
+            f"p{int(q * 100)}": digest.quantile(q, low, high) if distribution.count else None
+            for q in (0.1, 0.25, 0.5, 0.75, 0.9)
+        },
+        "histogram": {
+            "edges": Histogram(distribution.histogram_low, distribution.histogram_high,
+                               distribution.histogram).edges() if distribution.histogram else [],
+            "counts": distribution.histogram
+        },
+        "isStale": distribution.is_stale
+    }
+
+    if value is not None:
+        percentile = None
+        if distribution.count:
+            below = digest.cdf(value, low, high)
+            # Share of verified results this value is better than
+            percentile = below if test.higher_is_better else 1.0 - below
+            percentile = round(percentile * 100, 2)
+        data["value"] = value
+        data["percentile"] = percentile
+    return data
@@ -0,0 +1,117 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+# Idempotency keys
+#
+# Clients on flaky networks send an Idempotency-Key header with writes they
+# may retry. The first request with a key reserves it, runs the view and
+# stores the response; any retry within the TTL gets that stored response
+# back without the view running again. Only successful responses are kept:
+# a failed request releases its key so the client can retry it.
+#
+# Keys are stored as a SHA-256 of (scope, user, key), so the table holds
+# fixed-size rows and never the client's raw key. Anonymous callers share
+# one user component, so each key also records an HMAC of the method, path
+# and body of its request: a key reused with a different request gets 422
+# instead of someone else's response. Views whose responses carry secrets
+# pass `store` to strip them before they are saved and `replay` to fill
+# them in again for the retry.
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def key_hash(scope, user, key):
+    user_id = user.pk if user.is_authenticated else ''
+    return hashlib.sha256(f'{scope}:{user_id}:{key}'.encode()).hexdigest()
+
+
+def request_fingerprint(request):
+    """HMAC of the request method, path, parsed body and uploaded file contents"""
+    fingerprint = salted_hmac('authapp.idempotency', f'{request.method} {request.path}', algorithm='sha256')
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    fingerprint.update(json.dumps(data, sort_keys=True, default=str).encode())
+    for name, files in sorted(request.FILES.lists()):
+        for uploaded_file in files:
+            fingerprint.update(name.encode())
+            for chunk in uploaded_file.chunks():
+                fingerprint.update(chunk)
+            uploaded_file.seek(0)
+    return fingerprint.hexdigest()
+
+
+def idempotent(scope, store=None, replay=None):
+    """Replay the stored response of a view for repeated Idempotency-Key headers
+
+    Goes below @api_view so the wrapped view receives the DRF request.
+    `store(data)` returns the part of a response body to keep and
+    `replay(request, data)` the body to send back from what was kept.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({
+                    "success": False,
+                    "message": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+                }, status=400)
+            
+            digest = key_hash(scope, request.user, key)
+            fingerprint = request_fingerprint(request)
+            now = timezone.now()
+            IdempotencyKey.objects.filter(key_hash=digest, expires_at__lte=now).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        key_hash=digest, scope=scope, request_hash=fingerprint,
+                        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                    )
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(key_hash=digest).first()
+                if record is not None and not constant_time_compare(record.request_hash, fingerprint):
+                    return Response({
+                        "success": False,
+                        "message": "This Idempotency-Key was already used with a different request"
+                    }, status=422)
+                if record is None or record.response_status is None:
+                    return Response({
+                        "success": False,
+                        "message": "A request with this Idempotency-Key is still being processed"
+                    }, status=409)
+                body = replay(request, record.response_body) if replay else record.response_body
+                response = Response(body, status=record.response_status)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+            if 200 <= response.status_code < 300:
+                record.response_status = response.status_code
+                record.response_body = store(response.data) if store else response.data
+                record.save(update_fields=['response_status', 'response_body'])
+            else:
+                record.delete()
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys():
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
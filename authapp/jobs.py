@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections
+from .leaderboard import recompute_ranks, purge_leaderboard_removals
+from .stats import compute_overall_ranks
+
+# Periodic jobs
+#
+# The rank job recomputes overall athlete ranks, corrects per-test
+# leaderboard ranks and purges old leaderboard tombstones. It runs from
+# `manage.py compute_ranks` (once, or in a loop with --every), or inside a
+# web worker when RANK_JOB_INTERVAL is set: a daemon thread started on the
+# worker's first request then runs it every RANK_JOB_INTERVAL seconds.
+# Every web worker starts its own thread, so set it on one deployment only
+# or use the command instead. Overall ranks and each test's leaderboard are
+# written under row locks, so overlapping runs wait for each other rather
+# than apply their rank shifts twice.
+
+logger = logging.getLogger(__name__)
+
+
+def run_rank_job():
+    """Returns (overall ranks changed, leaderboard ranks changed, seconds taken)"""
+    started = time.monotonic()
+    overall = compute_overall_ranks()
+    per_test = recompute_ranks()
+    purge_leaderboard_removals()
+    return overall, per_test, time.monotonic() - started
+
+
+def _rank_job_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            overall, per_test, elapsed = run_rank_job()
+            logger.info('Rank job: %s overall and %s leaderboard ranks changed in %.2fs', overall, per_test, elapsed)
+        except Exception:
+            logger.exception('Rank job failed')
+        finally:
+            close_old_connections()
+
+
+def start_rank_job(**kwargs):
+    request_started.disconnect(start_rank_job)
+    thread = threading.Thread(
+        target=_rank_job_loop, args=(settings.RANK_JOB_INTERVAL,), name='rank-job', daemon=True
+    )
+    thread.start()
+
+
+def connect_rank_job():
+    if getattr(settings, 'RANK_JOB_INTERVAL', 0) > 0:
+        request_started.connect(start_rank_job)
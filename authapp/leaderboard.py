@@ -0,0 +1,345 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Rank, RowNumber
+from django.utils import timezone
+from .models import Athlete, Test, Performance, LeaderboardEntry, LeaderboardRemoval
+from .pagination import keyset_filter
+from .stats import RANK_BATCH_SIZE, set_personal_best, set_test_bests, write_ranks
+
+# Leaderboard maintenance
+#
+# Ranks use competition ranking: an entry's rank is one plus the number of
+# entries with a strictly better best value, so ties share a rank. Keeping
+# that invariant only needs the entries between the old and the new value of
+# an athlete to be shifted, which is what refresh_leaderboard_entry does.
+#
+# Entries are compared on sort_key, the best value oriented by the test's
+# scoring direction, so a single ascending index serves every test.
+#
+# Each entry also carries the athlete dimensions boards can be segmented by,
+# with a (test, <dimension>..., sort_key) index per supported segment
+# (see SEGMENT_COMBINATIONS).
+#
+# Removing an entry also writes a LeaderboardRemoval tombstone (one without
+# an athlete for a rebuilt board), so workers caching boards in memory can
+# drop the entry on their next sync; the rank job purges old tombstones.
+#
+# recompute_ranks re-derives the stored ranks with RANK() and writes back
+# only the ranks that differ; the rank job runs it periodically as a safety
+# net behind the incremental shifts. It goes one test at a time, each in a
+# short transaction of its own, so writes to a test only ever wait for that
+# test's pass.
+
+SEGMENT_FILTERS = ['gender', 'state', 'district', 'category']
+
+# Far beyond any in-memory board's full reload interval
+REMOVAL_RETENTION = timedelta(days=1)
+
+# Filter combinations boards can be segmented by, each backed by a
+# (test, <columns>..., sort_key) index or the leading columns of one, so a
+# page only reads the segment's entries. Age groups are birth_year ranges
+# and sort their segment. District names repeat across states, so a
+# district needs its state. Other combinations are rejected.
+SEGMENT_COMBINATIONS = [
+    (),
+    ('gender',),
+    ('category',),
+    ('category', 'gender'),
+    ('state',),
+    ('state', 'district'),
+    ('state', 'gender'),
+    ('age_group',),
+    ('age_group', 'gender'),
+]
+
+# Total order of entries, best first; also the keyset used by cursors
+ENTRY_ORDERING = ['sort_key', 'achieved_at', 'id']
+
+# Columns of an entry value row as served by boards and ranking backends
+ENTRY_FIELDS = (
+    'id', 'athlete_id', 'rank', 'sort_key', 'best_value', 'achieved_at',
+    'athlete__first_name', 'athlete__last_name',
+    'athlete__state', 'athlete__district'
+)
+
+# Age groups follow the competition-year convention: an athlete's age is the
+# age they reach during the current calendar year. Bounds are inclusive.
+AGE_GROUPS = {
+    'U14': (None, 13),
+    'U16': (None, 15),
+    'U18': (None, 17),
+    'U20': (None, 19),
+    'SENIOR': (20, 34),
+    'MASTERS': (35, None),
+}
+
+
+def athlete_dimensions(athlete):
+    """Segment columns of a leaderboard entry for an athlete"""
+    return {
+        'gender': athlete.gender,
+        'state': athlete.state,
+        'district': athlete.district,
+        'category': athlete.category,
+        'birth_year': athlete.date_of_birth.year,
+    }
+
+
+def get_best_performance(test, athlete_id):
+    """Return the athlete's best verified performance for a test, or None"""
+    return Performance.objects.filter(
+        test_id=test.id, athlete_id=athlete_id, status='VERIFIED'
+    ).only('id', 'value', 'created_at').order_by(test.best_first(), 'created_at').first()
+
+
+def _lock_test(test_id):
+    # Rank shifts for one test must not interleave
+    return Test.objects.select_for_update().only('id', 'scoring_direction').get(pk=test_id)
+
+
+def _record_removal(test_id, athlete_id=''):
+    LeaderboardRemoval.objects.create(test_id=test_id, athlete_id=athlete_id)
+
+
+def purge_leaderboard_removals():
+    """Delete tombstones every in-memory board has long since reloaded past"""
+    deleted, _ = LeaderboardRemoval.objects.filter(removed_at__lt=timezone.now() - REMOVAL_RETENTION).delete()
+    return deleted
+
+
+def _publish(test_id, athlete_id=None):
+    """Tell the ranking backend about committed entry changes"""
+    from .ranking import get_ranking_backend  # ranking builds on this module
+
+    backend = get_ranking_backend()
+    if athlete_id is None:
+        transaction.on_commit(lambda: backend.reload(test_id))
+    else:
+        transaction.on_commit(lambda: backend.refresh(test_id, athlete_id))
+
+
+@transaction.atomic
+def refresh_leaderboard_entry(test_id, athlete_id):
+    """Bring one athlete's leaderboard entry for a test in line with their verified performances"""
+    test = _lock_test(test_id)
+    best = get_best_performance(test, athlete_id)
+    entry = LeaderboardEntry.objects.filter(test_id=test_id, athlete_id=athlete_id).first()
+
+    if entry is None and best is None:
+        return None
+    if entry is not None and best is not None and entry.performance_id == best.id \
+            and entry.best_value == best.value:
+        return entry
+
+    others = LeaderboardEntry.objects.filter(test_id=test_id).exclude(athlete_id=athlete_id)
+
+    if entry is not None:
+        # Entries that were behind the old value move up one place
+        others.filter(sort_key__gt=entry.sort_key).update(rank=F('rank') - 1)
+        if best is None:
+            entry.delete()
+            _record_removal(test_id, athlete_id)
+            set_personal_best(athlete_id, test_id, None)
+            _publish(test_id, athlete_id)
+            return None
+
+    # Entries behind the new value move down one place
+    sort_key = test.sort_key(best.value)
+    others.filter(sort_key__gt=sort_key).update(rank=F('rank') + 1)
+    rank = others.filter(sort_key__lt=sort_key).count() + 1
+
+    if entry is None:
+        athlete = Athlete.objects.only(
+            'gender', 'state', 'district', 'category', 'date_of_birth'
+        ).get(pk=athlete_id)
+        entry = LeaderboardEntry(test_id=test_id, athlete_id=athlete_id, **athlete_dimensions(athlete))
+    entry.performance_id = best.id
+    entry.best_value = best.value
+    entry.sort_key = sort_key
+    entry.achieved_at = best.created_at
+    entry.rank = rank
+    entry.save()
+    set_personal_best(athlete_id, test_id, best)
+    _publish(test_id, athlete_id)
+    return entry
+
+
+def update_athlete_dimensions(athlete):
+    """Copy an athlete's current segment columns onto their leaderboard entries"""
+    LeaderboardEntry.objects.filter(athlete_id=athlete.pk).update(
+        updated_at=timezone.now(), **athlete_dimensions(athlete)
+    )
+
+
+@transaction.atomic
+def remove_athlete_from_leaderboards(athlete_id):
+    """Drop all entries of an athlete, moving everyone behind them up one place"""
+    for entry in LeaderboardEntry.objects.filter(athlete_id=athlete_id):
+        _lock_test(entry.test_id)
+        LeaderboardEntry.objects.filter(
+            test_id=entry.test_id, sort_key__gt=entry.sort_key
+        ).update(rank=F('rank') - 1)
+        entry.delete()
+        _record_removal(entry.test_id, athlete_id)
+        _publish(entry.test_id, athlete_id)
+
+
+@transaction.atomic
+def recompute_test_ranks(test_id, batch_size=RANK_BATCH_SIZE):
+    """Correct the stored ranks of one test's leaderboard; returns the count"""
+    try:
+        # Incremental shifts must not interleave with the rewrite
+        _lock_test(test_id)
+    except Test.DoesNotExist:
+        return 0
+    changed = list(
+        LeaderboardEntry.objects.filter(test_id=test_id).order_by().annotate(
+            new_rank=Window(Rank(), order_by=F('sort_key').asc())
+        ).exclude(rank=F('new_rank')).values_list('id', 'rank', 'new_rank')
+    )
+
+    write_ranks(LeaderboardEntry, 'rank', changed, batch_size)
+    if changed:
+        _publish(test_id)
+    return len(changed)
+
+
+def recompute_ranks(batch_size=RANK_BATCH_SIZE):
+    """Correct every stored leaderboard rank that differs from a fresh RANK(); returns the count"""
+    test_ids = list(LeaderboardEntry.objects.order_by('test_id').values_list('test_id', flat=True).distinct())
+    return sum(recompute_test_ranks(test_id, batch_size) for test_id in test_ids)
+
+
+def ranked_best_performances(test, performances=None):
+    """Each athlete's best verified performance for a test, ranked with RANK()
+
+    ROW_NUMBER() partitioned by athlete picks the best row per athlete and the
+    outer RANK() orders only those rows, so both steps run as one query.
+    """
+    if performances is None:
+        performances = Performance.objects.all()
+    value_order = F('value').desc() if test.higher_is_better else F('value').asc()
+
+    bests = performances.filter(test_id=test.id, status='VERIFIED').annotate(
+        athlete_row=Window(
+            RowNumber(), partition_by=[F('athlete_id')],
+            order_by=[value_order, F('created_at').asc()]
+        )
+    ).filter(athlete_row=1).values('id')
+
+    return Performance.objects.filter(pk__in=bests).annotate(
+        rank=Window(Rank(), order_by=[value_order])
+    ).order_by('rank', 'created_at')
+
+
+@transaction.atomic
+def rebuild_leaderboard(test_id):
+    """Recompute every leaderboard entry of a test from its verified performances"""
+    test = _lock_test(test_id)
+    ranked = ranked_best_performances(test).values_list(
+        'id', 'athlete_id', 'value', 'created_at', 'rank',
+        'athlete__gender', 'athlete__state', 'athlete__district',
+        'athlete__category', 'athlete__date_of_birth'
+    )
+
+    entries = [
+        LeaderboardEntry(
+            test_id=test_id,
+            athlete_id=athlete_id,
+            performance_id=perf_id,
+            best_value=value,
+            sort_key=test.sort_key(value),
+            achieved_at=created_at,
+            rank=rank,
+            gender=gender,
+            state=state,
+            district=district,
+            category=category,
+            birth_year=date_of_birth.year,
+        )
+        for (perf_id, athlete_id, value, created_at, rank,
+             gender, state, district, category, date_of_birth) in ranked.iterator(chunk_size=2000)
+    ]
+
+    LeaderboardEntry.objects.filter(test_id=test_id).delete()
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    _record_removal(test_id)
+    set_test_bests(test_id, entries)
+    _publish(test_id)
+    return len(entries)
+
+
+def birth_year_range(age_group, year=None):
+    """Inclusive (first, last) birth years of an age group, either bound may be None"""
+    year = year or timezone.now().year
+    youngest_age, oldest_age = AGE_GROUPS[age_group]
+    # `oldest_age` bounds the earliest birth year, `youngest_age` the latest
+    first = year - oldest_age if oldest_age is not None else None
+    last = year - youngest_age if youngest_age is not None else None
+    return first, last
+
+
+def is_supported_segment(filters):
+    """Whether the set filters form one of SEGMENT_COMBINATIONS"""
+    applied = {name for name, value in filters.items() if value}
+    return any(applied == set(combination) for combination in SEGMENT_COMBINATIONS)
+
+
+def segment_entries(test, filters):
+    """Leaderboard entries of a test restricted to a segment, best first
+
+    `filters` maps SEGMENT_FILTERS names and 'age_group' to the wanted value.
+    """
+    entries = LeaderboardEntry.objects.filter(test_id=test.id)
+    for name in SEGMENT_FILTERS:
+        if filters.get(name):
+            entries = entries.filter(**{name: filters[name]})
+
+    if filters.get('age_group'):
+        first, last = birth_year_range(filters['age_group'])
+        if first is not None:
+            entries = entries.filter(birth_year__gte=first)
+        if last is not None:
+            entries = entries.filter(birth_year__lte=last)
+
+    return entries.order_by(*ENTRY_ORDERING)
+
+
+def with_segment_ranks(rows, previous_key=None, previous_rank=0, previous_position=0):
+    """Yield (rank, row) pairs for value rows ordered best first, using competition ranking
+
+    A page that continues deeper in the board passes the sort key, rank and
+    position of the row just before it, so no rows above it are counted.
+    """
+    rank = previous_rank
+    for position, row in enumerate(rows, previous_position + 1):
+        if row['sort_key'] != previous_key:
+            rank = position
+            previous_key = row['sort_key']
+        yield rank, row
+
+
+def entry_key(row):
+    """Keyset values of an entry value row, in ENTRY_ORDERING order"""
+    return [row[field] for field in ENTRY_ORDERING]
+
+
+def entries_around(entries, row, limit):
+    """Up to `limit` entry value rows either side of `row`, both lists best first"""
+    key = entry_key(row)
+    descending = [f'-{field}' for field in ENTRY_ORDERING]
+    above = list(entries.filter(
+        keyset_filter(ENTRY_ORDERING, key, before=True)
+    ).order_by(*descending).values(*ENTRY_FIELDS)[:limit])[::-1]
+    below = list(entries.filter(
+        keyset_filter(ENTRY_ORDERING, key)
+    ).order_by(*ENTRY_ORDERING).values(*ENTRY_FIELDS)[:limit])
+    return above, below
+
+
+def rank_in(entries, row):
+    """Competition rank and position of an entry value row among `entries`, via indexed counts"""
+    better = entries.filter(sort_key__lt=row['sort_key']).count()
+    ahead = entries.filter(keyset_filter(ENTRY_ORDERING, entry_key(row), before=True)).count()
+    return better + 1, ahead + 1
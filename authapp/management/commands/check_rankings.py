@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from authapp.models import Test
+from authapp.leaderboard import ranked_best_performances, rebuild_leaderboard
+from authapp.ranking import get_ranking_backend
+
+class Command(BaseCommand):
+    help = 'Diff the ranking backend against verified performances'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', help='Only check these tests (default: all)')
+        parser.add_argument('--fix', action='store_true', help='Rebuild leaderboards that differ')
+        parser.add_argument('--show', type=int, default=10, help='Differences to print per test')
+    
+    def handle(self, *args, **options):
+        backend = get_ranking_backend()
+        tests = Test.objects.all()
+        if options['test_ids']:
+            tests = tests.filter(id__in=options['test_ids'])
+        
+        inconsistent = 0
+        for test in tests:
+            expected = {
+                athlete_id: (value, rank)
+                for athlete_id, value, rank in ranked_best_performances(test).values_list('athlete_id', 'value', 'rank')
+            }
+            actual = backend.snapshot(test)
+            
+            differences = []
+            for athlete_id in sorted(expected.keys() | actual.keys()):
+                if expected.get(athlete_id) != actual.get(athlete_id):
+                    differences.append(
+                        f'  {athlete_id}: expected {expected.get(athlete_id)}, ranked {actual.get(athlete_id)}'
+                    )
+            
+            if not differences:
+                self.stdout.write(f'{test.name}: {len(expected)} athletes consistent')
+                continue
+            
+            inconsistent += 1
+            self.stdout.write(self.style.WARNING(f'{test.name}: {len(differences)} differences'))
+            for line in differences[:options['show']]:
+                self.stdout.write(line)
+            
+            if options['fix']:
+                rebuild_leaderboard(test.id)
+                backend.reload(test.id)
+                self.stdout.write(f'  rebuilt {test.name}')
+        
+        if inconsistent:
+            self.stdout.write(self.style.WARNING(f'{inconsistent} inconsistent leaderboards'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All leaderboards consistent'))
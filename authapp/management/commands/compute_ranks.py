@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from authapp.jobs import run_rank_job
+
+class Command(BaseCommand):
+    help = 'Recompute overall athlete ranks and correct per-test leaderboard ranks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running, once every this many seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            overall, per_test, elapsed = run_rank_job()
+            self.stdout.write(self.style.SUCCESS(
+                f'{overall} overall and {per_test} leaderboard ranks changed in {elapsed:.2f}s'
+            ))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
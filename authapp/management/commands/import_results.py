@@ -0,0 +1,333 @@
+import csv
+import json
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from authapp.models import User, Athlete, Test, Performance, AthleteStats
+from authapp.leaderboard import rebuild_leaderboard
+from authapp.distributions import rebuild_distribution
+from authapp.stats import performances_added
+
+# Streaming importer for historical results
+#
+# Records are read one at a time from CSV or NDJSON and grouped into chunks.
+# Each chunk is parsed and validated (optionally in a process pool; parsing
+# needs no database), its athletes and tests are resolved through lookup
+# maps loaded once up front, and it is written with bulk_create in its own
+# transaction. Memory use depends on the chunk size and the lookup maps,
+# never on the size of the file.
+#
+# Columns: test (id or name), value, and athlete (id) or email. Optional:
+# status, recorded_at, and with --create-athletes the profile columns of
+# ATHLETE_FIELDS for athletes not in the database yet (rows of known athletes
+# may leave them empty).
+
+ATHLETE_FIELDS = [
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'phone',
+    'state', 'district', 'address', 'sport', 'category'
+]
+STATUSES = {choice for choice, _ in Performance.STATUS_CHOICES}
+ATHLETE_CHOICES = {
+    'gender': {choice for choice, _ in Athlete.GENDER_CHOICES},
+    'sport': {choice for choice, _ in Athlete.SPORT_CHOICES},
+    'category': {choice for choice, _ in Athlete.CATEGORY_CHOICES},
+}
+
+
+def read_records(path, file_format):
+    """Yield (line number, record dict) without loading the file into memory"""
+    stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(stream, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError:
+                        yield line_number, None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _parse_recorded_at(raw):
+    parsed = parse_datetime(raw)
+    if parsed is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValueError
+        parsed = datetime.combine(day, dt_time())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def _parse_athlete(record, errors):
+    athlete = {}
+    for field in ATHLETE_FIELDS:
+        raw = str(record.get(field) or '').strip()
+        if not raw:
+            errors[field] = "Required for new athletes"
+        elif field in ATHLETE_CHOICES and raw.upper() not in ATHLETE_CHOICES[field]:
+            errors[field] = f"Invalid choice: {raw}"
+        athlete[field] = raw.upper() if field in ATHLETE_CHOICES else raw
+    if athlete['date_of_birth'] and parse_date(athlete['date_of_birth']) is None:
+        errors['date_of_birth'] = "Invalid date"
+    return athlete
+
+
+def parse_chunk(chunk, default_status, create_athletes):
+    """Validate raw records; returns (parsed rows, rejects). Runs in pool workers"""
+    parsed, rejects = [], []
+    for line_number, record in chunk:
+        if not isinstance(record, dict):
+            rejects.append((line_number, record, {"record": "Malformed record"}))
+            continue
+        errors = {}
+        row = {
+            'line': line_number,
+            'athlete': str(record.get('athlete') or '').strip(),
+            'email': str(record.get('email') or '').strip().lower(),
+            'test': str(record.get('test') or '').strip(),
+            'status': str(record.get('status') or default_status).strip().upper(),
+        }
+        if not row['athlete'] and not row['email']:
+            errors['athlete'] = "athlete or email is required"
+        if not row['test']:
+            errors['test'] = "Required"
+        try:
+            row['value'] = float(record.get('value'))
+            if not math.isfinite(row['value']):
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['value'] = "A valid number is required"
+        if row['status'] not in STATUSES:
+            errors['status'] = f"Invalid choice: {row['status']}"
+        if record.get('recorded_at'):
+            try:
+                row['recorded_at'] = _parse_recorded_at(str(record['recorded_at']).strip())
+            except ValueError:
+                errors['recorded_at'] = "Invalid date or datetime"
+        if create_athletes and not row['athlete'] and any(record.get(field) for field in ATHLETE_FIELDS):
+            row['profile'] = _parse_athlete(record, errors)
+
+        if errors:
+            rejects.append((line_number, record, errors))
+        else:
+            parsed.append(row)
+    return parsed, rejects
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def keep_created_at():
+    # bulk_create would stamp every historical row with the import time
+    field = Performance._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Stream historical results from CSV or NDJSON files into Performance (and Athlete)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to import; "-" reads standard input')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--status', default='VERIFIED', help='Status of rows without one')
+        parser.add_argument('--create-athletes', action='store_true',
+                            help='Create athletes (with a login-disabled user) for unknown emails')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create chunk')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Parse chunks in this many processes (default: in this process)')
+        parser.add_argument('--rejects', help='Write rejected rows to this NDJSON file')
+    
+    def handle(self, *args, **options):
+        default_status = options['status'].upper()
+        if default_status not in STATUSES:
+            raise CommandError(f"Invalid status: {options['status']}")
+        
+        self.load_lookups()
+        self.create_athletes = options['create_athletes']
+        self.touched_tests = set()
+        self.counts = {'read': 0, 'imported': 0, 'rejected': 0, 'athletes': 0}
+        self.rejects_file = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        self.started = time.monotonic()
+        self.imported_at = timezone.now()
+        
+        pool = None
+        if options['workers'] > 0:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup)
+        try:
+            with keep_created_at():
+                for path in options['paths']:
+                    file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+                    chunks = chunked(read_records(path, file_format), options['batch_size'])
+                    for parsed, rejects in self.parse(chunks, pool, options['workers'], default_status):
+                        self.write_chunk(parsed, rejects)
+        finally:
+            if pool:
+                pool.shutdown()
+            if self.rejects_file:
+                self.rejects_file.close()
+            # Chunks committed before a failure stay imported and need their leaderboards too
+            self.rebuild_touched_tests()
+        
+        self.report(final=True)
+    
+    def load_lookups(self):
+        """In-memory maps resolving every foreign key without a query per row"""
+        self.test_ids = {}
+        for test_id, name in Test.objects.values_list('id', 'name'):
+            self.test_ids[test_id] = test_id
+            self.test_ids.setdefault(name.lower(), test_id)
+        self.athlete_ids = set()
+        self.athletes_by_email = {}
+        for athlete_id, email in Athlete.objects.values_list('id', 'user__email').iterator(chunk_size=10000):
+            self.athlete_ids.add(athlete_id)
+            if email:
+                self.athletes_by_email[email.lower()] = athlete_id
+        self.emails = set()
+        self.usernames = set()
+        for email, username in User.objects.values_list('email', 'username').iterator(chunk_size=10000):
+            self.emails.add(email.lower())
+            self.usernames.add(username)
+    
+    def parse(self, chunks, pool, workers, default_status):
+        """Parsed chunks in file order; a pool keeps a bounded number of chunks in flight"""
+        if pool is None:
+            for chunk in chunks:
+                self.counts['read'] += len(chunk)
+                yield parse_chunk(chunk, default_status, self.create_athletes)
+            return
+        
+        pending = deque()
+        for chunk in chunks:
+            self.counts['read'] += len(chunk)
+            pending.append(pool.submit(parse_chunk, chunk, default_status, self.create_athletes))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    
+    def resolve(self, row):
+        """(test id, athlete id or None for a new athlete, errors)"""
+        test_id = self.test_ids.get(row['test']) or self.test_ids.get(row['test'].lower())
+        if test_id is None:
+            return None, None, {"test": f"Unknown test: {row['test']}"}
+        
+        if row['athlete']:
+            athlete_id = row['athlete'] if row['athlete'] in self.athlete_ids else None
+        else:
+            athlete_id = self.athletes_by_email.get(row['email'])
+        if athlete_id is None and 'profile' not in row:
+            return None, None, {"athlete": "Unknown athlete"}
+        if athlete_id is None and row['email'] in self.emails:
+            return None, None, {"email": "Belongs to a user without an athlete profile"}
+        if athlete_id is None and row['email'] in self.usernames:
+            # New users get their email as username
+            return None, None, {"email": "Already the username of another user"}
+        return test_id, athlete_id, None
+    
+    def write_chunk(self, parsed, rejects):
+        new_athletes = {}
+        performances = []
+        touched_tests = set()
+        for row in parsed:
+            test_id, athlete_id, errors = self.resolve(row)
+            if errors:
+                rejects.append((row['line'], row, errors))
+                continue
+            if athlete_id is None:
+                if row['email'] not in new_athletes:
+                    new_athletes[row['email']] = Athlete(**row['profile'])
+                athlete_id = new_athletes[row['email']].id
+            
+            performances.append(Performance(
+                athlete_id=athlete_id,
+                test_id=test_id,
+                value=row['value'],
+                status=row['status'],
+                created_at=row.get('recorded_at') or self.imported_at,
+            ))
+            if row['status'] == 'VERIFIED':
+                touched_tests.add(test_id)
+        
+        with transaction.atomic():
+            if new_athletes:
+                users = []
+                for email, athlete in new_athletes.items():
+                    user = User(username=email, email=email, role='ATHLETE', password=make_password(None))
+                    athlete.user = user
+                    users.append(user)
+                User.objects.bulk_create(users)
+                Athlete.objects.bulk_create(new_athletes.values())
+                AthleteStats.objects.bulk_create(AthleteStats(athlete=athlete) for athlete in new_athletes.values())
+            Performance.objects.bulk_create(performances)
+            performances_added(performances)
+        
+        for email, athlete in new_athletes.items():
+            self.athlete_ids.add(athlete.id)
+            self.athletes_by_email[email] = athlete.id
+            self.emails.add(email)
+            self.usernames.add(email)
+        self.touched_tests |= touched_tests
+        self.counts['athletes'] += len(new_athletes)
+        self.counts['imported'] += len(performances)
+        self.record_rejects(rejects)
+        self.report()
+    
+    def record_rejects(self, rejects):
+        self.counts['rejected'] += len(rejects)
+        if self.rejects_file is None:
+            return
+        for line_number, record, errors in rejects:
+            self.rejects_file.write(json.dumps(
+                {"line": line_number, "errors": errors, "record": record}, default=str
+            ) + '\n')
+    
+    def rebuild_touched_tests(self):
+        # Bulk inserts skip the signals that keep these incremental; rebuild once per test instead
+        for test_id in sorted(self.touched_tests):
+            rebuild_leaderboard(test_id)
+            rebuild_distribution(test_id)
+        if self.touched_tests:
+            self.stdout.write(f'Rebuilt leaderboards and distributions of {len(self.touched_tests)} tests')
+    
+    def report(self, final=False):
+        elapsed = time.monotonic() - self.started
+        processed = self.counts['imported'] + self.counts['rejected']
+        rate = processed / elapsed if elapsed else 0
+        message = (
+            f"{self.counts['read']} read, {self.counts['imported']} imported, "
+            f"{self.counts['rejected']} rejected, {self.counts['athletes']} athletes created "
+            f"in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Import finished: {message}') if final else message)
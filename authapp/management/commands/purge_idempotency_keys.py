@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from authapp.idempotency import purge_expired_keys
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys whose replay window has passed'
+    
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} idempotency keys'))
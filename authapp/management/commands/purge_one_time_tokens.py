@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authapp.one_time_tokens import PURGE_BATCH_SIZE, purge_expired_tokens
+
+class Command(BaseCommand):
+    help = 'Delete expired password reset and email verification tokens in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE,
+                            help='Tokens deleted per statement')
+    
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} one-time tokens'))
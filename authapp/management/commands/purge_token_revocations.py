@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from authapp.revocation import purge_expired_revocations
+
+class Command(BaseCommand):
+    help = 'Delete token revocations whose tokens have all expired'
+    
+    def handle(self, *args, **options):
+        deleted = purge_expired_revocations()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} token revocations'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from authapp.models import UploadSession
+from authapp.media import discard_upload
+
+class Command(BaseCommand):
+    help = 'Delete expired or finished chunked upload sessions and their stored chunks'
+    
+    def handle(self, *args, **options):
+        sessions = UploadSession.objects.filter(Q(expires_at__lte=timezone.now()) | Q(status='COMPLETE'))
+        session_ids = list(sessions.values_list('id', flat=True))
+        for session_id in session_ids:
+            discard_upload(session_id)
+        UploadSession.objects.filter(id__in=session_ids).delete()
+        
+        self.stdout.write(self.style.SUCCESS(f'Purged {len(session_ids)} upload sessions'))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from authapp.models import Test
+from authapp.distributions import rebuild_distribution, REBUILD_BATCH_SIZE
+
+class Command(BaseCommand):
+    help = 'Recompute per-test percentile digests and histograms from verified performances'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', help='Only rebuild these tests (default: all)')
+        parser.add_argument('--stale', action='store_true',
+                            help='Only rebuild distributions marked stale or not built yet')
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        tests = Test.objects.all()
+        if options['test_ids']:
+            tests = tests.filter(id__in=options['test_ids'])
+        if options['stale']:
+            tests = tests.filter(Q(distribution__is_stale=True) | Q(distribution__isnull=True))
+        
+        for test in tests:
+            started = time.monotonic()
+            distribution = rebuild_distribution(test.id, batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{test.name}: {distribution.count} values, '
+                f'{len(distribution.digest)} centroids in {elapsed:.2f}s'
+            )
+        
+        self.stdout.write(self.style.SUCCESS('Distributions rebuilt'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from authapp.models import Test
+from authapp.leaderboard import rebuild_leaderboard
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized leaderboards from verified performances'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', help='Only rebuild these tests (default: all)')
+    
+    def handle(self, *args, **options):
+        tests = Test.objects.all()
+        if options['test_ids']:
+            tests = tests.filter(id__in=options['test_ids'])
+        
+        for test in tests:
+            count = rebuild_leaderboard(test.id)
+            self.stdout.write(f'{test.name}: {count} athletes ranked')
+        
+        self.stdout.write(self.style.SUCCESS('Leaderboards rebuilt'))
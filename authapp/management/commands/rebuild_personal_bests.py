@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from authapp.models import Athlete
+from authapp.stats import rebuild_personal_bests
+
+class Command(BaseCommand):
+    help = 'Recompute AthleteStats.best_performances from verified performances'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('athlete_ids', nargs='*', help='Only rebuild these athletes (default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Athletes per aggregate query')
+    
+    def handle(self, *args, **options):
+        athletes = Athlete.objects.order_by('id')
+        if options['athlete_ids']:
+            athletes = athletes.filter(id__in=options['athlete_ids'])
+        
+        rebuilt = 0
+        batch = []
+        for athlete_id in athletes.values_list('id', flat=True).iterator(chunk_size=options['batch_size']):
+            batch.append(athlete_id)
+            if len(batch) == options['batch_size']:
+                rebuilt += self.rebuild(batch)
+                batch = []
+        if batch:
+            rebuilt += self.rebuild(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt personal bests of {rebuilt} athletes'))
+    
+    def rebuild(self, athlete_ids):
+        with transaction.atomic():
+            return rebuild_personal_bests(athlete_ids)
@@ -0,0 +1,166 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from authapp.models import Athlete, Test
+from authapp.jobs import run_rank_job
+from authapp.leaderboard import rebuild_leaderboard
+from authapp.distributions import rebuild_distribution
+from authapp.stats import recount_athlete_stats, rebuild_personal_bests
+
+# Full statistics rebuild
+#
+# Athletes are split into id ranges of --partition-size athletes. Each range
+# is rebuilt by a pool worker over its own database connection: athlete ids
+# are streamed with .iterator() and every batch gets its counters (including
+# badge counts and points) and personal bests recomputed from aggregate
+# queries and written with bulk_update. Ranges share no rows, so workers never
+# wait on each other and throughput grows with the number of workers until
+# the database saturates. Once every range is done, each test's leaderboard
+# entries and percentile distribution are rebuilt from its verified
+# performances, then overall and leaderboard ranks are recomputed.
+#
+# Ranges are half-open ([low, high), None meaning unbounded), so athletes
+# created after the partitioning still fall into one. With --checkpoint the
+# ranges and the finished ones are recorded after every range; rerunning with
+# the same file only rebuilds the ranges and tests that were not finished.
+
+
+def partition_athletes(partition_size):
+    """Half-open id ranges covering every athlete, `partition_size` athletes each"""
+    bounds = [None]
+    athlete_ids = Athlete.objects.order_by('id').values_list('id', flat=True)
+    for position, athlete_id in enumerate(athlete_ids.iterator(chunk_size=10000)):
+        if position and position % partition_size == 0:
+            bounds.append(athlete_id)
+    bounds.append(None)
+    return [[low, high] for low, high in zip(bounds, bounds[1:])]
+
+
+def rebuild_range(low, high, batch_size):
+    """Rebuild the stats of athletes with low <= id < high; returns the number of athletes"""
+    athletes = Athlete.objects.order_by('id')
+    if low is not None:
+        athletes = athletes.filter(id__gte=low)
+    if high is not None:
+        athletes = athletes.filter(id__lt=high)
+
+    rebuilt = 0
+    batch = []
+    for athlete_id in athletes.values_list('id', flat=True).iterator(chunk_size=batch_size):
+        batch.append(athlete_id)
+        if len(batch) == batch_size:
+            rebuilt += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        rebuilt += _rebuild_batch(batch)
+    return rebuilt
+
+
+def _rebuild_batch(athlete_ids):
+    with transaction.atomic():
+        recount_athlete_stats(athlete_ids)
+        rebuild_personal_bests(athlete_ids)
+    return len(athlete_ids)
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    # Written under a temporary name so an interrupted write never corrupts the checkpoint
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = 'Recompute every athlete\'s stats and personal bests in parallel, then leaderboards and ranks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (0: rebuild in this process)')
+        parser.add_argument('--partition-size', type=int, default=20000, help='Athletes per id range')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Athletes per aggregate query')
+        parser.add_argument('--checkpoint',
+                            help='Record progress in this file and resume from it if it exists')
+    
+    def handle(self, *args, **options):
+        if options['partition_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--partition-size and --batch-size must be positive')
+        
+        checkpoint = options['checkpoint']
+        state = load_checkpoint(checkpoint) if checkpoint else None
+        if state is None:
+            state = {'ranges': partition_athletes(options['partition_size']), 'done': []}
+        else:
+            self.stdout.write(f"Resuming: {len(state['done'])} of {len(state['ranges'])} ranges already rebuilt")
+        
+        workers = options['workers']
+        if workers > 0 and connections['default'].vendor == 'sqlite':
+            # SQLite allows a single writer, parallel workers would only fail on its lock
+            self.stdout.write('SQLite database: rebuilding in this process')
+            workers = 0
+        
+        done = set(state['done'])
+        pending = [index for index in range(len(state['ranges'])) if index not in done]
+        self.started = time.monotonic()
+        self.rebuilt = 0
+        
+        if workers > 0:
+            # Forked workers must not share the parent's connection; each opens its own
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                futures = {
+                    pool.submit(rebuild_range, *state['ranges'][index], options['batch_size']): index
+                    for index in pending
+                }
+                for future in as_completed(futures):
+                    self.range_done(state, futures[future], future.result(), checkpoint)
+        else:
+            for index in pending:
+                self.range_done(state, index, rebuild_range(*state['ranges'][index], options['batch_size']), checkpoint)
+        
+        self.rebuild_tests(state, checkpoint)
+        overall, per_test, elapsed = run_rank_job()
+        self.stdout.write(f'{overall} overall and {per_test} leaderboard ranks changed in {elapsed:.2f}s')
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats of {self.rebuilt} athletes in {time.monotonic() - self.started:.1f}s'
+        ))
+    
+    def range_done(self, state, index, rebuilt, checkpoint):
+        state['done'].append(index)
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+        
+        self.rebuilt += rebuilt
+        elapsed = time.monotonic() - self.started
+        rate = self.rebuilt / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{len(state['done'])}/{len(state['ranges'])} ranges, "
+            f"{self.rebuilt} athletes in {elapsed:.1f}s ({rate:.0f} athletes/s)"
+        )
+    
+    def rebuild_tests(self, state, checkpoint):
+        # Leaderboard entries and distributions are kept per test, not per athlete
+        done = set(state.setdefault('tests_done', []))
+        for test_id in Test.objects.order_by('id').values_list('id', flat=True):
+            if test_id in done:
+                continue
+            rebuild_leaderboard(test_id)
+            rebuild_distribution(test_id)
+            state['tests_done'].append(test_id)
+            if checkpoint:
+                save_checkpoint(checkpoint, state)
+        self.stdout.write(f"Rebuilt leaderboards and distributions of {len(state['tests_done'])} tests")
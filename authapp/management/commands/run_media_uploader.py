@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from authapp.media import process_pending_uploads
+
+class Command(BaseCommand):
+    help = 'Upload staged performance media to the storage backend'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--batch', type=int, default=10, help='Performances claimed per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle')
+    
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Media uploader started'))
+        while True:
+            uploaded, failed = process_pending_uploads(limit=options['batch'])
+            if uploaded or failed:
+                self.stdout.write(f'Uploaded {uploaded}, failed {failed}')
+            if options['once']:
+                break
+            if uploaded + failed < options['batch']:
+                time.sleep(options['interval'])
@@ -0,0 +1,269 @@
+import os
+import shutil
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Performance
+
+# Performance media pipeline
+#
+# submit_performance only writes uploaded files to a local staging area and
+# marks the performance PENDING. The uploader worker (manage.py
+# run_media_uploader) then pushes staged files to the storage backend,
+# retrying with exponential backoff, so no request waits on Cloudinary.
+#
+# A claimed performance is leased by pushing media_next_attempt_at forward;
+# if a worker dies mid-upload the lease runs out and another worker retries.
+#
+# Staging is local disk, so the uploader must run on the host that staged the
+# files: the deployment start commands run it next to gunicorn. Each
+# performance records the MEDIA_STAGING_HOST that staged its media and
+# uploaders only claim their own host's rows. A staged file that is gone (the
+# container was replaced) fails the upload at once instead of retrying.
+
+MEDIA_KINDS = ['video', 'image']
+UPLOAD_LEASE = timedelta(minutes=15)
+RETRY_BASE_DELAY = timedelta(seconds=30)
+CHUNK_READ_SIZE = 64 * 1024
+
+
+def staging_host():
+    return getattr(settings, 'MEDIA_STAGING_HOST', '')
+
+
+def staging_root():
+    return os.fspath(getattr(settings, 'MEDIA_STAGING_ROOT', os.path.join(settings.BASE_DIR, 'media_staging')))
+
+
+def staged_path(performance_id, kind, filename):
+    _, extension = os.path.splitext(filename or '')
+    directory = os.path.join(staging_root(), performance_id)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{kind}{extension.lower()[:10]}')
+
+
+def stage_upload(uploaded_file, performance_id, kind):
+    """Stream an uploaded file into the staging area and return its path"""
+    path = staged_path(performance_id, kind, uploaded_file.name)
+    with open(path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return path
+
+
+def discard_staged(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+# Chunked uploads
+#
+# Large videos arrive as numbered chunks of an UploadSession. Each chunk is
+# streamed from the request body to its own part file, so memory use stays
+# constant and a client that lost its connection only resends the chunks
+# missing from the session status. Finalizing concatenates the parts next to
+# them without holding any lock, then moves the file into the staging area
+# and hands it to the uploader worker.
+
+
+class UploadError(ValueError):
+    pass
+
+
+def upload_directory(session_id):
+    return os.path.join(staging_root(), 'uploads', session_id)
+
+
+def _chunk_path(session_id, index):
+    return os.path.join(upload_directory(session_id), f'{index:06d}.part')
+
+
+def write_chunk(session, index, stream):
+    """Stream one chunk of `session` from a file-like object to disk"""
+    if not 0 <= index < session.chunk_count:
+        raise UploadError(f"Chunk index must be between 0 and {session.chunk_count - 1}")
+    expected = session.expected_chunk_size(index)
+    path = _chunk_path(session.id, index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Written under a temporary name so a dropped connection never leaves a partial chunk
+    temporary = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    received = 0
+    try:
+        with open(temporary, 'wb') as destination:
+            while received <= expected:
+                block = stream.read(min(CHUNK_READ_SIZE, expected + 1 - received))
+                if not block:
+                    break
+                destination.write(block)
+                received += len(block)
+        if received != expected:
+            raise UploadError(f"Chunk {index} must be exactly {expected} bytes")
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def received_chunks(session):
+    try:
+        names = os.listdir(upload_directory(session.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def assemble_upload(session):
+    """Concatenate every chunk of `session` into one file beside them and return its path"""
+    missing = sorted(set(range(session.chunk_count)) - set(received_chunks(session)))
+    if missing:
+        raise UploadError(f"Missing chunks: {missing[:20]}")
+    path = os.path.join(upload_directory(session.id), 'assembled')
+    with open(path, 'wb') as destination:
+        for index in range(session.chunk_count):
+            with open(_chunk_path(session.id, index), 'rb') as part:
+                shutil.copyfileobj(part, destination, CHUNK_READ_SIZE)
+    return path
+
+
+def stage_assembled(session, path):
+    """Move an assembled upload into the staging area, drop its chunks and return the staged path"""
+    staged = staged_path(session.performance_id, session.kind, session.filename)
+    os.replace(path, staged)
+    discard_upload(session.id)
+    return staged
+
+
+def discard_upload(session_id):
+    shutil.rmtree(upload_directory(session_id), ignore_errors=True)
+
+
+class MediaBackend:
+    def upload(self, path, kind, performance_id):
+        """Store a staged file and return the value for the performance's media field"""
+        raise NotImplementedError
+
+
+class CloudinaryMediaBackend(MediaBackend):
+    def upload(self, path, kind, performance_id):
+        from cloudinary import uploader
+
+        field = Performance._meta.get_field(kind)
+        return uploader.upload_resource(
+            path,
+            type=field.type,
+            resource_type=field.resource_type,
+            folder='performances',
+            public_id=f'{performance_id}_{kind}',
+        )
+
+
+class LocalMediaBackend(MediaBackend):
+    """Copies media under MEDIA_ROOT; stands in for Cloudinary in development and tests"""
+
+    def upload(self, path, kind, performance_id):
+        _, extension = os.path.splitext(path)
+        relative = os.path.join('performances', kind, f'{performance_id}{extension}')
+        destination = os.path.join(settings.MEDIA_ROOT, relative)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(path, destination)
+        return relative
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_media_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.MEDIA_UPLOAD_BACKEND)()
+    return _backend
+
+
+def claim_pending_uploads(limit):
+    """Lease up to `limit` performances whose media is due for upload"""
+    now = timezone.now()
+    # Rows staged before hosts were recorded have no host; any uploader may take them
+    on_this_host = Q(media_staged_on=staging_host()) | Q(media_staged_on='')
+    due = Performance.objects.filter(
+        on_this_host, media_status__in=['PENDING', 'UPLOADING']
+    ).filter(
+        Q(media_next_attempt_at__isnull=True) | Q(media_next_attempt_at__lte=now)
+    ).order_by('media_next_attempt_at').values_list('id', flat=True)[:limit]
+
+    claimed = []
+    for performance_id in list(due):
+        # Conditional update so two workers never take the same row
+        taken = Performance.objects.filter(
+            Q(media_next_attempt_at__isnull=True) | Q(media_next_attempt_at__lte=now), on_this_host,
+            id=performance_id, media_status__in=['PENDING', 'UPLOADING'],
+        ).update(media_status='UPLOADING', media_next_attempt_at=now + UPLOAD_LEASE)
+        if taken:
+            claimed.append(performance_id)
+    return claimed
+
+
+class MissingStagedFile(Exception):
+    """A staged file no longer exists; retrying cannot help"""
+
+
+def upload_performance_media(performance_id, backend=None):
+    """Upload every staged file of one claimed performance; returns True when all succeeded"""
+    backend = backend or get_media_backend()
+    performance = Performance.objects.get(id=performance_id)
+    max_attempts = getattr(settings, 'MEDIA_UPLOAD_MAX_ATTEMPTS', 5)
+
+    try:
+        for kind in MEDIA_KINDS:
+            staged = getattr(performance, f'staged_{kind}')
+            if not staged:
+                continue
+            if not os.path.exists(staged):
+                raise MissingStagedFile(f"Staged {kind} is missing from {staging_host() or 'this host'}")
+            setattr(performance, kind, backend.upload(staged, kind, performance.id))
+            setattr(performance, f'staged_{kind}', '')
+            # Persist each finished file so a retry does not upload it again
+            performance.save(update_fields=[kind, f'staged_{kind}', 'updated_at'])
+            discard_staged(staged)
+    except Exception as error:
+        performance.media_attempts += 1
+        performance.media_error = str(error)[:500]
+        if performance.media_attempts >= max_attempts or isinstance(error, MissingStagedFile):
+            performance.media_status = 'FAILED'
+            performance.media_next_attempt_at = None
+        else:
+            performance.media_status = 'PENDING'
+            performance.media_next_attempt_at = timezone.now() + RETRY_BASE_DELAY * 2 ** (performance.media_attempts - 1)
+        performance.save(update_fields=[
+            'media_attempts', 'media_error', 'media_status', 'media_next_attempt_at', 'updated_at'
+        ])
+        return False
+
+    performance.media_status = 'UPLOADED'
+    performance.media_error = ''
+    performance.media_next_attempt_at = None
+    performance.save(update_fields=['media_status', 'media_error', 'media_next_attempt_at', 'updated_at'])
+    return True
+
+
+def process_pending_uploads(limit=10, backend=None):
+    """Claim and upload one batch; returns (uploaded, failed) counts"""
+    uploaded = failed = 0
+    for performance_id in claim_pending_uploads(limit):
+        if upload_performance_media(performance_id, backend=backend):
+            uploaded += 1
+        else:
+            failed += 1
+    return uploaded, failed
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_leaderboards(apps, schema_editor):
+    Performance = apps.get_model("authapp", "Performance")
+    LeaderboardEntry = apps.get_model("authapp", "LeaderboardEntry")
+
+    bests = {}
+    performances = (
+        Performance.objects.filter(status="VERIFIED")
+        .order_by("test_id", "athlete_id", "value", "created_at")
+        .values_list("id", "test_id", "athlete_id", "value", "created_at")
+    )
+    for perf_id, test_id, athlete_id, value, created_at in performances.iterator():
+        bests.setdefault((test_id, athlete_id), (value, created_at, perf_id))
+
+    entries = []
+    ordered = sorted(
+        bests.items(), key=lambda item: (item[0][0], item[1][0], item[1][1])
+    )
+    rank = position = 0
+    previous = None
+    for (test_id, athlete_id), (value, created_at, perf_id) in ordered:
+        if previous is None or previous[0] != test_id:
+            position = 0
+            previous = (test_id, None)
+        position += 1
+        if value != previous[1]:
+            rank = position
+            previous = (test_id, value)
+        entries.append(
+            LeaderboardEntry(
+                test_id=test_id,
+                athlete_id=athlete_id,
+                performance_id=perf_id,
+                best_value=value,
+                achieved_at=created_at,
+                rank=rank,
+            )
+        )
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0003_systemsettings_alter_userbadge_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("best_value", models.FloatField()),
+                ("rank", models.PositiveIntegerField(default=0)),
+                ("achieved_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "athlete",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to="authapp.athlete",
+                    ),
+                ),
+                (
+                    "performance",
+                    models.ForeignKey(
+                        help_text="Verified performance holding the best value",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="authapp.performance",
+                    ),
+                ),
+                (
+                    "test",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to="authapp.test",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["test", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["test", "rank"], name="authapp_lea_test_id_9dd5f0_idx"
+                    ),
+                    models.Index(
+                        fields=["test", "best_value"],
+                        name="authapp_lea_test_id_f77f5f_idx",
+                    ),
+                ],
+                "unique_together": {("test", "athlete")},
+            },
+        ),
+        migrations.RunPython(backfill_leaderboards, migrations.RunPython.noop),
+    ]
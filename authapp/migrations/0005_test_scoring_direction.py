@@ -0,0 +1,113 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+HIGHER_IS_BETTER_CATEGORIES = ["JUMPS", "THROWS"]
+HIGHER_IS_BETTER_UNITS = [
+    "meters",
+    "centimeters",
+    "kilograms",
+    "kg",
+    "repetitions",
+    "points",
+]
+
+
+def set_directions_and_rerank(apps, schema_editor):
+    Test = apps.get_model("authapp", "Test")
+    Performance = apps.get_model("authapp", "Performance")
+    LeaderboardEntry = apps.get_model("authapp", "LeaderboardEntry")
+
+    for test in Test.objects.all():
+        if (
+            test.category in HIGHER_IS_BETTER_CATEGORIES
+            or (test.unit or "").lower() in HIGHER_IS_BETTER_UNITS
+        ):
+            test.scoring_direction = "HIGHER"
+            test.save(update_fields=["scoring_direction"])
+        sign = -1 if test.scoring_direction == "HIGHER" else 1
+
+        bests = {}
+        performances = Performance.objects.filter(
+            test_id=test.id, status="VERIFIED"
+        ).values_list("id", "athlete_id", "value", "created_at")
+        for perf_id, athlete_id, value, created_at in performances.iterator():
+            current = bests.get(athlete_id)
+            if current is None or (sign * value, created_at) < (
+                sign * current[0],
+                current[1],
+            ):
+                bests[athlete_id] = (value, created_at, perf_id)
+
+        entries = []
+        rank = 0
+        previous = None
+        ordered = sorted(
+            bests.items(), key=lambda item: (sign * item[1][0], item[1][1])
+        )
+        for position, (athlete_id, (value, created_at, perf_id)) in enumerate(
+            ordered, 1
+        ):
+            if value != previous:
+                rank = position
+                previous = value
+            entries.append(
+                LeaderboardEntry(
+                    test_id=test.id,
+                    athlete_id=athlete_id,
+                    performance_id=perf_id,
+                    best_value=value,
+                    sort_key=sign * value,
+                    achieved_at=created_at,
+                    rank=rank,
+                )
+            )
+        LeaderboardEntry.objects.filter(test_id=test.id).delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0004_leaderboardentry"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="leaderboardentry",
+            name="authapp_lea_test_id_f77f5f_idx",
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="sort_key",
+            field=models.FloatField(
+                default=0,
+                help_text="best_value oriented so that ascending order is best first",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="test",
+            name="scoring_direction",
+            field=models.CharField(
+                choices=[("LOWER", "Lower is better"), ("HIGHER", "Higher is better")],
+                default="LOWER",
+                help_text="Whether lower (times) or higher (distances, loads) values win",
+                max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "sort_key"], name="authapp_lea_test_id_862bed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["athlete", "test", "status", "value"],
+                name="authapp_per_athlete_5ddef7_idx",
+            ),
+        ),
+        migrations.RunPython(set_directions_and_rerank, migrations.RunPython.noop),
+    ]
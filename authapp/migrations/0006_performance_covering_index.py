@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0005_test_scoring_direction"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["test", "status", "value", "athlete"],
+                name="authapp_per_test_id_acee6c_idx",
+            ),
+        ),
+    ]
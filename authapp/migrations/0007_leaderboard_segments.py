@@ -0,0 +1,110 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import ExtractYear
+
+
+def copy_athlete_dimensions(apps, schema_editor):
+    Athlete = apps.get_model("authapp", "Athlete")
+    LeaderboardEntry = apps.get_model("authapp", "LeaderboardEntry")
+
+    athlete = Athlete.objects.filter(pk=OuterRef("athlete_id"))
+    LeaderboardEntry.objects.update(
+        gender=Subquery(athlete.values("gender")[:1]),
+        state=Subquery(athlete.values("state")[:1]),
+        district=Subquery(athlete.values("district")[:1]),
+        category=Subquery(athlete.values("category")[:1]),
+        birth_year=Subquery(
+            athlete.annotate(year=ExtractYear("date_of_birth")).values("year")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0006_performance_covering_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="birth_year",
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="category",
+            field=models.CharField(
+                choices=[
+                    ("SPRINTS", "Sprints"),
+                    ("MIDDLE_DISTANCE", "Middle Distance"),
+                    ("LONG_DISTANCE", "Long Distance"),
+                    ("JUMPS", "Jumps"),
+                    ("THROWS", "Throws"),
+                    ("COMBINED_EVENTS", "Combined Events"),
+                    ("FREESTYLE", "Freestyle"),
+                    ("BACKSTROKE", "Backstroke"),
+                    ("BREASTSTROKE", "Breaststroke"),
+                    ("BUTTERFLY", "Butterfly"),
+                    ("INDIVIDUAL_MEDLEY", "Individual Medley"),
+                ],
+                default="",
+                max_length=20,
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="district",
+            field=models.CharField(default="", max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="gender",
+            field=models.CharField(
+                choices=[("MALE", "Male"), ("FEMALE", "Female")],
+                default="",
+                max_length=10,
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="state",
+            field=models.CharField(default="", max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "gender", "sort_key"],
+                name="authapp_lea_test_id_7bf75f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "category", "gender", "sort_key"],
+                name="authapp_lea_test_id_ac966c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "state", "district", "sort_key"],
+                name="authapp_lea_test_id_adbc5e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "birth_year", "sort_key"],
+                name="authapp_lea_test_id_eea84a_idx",
+            ),
+        ),
+        migrations.RunPython(copy_athlete_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0007_leaderboard_segments"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="leaderboardentry",
+            name="authapp_lea_test_id_862bed_idx",
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "sort_key", "achieved_at", "id"],
+                name="authapp_lea_test_id_7e95c7_idx",
+            ),
+        ),
+    ]
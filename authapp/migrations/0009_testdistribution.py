@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0008_leaderboard_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestDistribution",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("min_value", models.FloatField(blank=True, null=True)),
+                ("max_value", models.FloatField(blank=True, null=True)),
+                (
+                    "digest",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="t-digest centroids as [mean, weight] pairs",
+                    ),
+                ),
+                ("histogram_low", models.FloatField(blank=True, null=True)),
+                ("histogram_high", models.FloatField(blank=True, null=True)),
+                (
+                    "histogram",
+                    models.JSONField(
+                        blank=True, default=list, help_text="Counts of equal-width bins"
+                    ),
+                ),
+                (
+                    "is_stale",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Values were withdrawn since the last rebuild",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "test",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="distribution",
+                        to="authapp.test",
+                    ),
+                ),
+            ],
+        ),
+    ]
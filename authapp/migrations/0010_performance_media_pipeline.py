@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0009_testdistribution"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performance",
+            name="media_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="media_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="media_next_attempt_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="media_status",
+            field=models.CharField(
+                choices=[
+                    ("NONE", "No Media"),
+                    ("PENDING", "Waiting for Upload"),
+                    ("UPLOADING", "Uploading"),
+                    ("UPLOADED", "Uploaded"),
+                    ("FAILED", "Upload Failed"),
+                ],
+                default="NONE",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="staged_image",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="staged_video",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["media_status", "media_next_attempt_at"],
+                name="authapp_per_media_s_0f4712_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:18
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0011_uploadsession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "key_hash",
+                    models.CharField(
+                        help_text="SHA-256 of scope, user and client key",
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("scope", models.CharField(max_length=50)),
+                (
+                    "response_status",
+                    models.PositiveSmallIntegerField(
+                        blank=True,
+                        help_text="Empty while the first request is in flight",
+                        null=True,
+                    ),
+                ),
+                (
+                    "response_body",
+                    models.JSONField(
+                        blank=True,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                    ),
+                ),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
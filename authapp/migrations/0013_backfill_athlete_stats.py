@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:20
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+STATUS_COUNTERS = {
+    "PENDING": "pending_performances",
+    "VERIFIED": "verified_performances",
+    "FLAGGED": "flagged_performances",
+}
+
+
+def backfill_athlete_stats(apps, schema_editor):
+    Athlete = apps.get_model("authapp", "Athlete")
+    AthleteStats = apps.get_model("authapp", "AthleteStats")
+    Performance = apps.get_model("authapp", "Performance")
+    AthleteBadge = apps.get_model("authapp", "AthleteBadge")
+
+    counts = {}
+    performance_counts = (
+        Performance.objects.order_by()
+        .values("athlete_id")
+        .annotate(
+            total_performances=Count("id"),
+            **{
+                field: Count("id", filter=Q(status=status))
+                for status, field in STATUS_COUNTERS.items()
+            },
+        )
+    )
+    for row in performance_counts:
+        counts.setdefault(row.pop("athlete_id"), {}).update(row)
+    badge_counts = (
+        AthleteBadge.objects.order_by()
+        .values("athlete_id")
+        .annotate(total_badges=Count("id"), total_points=Sum("badge__points"))
+    )
+    for row in badge_counts:
+        counts.setdefault(row.pop("athlete_id"), {}).update(row)
+
+    existing = set(AthleteStats.objects.values_list("athlete_id", flat=True))
+    AthleteStats.objects.bulk_create(
+        [
+            AthleteStats(athlete_id=athlete_id)
+            for athlete_id in Athlete.objects.values_list("id", flat=True)
+            if athlete_id not in existing
+        ],
+        batch_size=1000,
+    )
+    for athlete_id, values in counts.items():
+        AthleteStats.objects.filter(athlete_id=athlete_id).update(
+            **{field: value or 0 for field, value in values.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0012_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_athlete_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:35
+
+from django.db import migrations
+from django.db.models import Case, F, FloatField, When, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_personal_bests(apps, schema_editor):
+    Performance = apps.get_model("authapp", "Performance")
+    AthleteStats = apps.get_model("authapp", "AthleteStats")
+
+    sort_value = Case(
+        When(test__scoring_direction="HIGHER", then=-F("value")),
+        default=F("value"),
+        output_field=FloatField(),
+    )
+    bests = (
+        Performance.objects.filter(status="VERIFIED")
+        .annotate(
+            best_row=Window(
+                RowNumber(),
+                partition_by=[F("athlete_id"), F("test_id")],
+                order_by=[sort_value.asc(), F("created_at").asc()],
+            )
+        )
+        .filter(best_row=1)
+        .values_list("athlete_id", "test_id", "id", "value", "created_at")
+    )
+
+    bests_by_athlete = {}
+    for athlete_id, test_id, performance_id, value, created_at in bests.iterator():
+        bests_by_athlete.setdefault(athlete_id, {})[test_id] = {
+            "value": value,
+            "performance_id": performance_id,
+            "achieved_at": created_at.isoformat(),
+        }
+
+    stats_rows = [
+        stats
+        for stats in AthleteStats.objects.iterator()
+        if stats.athlete_id in bests_by_athlete
+    ]
+    for stats in stats_rows:
+        stats.best_performances = bests_by_athlete[stats.athlete_id]
+    AthleteStats.objects.bulk_update(stats_rows, ["best_performances"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0013_backfill_athlete_stats"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_personal_bests, migrations.RunPython.noop),
+    ]
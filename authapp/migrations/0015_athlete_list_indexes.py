@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0014_backfill_personal_bests"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="athlete",
+            index=models.Index(
+                fields=["created_at", "id"], name="authapp_ath_created_1654e1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="athlete",
+            index=models.Index(
+                fields=["sport", "created_at", "id"],
+                name="authapp_ath_sport_f2905d_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="athlete",
+            index=models.Index(
+                fields=["state", "district", "created_at", "id"],
+                name="authapp_ath_state_ffeb29_idx",
+            ),
+        ),
+    ]
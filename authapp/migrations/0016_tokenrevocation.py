@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0015_athlete_list_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenRevocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "user_id",
+                    models.CharField(
+                        blank=True,
+                        help_text="Not a foreign key: deleted users stay revoked",
+                        max_length=20,
+                    ),
+                ),
+                ("jti", models.CharField(blank=True, max_length=64)),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        help_text="Every token this entry can match has expired by then",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:44
+
+import hashlib
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+EMAIL_VERIFICATION_TTL = timedelta(hours=48)
+
+
+def move_outstanding_tokens(apps, schema_editor):
+    # Links already emailed keep working; from now on only their hashes are stored
+    User = apps.get_model("authapp", "User")
+    OneTimeToken = apps.get_model("authapp", "OneTimeToken")
+    now = timezone.now()
+
+    tokens = []
+    resets = User.objects.filter(
+        password_reset_token__isnull=False, password_reset_expires__gt=now
+    ).exclude(password_reset_token="")
+    for user_id, token, expires_at in resets.values_list(
+        "id", "password_reset_token", "password_reset_expires"
+    ):
+        tokens.append(
+            OneTimeToken(
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                user_id=user_id,
+                purpose="PASSWORD_RESET",
+                expires_at=expires_at,
+            )
+        )
+    verifications = User.objects.filter(
+        is_email_verified=False, email_verification_token__isnull=False
+    ).exclude(email_verification_token="")
+    for user_id, token in verifications.values_list("id", "email_verification_token"):
+        tokens.append(
+            OneTimeToken(
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                user_id=user_id,
+                purpose="EMAIL_VERIFICATION",
+                expires_at=now + EMAIL_VERIFICATION_TTL,
+            )
+        )
+    OneTimeToken.objects.bulk_create(tokens, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0016_tokenrevocation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OneTimeToken",
+            fields=[
+                (
+                    "token_hash",
+                    models.CharField(
+                        help_text="SHA-256 of the emailed token",
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        choices=[
+                            ("PASSWORD_RESET", "Password Reset"),
+                            ("EMAIL_VERIFICATION", "Email Verification"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="one_time_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(move_outstanding_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="email_verification_token",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="password_reset_expires",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="password_reset_token",
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Fail with the accounts to merge rather than an IntegrityError on the index
+    User = apps.get_model("authapp", "User")
+    duplicates = (
+        User.objects.values("email")
+        .annotate(accounts=Count("id"))
+        .filter(accounts__gt=1)
+        .values_list("email", flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Emails used by more than one user, resolve before migrating: "
+            + ", ".join(repr(email) for email in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0017_one_time_tokens"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="user",
+            name="email",
+            field=models.EmailField(
+                help_text="Login looks users up by email",
+                max_length=254,
+                unique=True,
+                verbose_name="email address",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0018_unique_user_email"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="test",
+            name="scoring_direction",
+            field=models.CharField(
+                blank=True,
+                choices=[("LOWER", "Lower is better"), ("HIGHER", "Higher is better")],
+                help_text="Whether lower (times) or higher (distances, loads) values win; left blank, derived from the category and unit on save",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0019_test_scoring_direction_derived"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "state", "gender", "sort_key"],
+                name="authapp_lea_test_id_ee0092_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["test", "gender", "birth_year", "sort_key"],
+                name="authapp_lea_test_id_883443_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0020_leaderboard_segment_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardRemoval",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "athlete_id",
+                    models.CharField(
+                        blank=True,
+                        help_text="Empty when the whole board was rebuilt; not a foreign key so removals of deleted athletes are kept",
+                        max_length=20,
+                    ),
+                ),
+                ("removed_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "test",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="authapp.test",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["test", "removed_at"],
+                        name="authapp_lea_test_id_ccf88e_idx",
+                    ),
+                    models.Index(
+                        fields=["removed_at"], name="authapp_lea_removed_f2da02_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0021_leaderboardremoval"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="testdistribution",
+            name="is_stale",
+            field=models.BooleanField(
+                default=False,
+                help_text="Values were withdrawn or the histogram range was widened since the last rebuild",
+            ),
+        ),
+    ]
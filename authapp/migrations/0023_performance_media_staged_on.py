@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0022_distribution_stale_help"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performance",
+            name="media_staged_on",
+            field=models.CharField(
+                blank=True,
+                help_text="MEDIA_STAGING_HOST that holds the staged files",
+                max_length=255,
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+def drop_unbound_keys(apps, schema_editor):
+    # Keys stored so far are not tied to a request body, and registrations kept bearer tokens
+    apps.get_model("authapp", "IdempotencyKey").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0023_performance_media_staged_on"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="request_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="HMAC of the method, path and body of the first request",
+                max_length=64,
+            ),
+        ),
+        migrations.RunPython(drop_unbound_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authapp", "0024_idempotencykey_request_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uploadsession",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("OPEN", "Open"),
+                    ("ASSEMBLING", "Assembling"),
+                    ("COMPLETE", "Complete"),
+                ],
+                default="OPEN",
+                max_length=10,
+            ),
+        ),
+    ]
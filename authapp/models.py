@@ -1,12 +1,13 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from cloudinary.models import CloudinaryField
 import uuid
 
 # UUID Generation Functions
 def generate_user_id():
-    return f"cm4user{uuid.uuid4().hex[:6]}"
+    return f"cm4user{uuid.uuid4().hex[:12]}"
 
 def generate_athlete_id():
     return f"cm4{uuid.uuid4().hex[:9]}"
@@ -15,7 +16,7 @@ def generate_test_id():
     return f"cm4test{uuid.uuid4().hex[:6]}"
 
 def generate_performance_id():
-    return f"cm4perf{uuid.uuid4().hex[:6]}"
+    return f"cm4perf{uuid.uuid4().hex[:12]}"
 
 def generate_badge_id():
     return f"cm4badge{uuid.uuid4().hex[:5]}"
@@ -23,6 +24,9 @@ def generate_badge_id():
 def generate_notification_id():
     return f"cm4notif{uuid.uuid4().hex[:5]}"
 
+def generate_upload_id():
+    return f"cm4upl{uuid.uuid4().hex[:12]}"
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('ADMIN', 'Admin'),
@@ -30,11 +34,9 @@ class User(AbstractUser):
     ]
     
     id = models.CharField(max_length=20, primary_key=True, default=generate_user_id)
+    email = models.EmailField('email address', unique=True, help_text="Login looks users up by email")
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='ATHLETE')
     is_email_verified = models.BooleanField(default=False)
-    email_verification_token = models.CharField(max_length=100, blank=True, null=True)
-    password_reset_token = models.CharField(max_length=100, blank=True, null=True)
-    password_reset_expires = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -93,6 +95,12 @@ class Athlete(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset order of the admin athlete list, unfiltered and per filter
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['sport', 'created_at', 'id']),
+            models.Index(fields=['state', 'district', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.sport}"
@@ -116,11 +124,23 @@ class Test(models.Model):
         ('INDIVIDUAL_MEDLEY', 'Individual Medley'),
     ]
     
+    SCORING_DIRECTION_CHOICES = [
+        ('LOWER', 'Lower is better'),
+        ('HIGHER', 'Higher is better'),
+    ]
+    
+    # Distances, heights, loads and counts are won by the larger value
+    HIGHER_IS_BETTER_CATEGORIES = ['JUMPS', 'THROWS']
+    HIGHER_IS_BETTER_UNITS = ['meters', 'centimeters', 'kilograms', 'kg', 'repetitions', 'points']
+    
     id = models.CharField(max_length=20, primary_key=True, default=generate_test_id)
     name = models.CharField(max_length=100, help_text="e.g., 100m Sprint, Long Jump", default="Test Name")
     description = models.TextField(default="Test Description")
     unit = models.CharField(max_length=20, help_text="e.g., seconds, meters, kilograms", default="seconds")
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='SPRINTS')
+    scoring_direction = models.CharField(max_length=10, choices=SCORING_DIRECTION_CHOICES, blank=True,
+                                         help_text="Whether lower (times) or higher (distances, loads) values win; "
+                                                   "left blank, derived from the category and unit on save")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -130,6 +150,30 @@ class Test(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.category})"
+    
+    def save(self, *args, **kwargs):
+        # Every creation path (API, admin, scripts) gets the direction its category and unit imply
+        if not self.scoring_direction:
+            self.scoring_direction = self.default_scoring_direction(self.category, self.unit)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def default_scoring_direction(cls, category, unit):
+        if category in cls.HIGHER_IS_BETTER_CATEGORIES or (unit or '').lower() in cls.HIGHER_IS_BETTER_UNITS:
+            return 'HIGHER'
+        return 'LOWER'
+    
+    @property
+    def higher_is_better(self):
+        return self.scoring_direction == 'HIGHER'
+    
+    def sort_key(self, value):
+        """Map a value so that ascending order is always best first"""
+        return -value if self.higher_is_better else value
+    
+    def best_first(self, field='value'):
+        """Ordering expression listing the best value of `field` first"""
+        return f'-{field}' if self.higher_is_better else field
 
 class Performance(models.Model):
     STATUS_CHOICES = [
@@ -145,6 +189,14 @@ class Performance(models.Model):
         ('OTHER', 'Other Reason'),
     ]
     
+    MEDIA_STATUS_CHOICES = [
+        ('NONE', 'No Media'),
+        ('PENDING', 'Waiting for Upload'),
+        ('UPLOADING', 'Uploading'),
+        ('UPLOADED', 'Uploaded'),
+        ('FAILED', 'Upload Failed'),
+    ]
+    
     id = models.CharField(max_length=20, primary_key=True, default=generate_performance_id)
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='performances')
     athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='performances')
@@ -155,6 +207,15 @@ class Performance(models.Model):
     video = CloudinaryField('video', blank=True, null=True, resource_type='video')
     image = CloudinaryField('image', blank=True, null=True)
     
+    # Media upload pipeline: files wait in staging until the uploader worker stores them
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='NONE')
+    staged_video = models.CharField(max_length=255, blank=True)
+    staged_image = models.CharField(max_length=255, blank=True)
+    media_staged_on = models.CharField(max_length=255, blank=True, help_text="MEDIA_STAGING_HOST that holds the staged files")
+    media_attempts = models.PositiveSmallIntegerField(default=0)
+    media_next_attempt_at = models.DateTimeField(null=True, blank=True)
+    media_error = models.TextField(blank=True)
+    
     # Verification fields
     verified_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='verified_performances')
     verified_at = models.DateTimeField(null=True, blank=True)
@@ -174,11 +235,171 @@ class Performance(models.Model):
         indexes = [
             models.Index(fields=['test', 'status']),
             models.Index(fields=['athlete', 'created_at']),
+            models.Index(fields=['athlete', 'test', 'status', 'value']),
+            # Covers the per-athlete best window query without touching the table
+            models.Index(fields=['test', 'status', 'value', 'athlete']),
+            models.Index(fields=['media_status', 'media_next_attempt_at']),
         ]
     
     def __str__(self):
         return f"{self.athlete.full_name} - {self.test.name}: {self.value} {self.test.unit}"
 
+class UploadSession(models.Model):
+    """Resumable chunked upload of one media file of a performance"""
+    KIND_CHOICES = [
+        ('video', 'Video'),
+        ('image', 'Image'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('OPEN', 'Open'),
+        ('ASSEMBLING', 'Assembling'),
+        ('COMPLETE', 'Complete'),
+    ]
+    
+    id = models.CharField(max_length=20, primary_key=True, default=generate_upload_id)
+    performance = models.ForeignKey(Performance, on_delete=models.CASCADE, related_name='upload_sessions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(validators=[MinValueValidator(1)])
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.performance_id} {self.kind} upload ({self.status})"
+    
+    @property
+    def chunk_count(self):
+        return -(-self.total_size // self.chunk_size)
+    
+    def expected_chunk_size(self, index):
+        if index == self.chunk_count - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
+
+class IdempotencyKey(models.Model):
+    """Response of a request made with an Idempotency-Key header, replayed on retries"""
+    key_hash = models.CharField(max_length=64, primary_key=True,
+                                help_text="SHA-256 of scope, user and client key")
+    scope = models.CharField(max_length=50)
+    request_hash = models.CharField(max_length=64, blank=True,
+                                    help_text="HMAC of the method, path and body of the first request")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                       help_text="Empty while the first request is in flight")
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.scope} {self.key_hash[:12]}"
+
+class TokenRevocation(models.Model):
+    """Revokes one token by jti, or every token of a user issued before created_at (empty jti)"""
+    user_id = models.CharField(max_length=20, blank=True, help_text="Not a foreign key: deleted users stay revoked")
+    jti = models.CharField(max_length=64, blank=True)
+    expires_at = models.DateTimeField(db_index=True, help_text="Every token this entry can match has expired by then")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user_id} {self.jti or '(all tokens)'}"
+
+class OneTimeToken(models.Model):
+    """Single-use token emailed for a password reset or an email verification, stored only as a hash"""
+    PURPOSE_CHOICES = [
+        ('PASSWORD_RESET', 'Password Reset'),
+        ('EMAIL_VERIFICATION', 'Email Verification'),
+    ]
+    
+    token_hash = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the emailed token")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='one_time_tokens')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.purpose} {self.user_id}"
+
+class LeaderboardEntry(models.Model):
+    """Materialized best verified result of an athlete for a test, with its rank"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    performance = models.ForeignKey(Performance, on_delete=models.SET_NULL, null=True, related_name='+',
+                                    help_text="Verified performance holding the best value")
+    best_value = models.FloatField()
+    sort_key = models.FloatField(help_text="best_value oriented so that ascending order is best first")
+    rank = models.PositiveIntegerField(default=0)
+    achieved_at = models.DateTimeField()
+    
+    # Athlete dimensions copied here so segmented boards are index range scans
+    gender = models.CharField(max_length=10, choices=Athlete.GENDER_CHOICES)
+    state = models.CharField(max_length=50)
+    district = models.CharField(max_length=50)
+    category = models.CharField(max_length=20, choices=Athlete.CATEGORY_CHOICES)
+    birth_year = models.PositiveSmallIntegerField()
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['test', 'rank']
+        unique_together = ['test', 'athlete']
+        indexes = [
+            models.Index(fields=['test', 'rank']),
+            models.Index(fields=['test', 'sort_key', 'achieved_at', 'id']),
+            models.Index(fields=['test', 'gender', 'sort_key']),
+            models.Index(fields=['test', 'category', 'gender', 'sort_key']),
+            models.Index(fields=['test', 'state', 'district', 'sort_key']),
+            models.Index(fields=['test', 'state', 'gender', 'sort_key']),
+            models.Index(fields=['test', 'birth_year', 'sort_key']),
+            models.Index(fields=['test', 'gender', 'birth_year', 'sort_key']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.athlete_id} - {self.test_id}: {self.best_value}"
+
+class LeaderboardRemoval(models.Model):
+    """Tombstone of a removed leaderboard entry, for workers syncing in-memory boards"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='+')
+    athlete_id = models.CharField(max_length=20, blank=True,
+                                  help_text="Empty when the whole board was rebuilt; not a foreign key so "
+                                            "removals of deleted athletes are kept")
+    removed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['test', 'removed_at']),
+            models.Index(fields=['removed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.test_id} {self.athlete_id or '(whole board)'}"
+
+class TestDistribution(models.Model):
+    """Streaming summary of a test's verified values: t-digest plus fixed-bin histogram"""
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, related_name='distribution')
+    count = models.PositiveIntegerField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    digest = models.JSONField(default=list, blank=True, help_text="t-digest centroids as [mean, weight] pairs")
+    histogram_low = models.FloatField(null=True, blank=True)
+    histogram_high = models.FloatField(null=True, blank=True)
+    histogram = models.JSONField(default=list, blank=True, help_text="Counts of equal-width bins")
+    is_stale = models.BooleanField(default=False, help_text="Values were withdrawn or the histogram range was "
+                                                            "widened since the last rebuild")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.test_id} distribution ({self.count} values)"
+
 class Badge(models.Model):
     BADGE_TYPE_CHOICES = [
         ('PERFORMANCE', 'Performance Badge'),
@@ -0,0 +1,69 @@
+import hashlib
+import secrets
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import OneTimeToken
+
+# One-time tokens
+#
+# Password reset and email verification links carry a random token of which
+# only the SHA-256 is stored, as the primary key of OneTimeToken: looking a
+# token up is a unique index probe, and the table's contents cannot be
+# replayed. Redeeming is one DELETE ... RETURNING on that key, so checking
+# the purpose and expiry, consuming the token and finding its user take a
+# single statement, and concurrent redemptions of one token cannot both
+# succeed. Issuing a token replaces the user's outstanding one of the same
+# purpose. Expired rows are never redeemed; purge_one_time_tokens removes
+# them.
+
+PASSWORD_RESET = 'PASSWORD_RESET'
+EMAIL_VERIFICATION = 'EMAIL_VERIFICATION'
+PURGE_BATCH_SIZE = 1000
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_lifetime(purpose):
+    if purpose == PASSWORD_RESET:
+        return timedelta(hours=settings.PASSWORD_RESET_TOKEN_TTL_HOURS)
+    return timedelta(hours=settings.EMAIL_VERIFICATION_TOKEN_TTL_HOURS)
+
+
+def issue_token(user, purpose):
+    """New token for `user`; only its hash is stored"""
+    token = secrets.token_urlsafe(32)
+    with transaction.atomic():
+        OneTimeToken.objects.filter(user=user, purpose=purpose).delete()
+        OneTimeToken.objects.create(
+            token_hash=token_hash(token), user=user, purpose=purpose,
+            expires_at=timezone.now() + token_lifetime(purpose)
+        )
+    return token
+
+
+def redeem_token(token, purpose):
+    """Consume `token` and return its user's id, or None if it is unknown, expired or for another purpose"""
+    table = connection.ops.quote_name(OneTimeToken._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE token_hash = %s AND purpose = %s AND expires_at > %s RETURNING user_id',
+            [token_hash(token), purpose, now]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def purge_expired_tokens(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired tokens a batch at a time, keeping each statement's locks short"""
+    expired = OneTimeToken.objects.filter(expires_at__lte=timezone.now())
+    deleted = 0
+    while True:
+        batch = list(expired.values_list('token_hash', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += OneTimeToken.objects.filter(token_hash__in=batch).delete()[0]
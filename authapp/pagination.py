@@ -0,0 +1,54 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from django.db.models import Q
+
+# Keyset (cursor) pagination helpers
+#
+# A cursor is the ordering key of the last row of a page, serialized as
+# urlsafe base64 JSON so clients treat it as opaque. The next page is the
+# rows strictly after that key, which any index on the ordering columns
+# answers at the same cost no matter how deep the page is.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor, length):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(payload, list) or len(payload) != length:
+            raise InvalidCursor("Malformed cursor")
+        return [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+
+
+def keyset_filter(ordering, values, before=False):
+    """Q matching rows strictly after (or before) `values` in `ordering`
+
+    `ordering` lists field names as given to order_by(), '-' marking
+    descending columns.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != before
+        clause = Q(**{f'{name}__{"lt" if descending else "gt"}': values[position]})
+        for earlier_field, earlier_value in zip(ordering[:position], values[:position]):
+            clause &= Q(**{earlier_field.lstrip('-'): earlier_value})
+        condition |= clause
+    return condition
@@ -0,0 +1,105 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.handlers.asgi import ASGIRequest
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Password checks for login
+#
+# Login reads the user once, by the uniquely indexed email, with the athlete
+# joined so issuing the token and building the profile need no further
+# query. Verifying the password (PBKDF2) is the expensive part. Under ASGI
+# every request runs its sync view in a thread of its own, so a login storm
+# would run one hash per request at once and starve the rest of the API;
+# there the check goes to a pool of PASSWORD_HASH_WORKERS threads and excess
+# logins queue for a slot. hashlib releases the GIL while hashing, so the
+# pool threads use separate cores. Under WSGI the worker count already
+# bounds concurrency and the check runs inline.
+#
+# Each worker logs the number of checks, the hashing time and the time spent
+# queued for the pool every PASSWORD_HASH_METRICS_INTERVAL seconds. Hashing
+# time tells how many logins a core takes per second, queue time whether the
+# pool is too small.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class HashTimings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self.started = now
+        self.checks = 0
+        self.hashing = 0.0
+        self.slowest = 0.0
+        self.queued = 0.0
+
+    def record(self, hashing, queued):
+        now = time.monotonic()
+        with self._lock:
+            self.checks += 1
+            self.hashing += hashing
+            self.slowest = max(self.slowest, hashing)
+            self.queued += queued
+            interval = settings.PASSWORD_HASH_METRICS_INTERVAL
+            if not interval or now - self.started < interval:
+                return
+            summary = (self.checks, now - self.started, self.hashing / self.checks * 1000,
+                       self.slowest * 1000, self.queued / self.checks * 1000)
+            self._reset(now)
+        logger.info('Password checks: %d in %.0fs, hashing mean %.1fms max %.1fms, queued mean %.1fms', *summary)
+
+
+hash_timings = HashTimings()
+
+
+def hash_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+                    thread_name_prefix='password-hash'
+                )
+    return _pool
+
+
+def _verify(password, encoded, submitted_at):
+    started = time.monotonic()
+    # A missing user still costs one hash, so response times do not reveal registered emails
+    result = verify_password(password, encoded)
+    hash_timings.record(time.monotonic() - started, started - submitted_at)
+    return result
+
+
+def _offload(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def authenticate_credentials(request, email, password):
+    """The active user with this email and password, or None; one query"""
+    user = User.objects.select_related('athlete').filter(email=email).first()
+    encoded = user.password if user is not None else ''
+
+    if _offload(request):
+        is_correct, must_update = hash_pool().submit(_verify, password, encoded, time.monotonic()).result()
+    else:
+        is_correct, must_update = _verify(password, encoded, time.monotonic())
+    if not is_correct or not user.is_active:
+        return None
+
+    if must_update:
+        # Same password under the current hasher; an update() keeps it from counting as a password change
+        user.password = make_password(password)
+        User.objects.filter(pk=user.pk).update(password=user.password)
+    return user
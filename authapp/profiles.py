@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.utils import timezone
+from .models import User
+
+# Profile payload cache
+#
+# get_profile and login_view serve the serialized user (with the nested
+# athlete) from the cache instead of reading and serializing the athlete on
+# every call. Entries are stamped with User.updated_at, which the
+# authentication backend has already loaded for the request, so checking an
+# entry costs no query. Any User save moves updated_at; Athlete saves and
+# deletes touch it explicitly (see signals). A worker whose local cache holds
+# an older stamp therefore rebuilds the entry even when the invalidation
+# itself ran in another worker.
+
+PROFILE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def profile_cache_key(user_id):
+    return f'profile:{user_id}'
+
+
+def profile_stamp(user):
+    return int(user.updated_at.timestamp() * 1_000_000)
+
+
+def profile_etag(user):
+    return f'"profile-{user.pk}-{profile_stamp(user)}"'
+
+
+def get_profile_payload(user):
+    """Serialized UserSerializer data of `user`, from the cache while the user is unchanged"""
+    stamp = profile_stamp(user)
+    cached = cache.get(profile_cache_key(user.pk))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    # serializers imports signals, which import this module
+    from .serializers import UserSerializer
+
+    data = UserSerializer(user).data
+    payload = {**data, 'athlete': dict(data['athlete']) if data['athlete'] else None}
+    cache.set(profile_cache_key(user.pk), (stamp, payload), PROFILE_CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_profile(user_id):
+    cache.delete(profile_cache_key(user_id))
+
+
+def touch_profile(user_id):
+    """Mark a user's profile changed by a write that did not save the User row"""
+    User.objects.filter(pk=user_id).update(updated_at=timezone.now())
+    invalidate_profile(user_id)
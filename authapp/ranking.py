@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import LeaderboardEntry, LeaderboardRemoval
+from .leaderboard import ENTRY_FIELDS, ENTRY_ORDERING, entries_around
+
+# Ranking backends
+#
+# get_leaderboard reads full-board top-N pages and around-me windows through
+# a ranking backend. Rows are entry value rows (see ENTRY_FIELDS) paired with
+# their competition rank, so any backend can hand over to the keyset-paged
+# database queries for deeper pages. Segmented boards always go to the
+# database.
+#
+# The default InMemoryRankingBackend keeps one sorted array per test in each
+# worker. Writes reach it through refresh() once their transaction commits;
+# updates made by other workers are picked up by a periodic incremental sync
+# on LeaderboardEntry.updated_at and the LeaderboardRemoval tombstones, and a
+# periodic full reload is the safety net behind both. Rows are fetched
+# outside the backend's lock and only applied or swapped in under it, so
+# readers keep using the current board while one of them syncs or reloads
+# it, and a slow test never holds up reads of the others. The first request
+# of a worker starts a background thread that loads every board. A
+# shared-cache backend (e.g. Redis sorted sets) can replace it by
+# implementing RankingBackend and pointing settings.RANKING_BACKEND at it.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANKING_BACKEND = 'authapp.ranking.InMemoryRankingBackend'
+
+
+class RankingBackend:
+    def top(self, test, limit):
+        """[(rank, row)] of the best `limit` entries of a test"""
+        raise NotImplementedError
+
+    def around(self, test, athlete_id, limit):
+        """(above, me, below) as (rank, row) pairs, or None if the athlete is not ranked"""
+        raise NotImplementedError
+
+    def snapshot(self, test):
+        """{athlete_id: (best_value, rank)} of every ranked athlete"""
+        raise NotImplementedError
+
+    def refresh(self, test_id, athlete_id):
+        """Pick up a committed change to one entry"""
+
+    def reload(self, test_id=None):
+        """Drop cached state of one test, or of every test"""
+
+    def warm(self):
+        """Load state ahead of the first request"""
+
+
+class DatabaseRankingBackend(RankingBackend):
+    """Serves ranks straight from the materialized LeaderboardEntry table"""
+
+    def _entries(self, test):
+        return LeaderboardEntry.objects.filter(test_id=test.id).order_by(*ENTRY_ORDERING)
+
+    def top(self, test, limit):
+        return [(row['rank'], row) for row in self._entries(test).values(*ENTRY_FIELDS)[:limit]]
+
+    def around(self, test, athlete_id, limit):
+        entries = self._entries(test)
+        me = entries.filter(athlete_id=athlete_id).values(*ENTRY_FIELDS).first()
+        if me is None:
+            return None
+        above, below = entries_around(entries, me, limit)
+        return (
+            [(row['rank'], row) for row in above],
+            (me['rank'], me),
+            [(row['rank'], row) for row in below],
+        )
+
+    def snapshot(self, test):
+        return {
+            athlete_id: (value, rank)
+            for athlete_id, value, rank in self._entries(test).values_list('athlete_id', 'best_value', 'rank')
+        }
+
+
+class _Board:
+    """Entries of one test in a sorted array, ranked with bisect"""
+
+    def __init__(self, rows, synced_until):
+        self.rows = {row['athlete_id']: row for row in rows}
+        self.keys = sorted(self._key(row) for row in self.rows.values())
+        self.loaded_at = self.synced_at = time.monotonic()
+        # When the rows were read, so the next sync covers writes committed meanwhile
+        self.synced_until = synced_until
+
+    @staticmethod
+    def _key(row):
+        return (*(row[field] for field in ENTRY_ORDERING), row['athlete_id'])
+
+    def put(self, row):
+        self.discard(row['athlete_id'])
+        self.rows[row['athlete_id']] = row
+        insort(self.keys, self._key(row))
+
+    def discard(self, athlete_id):
+        row = self.rows.pop(athlete_id, None)
+        if row is not None:
+            del self.keys[bisect_left(self.keys, self._key(row))]
+
+    def rank_of(self, sort_key):
+        # Entries with a strictly smaller key sort before the 1-tuple
+        return bisect_left(self.keys, (sort_key,)) + 1
+
+    def ranked(self, keys):
+        return [(self.rank_of(key[0]), self.rows[key[-1]]) for key in keys]
+
+
+class InMemoryRankingBackend(RankingBackend):
+    """Per-worker sorted arrays of leaderboard entries"""
+
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.Lock()
+        self.sync_interval = getattr(settings, 'RANKING_SYNC_INTERVAL', 5)
+        self.reload_interval = getattr(settings, 'RANKING_RELOAD_INTERVAL', 300)
+
+    def _load_rows(self, entries, *extra):
+        # Ranks are derived from the array, so stored ranks would only go stale
+        fields = [field for field in ENTRY_FIELDS if field != 'rank']
+        return entries.order_by().values(*fields, *extra).iterator(chunk_size=5000)
+
+    def _board(self, test_id):
+        with self._lock:
+            board = self._boards.get(test_id)
+            now = time.monotonic()
+            if board is None:
+                reload = True
+            elif now - board.loaded_at > self.reload_interval:
+                # The first reader to notice does the work, the others keep reading this board
+                board.loaded_at = board.synced_at = now
+                reload = True
+            elif now - board.synced_at > self.sync_interval:
+                board.synced_at = now
+                reload = False
+            else:
+                return board
+        return self._load_board(test_id) if reload else self._sync(test_id, board)
+
+    def _load_board(self, test_id):
+        board = _Board(self._load_rows(LeaderboardEntry.objects.filter(test_id=test_id)), timezone.now())
+        with self._lock:
+            self._boards[test_id] = board
+        return board
+
+    def _sync(self, test_id, board):
+        # Overlap the previous window so rows committed late are not missed
+        since = board.synced_until - timedelta(seconds=self.sync_interval)
+        synced_until = timezone.now()
+        removals = list(LeaderboardRemoval.objects.filter(
+            test_id=test_id, removed_at__gte=since
+        ).values_list('removed_at', 'athlete_id'))
+        if any(not athlete_id for _, athlete_id in removals):
+            # The board was rebuilt
+            return self._load_board(test_id)
+
+        changed = LeaderboardEntry.objects.filter(test_id=test_id, updated_at__gte=since)
+        # Replay writes and removals in order, so an entry re-added after its removal stays
+        events = [(row.pop('updated_at'), 1, row) for row in self._load_rows(changed, 'updated_at')]
+        events += [(removed_at, 0, athlete_id) for removed_at, athlete_id in removals]
+        events.sort(key=lambda event: event[:2])
+        with self._lock:
+            for _, is_write, item in events:
+                if is_write:
+                    board.put(item)
+                else:
+                    board.discard(item)
+            board.synced_until = max(board.synced_until, synced_until)
+        return board
+
+    def top(self, test, limit):
+        board = self._board(test.id)
+        with self._lock:
+            return board.ranked(board.keys[:limit])
+
+    def around(self, test, athlete_id, limit):
+        board = self._board(test.id)
+        with self._lock:
+            row = board.rows.get(athlete_id)
+            if row is None:
+                return None
+            index = bisect_left(board.keys, board._key(row))
+            above = board.ranked(board.keys[max(0, index - limit):index])
+            below = board.ranked(board.keys[index + 1:index + 1 + limit])
+            return above, (board.rank_of(row['sort_key']), row), below
+
+    def snapshot(self, test):
+        board = self._board(test.id)
+        with self._lock:
+            return {
+                athlete_id: (row['best_value'], board.rank_of(row['sort_key']))
+                for athlete_id, row in board.rows.items()
+            }
+
+    def refresh(self, test_id, athlete_id):
+        if test_id not in self._boards:
+            return
+        row = next(self._load_rows(
+            LeaderboardEntry.objects.filter(test_id=test_id, athlete_id=athlete_id)
+        ), None)
+        with self._lock:
+            board = self._boards.get(test_id)
+            if board is None:
+                return
+            if row is None:
+                board.discard(athlete_id)
+            else:
+                board.put(row)
+
+    def reload(self, test_id=None):
+        with self._lock:
+            if test_id is None:
+                self._boards.clear()
+            else:
+                self._boards.pop(test_id, None)
+
+    def warm(self):
+        loaded_at = timezone.now()
+        rows_by_test = {}
+        for row in self._load_rows(LeaderboardEntry.objects.all(), 'test_id'):
+            rows_by_test.setdefault(row.pop('test_id'), []).append(row)
+        boards = {test_id: _Board(rows, loaded_at) for test_id, rows in rows_by_test.items()}
+        with self._lock:
+            # Boards that requests loaded in the meantime are at least as fresh
+            for test_id, board in boards.items():
+                self._boards.setdefault(test_id, board)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ranking_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'RANKING_BACKEND', DEFAULT_RANKING_BACKEND)
+                _backend = import_string(path)()
+    return _backend
+
+
+def _warm():
+    try:
+        get_ranking_backend().warm()
+    except Exception:
+        logger.exception('Ranking backend warm-up failed')
+    finally:
+        connection.close()
+
+
+def warm_ranking_backend(**kwargs):
+    # Runs once per worker, beside its first request, when the database is reachable
+    request_started.disconnect(warm_ranking_backend)
+    threading.Thread(target=_warm, name='ranking-warmup', daemon=True).start()
+
+
+def connect_warmup():
+    if getattr(settings, 'RANKING_WARM_ON_STARTUP', True):
+        request_started.connect(warm_ranking_backend)
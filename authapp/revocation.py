@@ -0,0 +1,183 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .models import TokenRevocation
+
+# Token revocation
+#
+# Access tokens are checked without a query (see authentication.py), so
+# revocations live in a small TokenRevocation table and every worker keeps
+# an in-process copy: exact sets of revoked jtis and of per-user epochs
+# (tokens of the user issued before the epoch are revoked), fronted by a
+# Bloom filter. Almost every token misses the filter, so a request pays a
+# few hash probes; only filter hits consult the exact sets.
+#
+# Workers pull rows created since their previous sync every
+# TOKEN_REVOCATION_SYNC_INTERVAL seconds, with an overlap that covers rows
+# committed late, and rebuild everything every
+# TOKEN_REVOCATION_RELOAD_INTERVAL seconds to drop expired entries. The
+# revoking worker applies its own revocations as soon as they commit.
+
+SYNC_OVERLAP = timedelta(seconds=60)
+BLOOM_ERROR_RATE = 0.01
+MIN_BLOOM_CAPACITY = 1024
+
+
+class BloomFilter:
+    """Set membership with false positives at about `error_rate` up to `capacity` keys, never false negatives"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self):
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self._reloaded_at = None
+        self._since = None
+        self._reset([])
+
+    def _reset(self, rows):
+        jtis = {}
+        user_epochs = {}
+        for row in rows:
+            self._record(jtis, user_epochs, *row)
+        self._install(jtis, user_epochs)
+
+    def _install(self, jtis, user_epochs):
+        bloom = BloomFilter(max(MIN_BLOOM_CAPACITY, 2 * (len(jtis) + len(user_epochs))))
+        for jti in jtis:
+            bloom.add(f'jti:{jti}')
+        for user_id in user_epochs:
+            bloom.add(f'user:{user_id}')
+        # Readers never lock; they always see one consistent set of structures
+        self._state = (bloom, jtis, user_epochs)
+
+    @staticmethod
+    def _record(jtis, user_epochs, user_id, jti, created_at, expires_at):
+        """Add one row to the exact sets; returns its Bloom key if that key is new"""
+        if jti:
+            new = jti not in jtis
+            jtis[jti] = expires_at
+            return f'jti:{jti}' if new else None
+        if not user_id:
+            return None
+        # Token iat is in whole seconds; a token issued within the revoking second survives
+        epoch = int(created_at.timestamp())
+        new = user_id not in user_epochs
+        user_epochs[user_id] = max(epoch, user_epochs.get(user_id, epoch))
+        return f'user:{user_id}' if new else None
+
+    def _apply(self, rows):
+        bloom, jtis, user_epochs = self._state
+        jtis, user_epochs = dict(jtis), dict(user_epochs)
+        keys = [key for key in (self._record(jtis, user_epochs, *row) for row in rows) if key]
+        if bloom.count + len(keys) > bloom.capacity:
+            self._install(jtis, user_epochs)
+            return
+        # Setting more bits only adds false positives for readers of the previous sets
+        for key in keys:
+            bloom.add(key)
+        self._state = (bloom, jtis, user_epochs)
+
+    def add(self, user_id, jti, created_at, expires_at):
+        """Apply one revocation to this worker's copy"""
+        with self._sync_lock:
+            self._apply([(user_id, jti, created_at, expires_at)])
+
+    def is_revoked(self, token):
+        self._maybe_sync()
+        bloom, jtis, user_epochs = self._state
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and f'jti:{jti}' in bloom and jti in jtis:
+            return True
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id and f'user:{user_id}' in bloom:
+            epoch = user_epochs.get(str(user_id))
+            return epoch is not None and token.get('iat', 0) < epoch
+        return False
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL:
+            return
+        # One thread syncs; the others keep answering from the current copy
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            reload_due = self._reloaded_at is None or now - self._reloaded_at >= settings.TOKEN_REVOCATION_RELOAD_INTERVAL
+            self.sync(full=reload_due)
+        finally:
+            self._sync_lock.release()
+
+    def sync(self, full=False):
+        started = timezone.now()
+        rows = TokenRevocation.objects.filter(expires_at__gt=started)
+        if not full:
+            rows = rows.filter(created_at__gte=self._since - SYNC_OVERLAP)
+        rows = list(rows.values_list('user_id', 'jti', 'created_at', 'expires_at'))
+
+        if full:
+            self._reset(rows)
+            self._reloaded_at = time.monotonic()
+        elif rows:
+            self._apply(rows)
+        self._since = started
+        self._synced_at = time.monotonic()
+
+
+_revocation_list = RevocationList()
+
+
+def get_revocation_list():
+    return _revocation_list
+
+
+def _revoke(user_id, jti, expires_at):
+    revocation = TokenRevocation.objects.create(user_id=user_id or '', jti=jti, expires_at=expires_at)
+    transaction.on_commit(lambda: _revocation_list.add(
+        revocation.user_id, revocation.jti, revocation.created_at, revocation.expires_at
+    ))
+    return revocation
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far"""
+    return _revoke(str(user_id), '', timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def revoke_token(token):
+    """Revoke a single access or refresh token"""
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    return _revoke(str(token.get(api_settings.USER_ID_CLAIM, '')), token[api_settings.JTI_CLAIM], expires_at)
+
+
+def purge_expired_revocations():
+    deleted, _ = TokenRevocation.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,14 +1,19 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
 from django.core.validators import validate_email
 from django.contrib.auth.password_validation import validate_password
-import secrets
-import string
+from django.db import transaction
+import math
+from datetime import timedelta
 from .models import (
     User, Athlete, Test, Performance, Badge, AthleteBadge, 
-    AthleteStats, Notification, SystemSettings
+    AthleteStats, Notification, SystemSettings, UploadSession, LeaderboardEntry
 )
+from .media import MEDIA_KINDS, stage_upload, discard_staged, received_chunks, staging_host
+from .signals import performances_bulk_created
+from .passwords import authenticate_credentials
 
 # Authentication Serializers
 
@@ -69,10 +74,6 @@ class RegisterSerializer(serializers.Serializer):
             role='ATHLETE'
         )
         
-        # Generate email verification token
-        user.email_verification_token = self.generate_token()
-        user.save()
-        
         # Create athlete profile
         athlete = Athlete.objects.create(user=user, **athlete_data)
         
@@ -80,9 +81,6 @@ class RegisterSerializer(serializers.Serializer):
         AthleteStats.objects.create(athlete=athlete)
         
         return user
-    
-    def generate_token(self):
-        return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -92,12 +90,7 @@ class LoginSerializer(serializers.Serializer):
         email = data.get("email")
         password = data.get("password")
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Invalid email or password")
-
-        user = authenticate(username=user.username, password=password)
+        user = authenticate_credentials(self.context.get("request"), email, password)
         if not user:
             raise serializers.ValidationError("Invalid email or password")
 
@@ -117,27 +110,23 @@ class ForgotPasswordSerializer(serializers.Serializer):
 class ResetPasswordSerializer(serializers.Serializer):
     token = serializers.CharField()
     new_password = serializers.CharField(min_length=8, validators=[validate_password])
-    
-    def validate_token(self, value):
-        try:
-            user = User.objects.get(password_reset_token=value)
-            if user.password_reset_expires and user.password_reset_expires < timezone.now():
-                raise serializers.ValidationError("Reset token has expired")
-            return value
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Invalid or expired reset token")
+
+class VerifyEmailSerializer(serializers.Serializer):
+    token = serializers.CharField()
 
 # Test Serializers
 
 class TestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Test
-        fields = ['id', 'name', 'description', 'unit', 'category', 'is_active', 'created_at']
+        fields = ['id', 'name', 'description', 'unit', 'category', 'scoring_direction', 'is_active', 'created_at']
 
 class TestCreateSerializer(serializers.ModelSerializer):
+    scoring_direction = serializers.ChoiceField(choices=Test.SCORING_DIRECTION_CHOICES, required=False)
+    
     class Meta:
         model = Test
-        fields = ['name', 'description', 'unit', 'category']
+        fields = ['name', 'description', 'unit', 'category', 'scoring_direction']
 
 # Performance Serializers
 
@@ -150,25 +139,140 @@ class PerformanceSerializer(serializers.ModelSerializer):
         model = Performance
         fields = [
             'id', 'test', 'test_name', 'test_unit', 'athlete', 'athlete_name',
-            'value', 'status', 'video', 'image', 'verified_by', 'verified_at',
+            'value', 'status', 'video', 'image', 'media_status', 'verified_by', 'verified_at',
             'verification_notes', 'created_at'
         ]
-        read_only_fields = ['id', 'athlete', 'verified_by', 'verified_at', 'created_at']
+        read_only_fields = ['id', 'athlete', 'media_status', 'verified_by', 'verified_at', 'created_at']
 
 class PerformanceCreateSerializer(serializers.ModelSerializer):
+    video = serializers.FileField(required=False, write_only=True)
+    image = serializers.FileField(required=False, write_only=True)
+    
     class Meta:
         model = Performance
         fields = ['test', 'value', 'video', 'image']
     
     def create(self, validated_data):
-        validated_data['athlete'] = self.context['request'].user.athlete
-        return super().create(validated_data)
+        # Media is staged locally; the uploader worker pushes it to storage later
+        files = {kind: validated_data.pop(kind, None) for kind in MEDIA_KINDS}
+        performance = Performance(athlete=self.context['request'].user.athlete, **validated_data)
+        
+        staged = []
+        try:
+            for kind, uploaded_file in files.items():
+                if uploaded_file:
+                    path = stage_upload(uploaded_file, performance.id, kind)
+                    staged.append(path)
+                    setattr(performance, f'staged_{kind}', path)
+            if staged:
+                performance.media_status = 'PENDING'
+                performance.media_staged_on = staging_host()
+            performance.save()
+        except Exception:
+            for path in staged:
+                discard_staged(path)
+            raise
+        return performance
+
+class BulkPerformanceCreateSerializer(serializers.Serializer):
+    """Batch of (athlete, test, value) results recorded by an official"""
+    MAX_ROWS = 500
+    
+    status = serializers.ChoiceField(choices=['PENDING', 'VERIFIED'], default='PENDING')
+    performances = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_ROWS
+    )
+    
+    def create(self, validated_data):
+        """Insert every valid row in one transaction; returns (performances, row errors)"""
+        rows = validated_data['performances']
+        
+        # One query each resolves every athlete and test referenced by the batch
+        athletes = Athlete.objects.filter(is_active=True).only('id').in_bulk(
+            {str(row.get('athlete')) for row in rows}
+        )
+        tests = Test.objects.filter(is_active=True).only('id').in_bulk(
+            {str(row.get('test')) for row in rows}
+        )
+        
+        user = self.context['request'].user
+        verified = validated_data['status'] == 'VERIFIED'
+        now = timezone.now()
+        performances = []
+        errors = []
+        for index, row in enumerate(rows):
+            row_errors = {}
+            if str(row.get('athlete')) not in athletes:
+                row_errors['athlete'] = ["Athlete not found"]
+            if str(row.get('test')) not in tests:
+                row_errors['test'] = ["Test not found"]
+            try:
+                value = float(row.get('value'))
+                if not math.isfinite(value):
+                    raise ValueError
+            except (TypeError, ValueError):
+                row_errors['value'] = ["A valid number is required"]
+            
+            if row_errors:
+                errors.append({"index": index, "errors": row_errors})
+                continue
+            performances.append(Performance(
+                athlete_id=str(row['athlete']),
+                test_id=str(row['test']),
+                value=value,
+                status=validated_data['status'],
+                verified_by=user if verified else None,
+                verified_at=now if verified else None,
+            ))
+        
+        with transaction.atomic():
+            Performance.objects.bulk_create(performances, batch_size=self.MAX_ROWS)
+            performances_bulk_created(performances)
+        return performances, errors
 
 class PerformanceUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Performance
         fields = ['status', 'verification_notes', 'flag_reason', 'flag_notes']
 
+# Upload Session Serializers
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'performance', 'kind', 'filename', 'total_size', 'chunk_size',
+            'chunk_count', 'received_chunks', 'status', 'expires_at', 'created_at'
+        ]
+    
+    def get_received_chunks(self, obj):
+        return received_chunks(obj) if obj.status == 'OPEN' else []
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['performance', 'kind', 'filename', 'total_size']
+    
+    def validate_performance(self, value):
+        athlete = getattr(self.context['request'].user, 'athlete', None)
+        if athlete is None or value.athlete_id != athlete.id:
+            raise serializers.ValidationError("Performance not found")
+        return value
+    
+    def validate_total_size(self, value):
+        if value > settings.UPLOAD_MAX_FILE_SIZE:
+            raise serializers.ValidationError(f"File must not exceed {settings.UPLOAD_MAX_FILE_SIZE} bytes")
+        return value
+    
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        validated_data['chunk_size'] = settings.UPLOAD_CHUNK_SIZE
+        validated_data['expires_at'] = timezone.now() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+        return super().create(validated_data)
+
 # Leaderboard Serializers
 
 class LeaderboardEntrySerializer(serializers.Serializer):
@@ -211,27 +315,32 @@ class AthleteStatsSerializer(serializers.ModelSerializer):
         ]
     
     def get_personal_bests(self, obj):
-        # Get best performance for each test
-        performances = Performance.objects.filter(
-            athlete=obj.athlete, 
-            status='VERIFIED'
-        ).select_related('test').order_by('test', 'value')
-        
-        bests = {}
-        for perf in performances:
-            if perf.test.name not in bests:
-                bests[perf.test.name] = {
-                    'test_name': perf.test.name,
-                    'best_value': perf.value,
-                    'unit': perf.test.unit,
-                    'achieved_at': perf.created_at
-                }
+        # Bests are maintained on verification; test names, units and current ranks
+        # come from the athlete's leaderboard entries in one query
+        bests = obj.best_performances
+        if not bests:
+            return []
+        entries = LeaderboardEntry.objects.filter(
+            athlete_id=obj.athlete_id, test_id__in=list(bests)
+        ).select_related('test').only('test_id', 'rank', 'test__name', 'test__unit')
         
-        return list(bests.values())
+        personal_bests = []
+        for entry in entries:
+            best = bests[entry.test_id]
+            personal_bests.append({
+                'test_name': entry.test.name,
+                'best_value': best['value'],
+                'unit': entry.test.unit,
+                'rank': entry.rank,
+                'performance_id': best['performance_id'],
+                # Stored as text; a datetime renders in the API's usual format
+                'achieved_at': parse_datetime(best['achieved_at'])
+            })
+        return sorted(personal_bests, key=lambda best: best['test_name'])
     
     def get_recent_performances(self, obj):
         recent = Performance.objects.filter(
-            athlete=obj.athlete
+            athlete_id=obj.athlete_id
         ).select_related('test').order_by('-created_at')[:5]
         
         return [{
@@ -263,6 +372,9 @@ class AthleteListSerializer(serializers.ModelSerializer):
         ]
     
     def get_performance_count(self, obj):
+        # Listings annotate the count in their query; single athletes fall back to counting
+        if hasattr(obj, 'verified_performance_count'):
+            return obj.verified_performance_count
         return obj.performances.filter(status='VERIFIED').count()
 
 # Notification Serializers
@@ -0,0 +1,184 @@
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import User, Athlete, Test, Performance, AthleteBadge
+from .leaderboard import (
+    refresh_leaderboard_entry, remove_athlete_from_leaderboards, rebuild_leaderboard,
+    update_athlete_dimensions
+)
+from .distributions import record_verified_value, record_verified_values, withdraw_verified_value
+from .media import discard_staged
+from .stats import performance_changed, performances_added, badge_changed
+from .catalog import bump_catalog_version
+from .profiles import invalidate_profile, touch_profile
+from .revocation import revoke_user_tokens
+
+# Performance signals
+
+
+def _remember_state(instance):
+    # Deferred fields are left out so tracking never triggers a query
+    instance._original_status = instance.__dict__.get('status')
+    instance._original_value = instance.__dict__.get('value')
+
+
+def _deleted_with(origin, *models):
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+@receiver(post_init, sender=Performance)
+def track_performance_state(sender, instance, **kwargs):
+    _remember_state(instance)
+
+
+@receiver(post_save, sender=Performance)
+def performance_saved(sender, instance, created, **kwargs):
+    was_verified = not created and instance._original_status == 'VERIFIED'
+    is_verified = instance.status == 'VERIFIED'
+    value_changed = instance._original_value != instance.value
+
+    if was_verified or is_verified:
+        if created or was_verified != is_verified or value_changed:
+            refresh_leaderboard_entry(instance.test_id, instance.athlete_id)
+
+    if was_verified and (not is_verified or value_changed):
+        withdraw_verified_value(instance.test_id, instance._original_value)
+    if is_verified and (not was_verified or value_changed):
+        record_verified_value(instance.test_id, instance.value)
+
+    if created:
+        performance_changed(instance.athlete_id, new_status=instance.status)
+    elif instance._original_status not in (None, instance.status):
+        performance_changed(instance.athlete_id, instance._original_status, instance.status)
+
+    _remember_state(instance)
+
+
+@receiver(post_delete, sender=Performance)
+def performance_deleted(sender, instance, origin=None, **kwargs):
+    discard_staged(instance.staged_video)
+    discard_staged(instance.staged_image)
+    # Deleted athletes take their stats row with them
+    if not _deleted_with(origin, Athlete, User):
+        performance_changed(instance.athlete_id, old_status=instance.status)
+    # Whole tests take their leaderboard with them, athletes are handled in athlete_deleting
+    if _deleted_with(origin, Test, Athlete, User):
+        return
+    if instance.status == 'VERIFIED':
+        refresh_leaderboard_entry(instance.test_id, instance.athlete_id)
+        withdraw_verified_value(instance.test_id, instance.value)
+
+
+# Bulk writes skip model signals, so bulk_create callers hand their rows to
+# performances_bulk_created for the same bookkeeping
+
+# Above this many athletes of one test, a full rebuild beats shifting ranks per entry
+BULK_REBUILD_THRESHOLD = 100
+
+
+def performances_bulk_created(performances):
+    performances_added(performances)
+
+    athletes_by_test = {}
+    values_by_test = {}
+    for performance in performances:
+        if performance.status == 'VERIFIED':
+            athletes_by_test.setdefault(performance.test_id, set()).add(performance.athlete_id)
+            values_by_test.setdefault(performance.test_id, []).append(performance.value)
+
+    for test_id, athlete_ids in athletes_by_test.items():
+        if len(athlete_ids) > BULK_REBUILD_THRESHOLD:
+            rebuild_leaderboard(test_id)
+        else:
+            for athlete_id in sorted(athlete_ids):
+                refresh_leaderboard_entry(test_id, athlete_id)
+        record_verified_values(test_id, values_by_test[test_id])
+
+
+# Test signals
+
+
+@receiver(post_init, sender=Test)
+def track_test_direction(sender, instance, **kwargs):
+    instance._original_scoring_direction = instance.__dict__.get('scoring_direction')
+
+
+@receiver(post_save, sender=Test)
+def test_saved(sender, instance, created, **kwargs):
+    # Flipping the scoring direction reverses every rank of the test
+    if not created and instance._original_scoring_direction not in (None, instance.scoring_direction):
+        rebuild_leaderboard(instance.id)
+    instance._original_scoring_direction = instance.scoring_direction
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Test)
+def test_deleted(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+# Athlete signals
+
+
+@receiver(post_save, sender=Athlete)
+def athlete_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_athlete_dimensions(instance)
+    touch_profile(instance.user_id)
+
+
+@receiver(post_delete, sender=Athlete)
+def athlete_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_with(origin, User):
+        touch_profile(instance.user_id)
+
+
+@receiver(pre_delete, sender=Athlete)
+def athlete_deleting(sender, instance, **kwargs):
+    remove_athlete_from_leaderboards(instance.pk)
+    verified = Performance.objects.filter(athlete_id=instance.pk, status='VERIFIED')
+    for test_id, value in verified.values_list('test_id', 'value'):
+        withdraw_verified_value(test_id, value)
+
+
+# User signals
+
+
+def _remember_credentials(instance):
+    instance._original_password = instance.__dict__.get('password')
+    instance._original_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_init, sender=User)
+def track_user_credentials(sender, instance, **kwargs):
+    _remember_credentials(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    invalidate_profile(instance.pk)
+    # A new password or a deactivation ends every session issued before it
+    password_changed = instance._original_password not in (None, instance.password)
+    deactivated = instance._original_is_active and not instance.is_active
+    if not created and (password_changed or deactivated):
+        revoke_user_tokens(instance.pk)
+    _remember_credentials(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+# Badge signals
+
+
+@receiver(post_save, sender=AthleteBadge)
+def badge_awarded(sender, instance, created, **kwargs):
+    if created:
+        badge_changed(instance.athlete_id, instance.badge.points)
+
+
+@receiver(post_delete, sender=AthleteBadge)
+def badge_revoked(sender, instance, origin=None, **kwargs):
+    if not _deleted_with(origin, Athlete, User):
+        badge_changed(instance.athlete_id, instance.badge.points, awarded=False)
@@ -0,0 +1,240 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Subquery, Sum, When, Window
+from django.db.models.functions import Rank, RowNumber
+from .models import Athlete, AthleteBadge, AthleteStats, LeaderboardEntry, Performance, SystemSettings
+
+# Athlete statistics counters
+#
+# AthleteStats rows are kept current with relative F() updates, so concurrent
+# writers never overwrite each other's increments and readers get every
+# counter from a single row. Signal handlers cover single saves and deletes;
+# bulk_create paths pass their rows to performances_added.
+#
+# recount_athlete_stats recomputes the counters from scratch and is the repair
+# path if they ever drift. current_rank is not a counter: compute_overall_ranks
+# derives it from total_points in a periodic batch job. Its writes shift ranks
+# relative to the ranks it read, so runs hold a lock on a SystemSettings row
+# and never interleave.
+#
+# best_performances maps test id to the athlete's best verified result of that
+# test ({value, performance_id, achieved_at}). It is written wherever the
+# leaderboard entry is, from the same best performance, and
+# rebuild_personal_bests recomputes it.
+
+STATUS_COUNTERS = {
+    'PENDING': 'pending_performances',
+    'VERIFIED': 'verified_performances',
+    'FLAGGED': 'flagged_performances',
+}
+COUNTERS = ['total_performances', *STATUS_COUNTERS.values(), 'total_badges', 'total_points']
+RANK_BATCH_SIZE = 2000
+OVERALL_RANK_LOCK_KEY = 'overall_rank_lock'
+# Rank shifts shared by fewer rows are written with bulk_update instead
+SHIFT_MIN_ROWS = 50
+
+
+def apply_deltas(deltas_by_athlete):
+    """Add {athlete_id: {counter: delta}} to the stats rows, creating missing rows"""
+    # Athletes with identical deltas (the common case for bulk writes) share one UPDATE
+    athletes_by_deltas = {}
+    for athlete_id, deltas in deltas_by_athlete.items():
+        deltas = tuple(sorted((field, delta) for field, delta in deltas.items() if delta))
+        if deltas:
+            athletes_by_deltas.setdefault(deltas, []).append(athlete_id)
+
+    for deltas, athlete_ids in athletes_by_deltas.items():
+        existing = set(AthleteStats.objects.filter(athlete_id__in=athlete_ids).values_list('athlete_id', flat=True))
+        missing = [athlete_id for athlete_id in athlete_ids if athlete_id not in existing]
+        if missing:
+            AthleteStats.objects.bulk_create(
+                [AthleteStats(athlete_id=athlete_id) for athlete_id in missing], ignore_conflicts=True
+            )
+        AthleteStats.objects.filter(athlete_id__in=athlete_ids).update(
+            **{field: F(field) + delta for field, delta in deltas}
+        )
+
+
+def performance_deltas(old_status=None, new_status=None):
+    """Counter changes for a performance moving between statuses (None: absent)"""
+    deltas = Counter()
+    if old_status is None:
+        deltas['total_performances'] += 1
+    if new_status is None:
+        deltas['total_performances'] -= 1
+    if old_status in STATUS_COUNTERS:
+        deltas[STATUS_COUNTERS[old_status]] -= 1
+    if new_status in STATUS_COUNTERS:
+        deltas[STATUS_COUNTERS[new_status]] += 1
+    return deltas
+
+
+def performance_changed(athlete_id, old_status=None, new_status=None):
+    apply_deltas({athlete_id: performance_deltas(old_status, new_status)})
+
+
+def performances_added(performances):
+    deltas_by_athlete = {}
+    for performance in performances:
+        deltas_by_athlete.setdefault(performance.athlete_id, Counter()).update(
+            performance_deltas(new_status=performance.status)
+        )
+    apply_deltas(deltas_by_athlete)
+
+
+def badge_changed(athlete_id, points, awarded=True):
+    sign = 1 if awarded else -1
+    apply_deltas({athlete_id: {'total_badges': sign, 'total_points': sign * points}})
+
+
+def recount_athlete_stats(athlete_ids):
+    """Recompute the counters of the given athletes from their rows"""
+    performance_counts = {
+        row['athlete_id']: row
+        for row in Performance.objects.filter(athlete_id__in=athlete_ids).order_by().values('athlete_id').annotate(
+            total_performances=Count('id'),
+            **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_COUNTERS.items()}
+        )
+    }
+    badge_counts = {
+        row['athlete_id']: row
+        for row in AthleteBadge.objects.filter(athlete_id__in=athlete_ids).order_by().values('athlete_id').annotate(
+            total_badges=Count('id'), total_points=Sum('badge__points')
+        )
+    }
+
+    existing = {stats.athlete_id: stats for stats in AthleteStats.objects.filter(athlete_id__in=athlete_ids)}
+    rows = []
+    for athlete_id in Athlete.objects.filter(id__in=athlete_ids).values_list('id', flat=True):
+        stats = existing.get(athlete_id) or AthleteStats(athlete_id=athlete_id)
+        counts = {**performance_counts.get(athlete_id, {}), **badge_counts.get(athlete_id, {})}
+        for field in COUNTERS:
+            setattr(stats, field, counts.get(field) or 0)
+        rows.append(stats)
+
+    AthleteStats.objects.bulk_create([stats for stats in rows if stats.pk is None])
+    AthleteStats.objects.bulk_update([stats for stats in rows if stats.pk is not None], COUNTERS)
+    return len(rows)
+
+
+def write_ranks(model, field, changed, batch_size=RANK_BATCH_SIZE):
+    """Store new ranks given as (pk, old rank, new rank) tuples, touching only those rows
+
+    Shared shifts are applied relative to the stored rank, so the caller must
+    hold a lock that keeps other rank writers out from reading to writing.
+    """
+    # One athlete moving shifts everyone between its old and new place by the
+    # same amount, so most changed rows share a delta and a plain UPDATE
+    pks_by_delta = {}
+    for pk, old_rank, new_rank in changed:
+        pks_by_delta.setdefault(new_rank - old_rank, []).append(pk)
+
+    scattered = []
+    for delta, pks in pks_by_delta.items():
+        if len(pks) < SHIFT_MIN_ROWS:
+            scattered.extend(pks)
+            continue
+        for start in range(0, len(pks), batch_size):
+            model.objects.filter(pk__in=pks[start:start + batch_size]).update(**{field: F(field) + delta})
+
+    new_ranks = {pk: new_rank for pk, _, new_rank in changed}
+    for start in range(0, len(scattered), batch_size):
+        model.objects.bulk_update([
+            model(pk=pk, **{field: new_ranks[pk]}) for pk in scattered[start:start + batch_size]
+        ], [field])
+
+
+def _lock_overall_ranks():
+    SystemSettings.objects.get_or_create(
+        key=OVERALL_RANK_LOCK_KEY,
+        defaults={'value': '', 'description': 'Locked while overall athlete ranks are written'}
+    )
+    SystemSettings.objects.select_for_update().filter(key=OVERALL_RANK_LOCK_KEY).get()
+
+
+@transaction.atomic
+def compute_overall_ranks(batch_size=RANK_BATCH_SIZE):
+    """Rank every athlete by total_points with one RANK() pass, writing only changed ranks"""
+    # A concurrent run would apply its shifts on top of ours; wait for it instead
+    _lock_overall_ranks()
+    changed = list(
+        AthleteStats.objects.order_by().annotate(
+            new_rank=Window(Rank(), order_by=F('total_points').desc())
+        ).exclude(current_rank=F('new_rank')).values_list('id', 'current_rank', 'new_rank')
+    )
+    # Only current_rank is written, so concurrent counter updates are never overwritten
+    write_ranks(AthleteStats, 'current_rank', changed, batch_size)
+    return len(changed)
+
+
+def personal_best(performance_id, value, achieved_at):
+    return {'value': value, 'performance_id': performance_id, 'achieved_at': achieved_at.isoformat()}
+
+
+def set_personal_best(athlete_id, test_id, best):
+    """Store an athlete's best performance of a test, or drop it when `best` is None"""
+    stats, _ = AthleteStats.objects.select_for_update().get_or_create(athlete_id=athlete_id)
+    if best is None:
+        if stats.best_performances.pop(test_id, None) is None:
+            return
+    else:
+        stats.best_performances[test_id] = personal_best(best.id, best.value, best.created_at)
+    stats.save(update_fields=['best_performances', 'updated_at'])
+
+
+def set_test_bests(test_id, entries):
+    """Replace every athlete's best of one test with the given leaderboard entries"""
+    bests = {
+        entry.athlete_id: personal_best(entry.performance_id, entry.best_value, entry.achieved_at)
+        for entry in entries
+    }
+    ranked = LeaderboardEntry.objects.filter(test_id=test_id).values('athlete_id')
+    AthleteStats.objects.bulk_create(
+        [AthleteStats(athlete_id=athlete_id)
+         for athlete_id in Athlete.objects.filter(id__in=Subquery(ranked), stats__isnull=True).values_list('id', flat=True)],
+        ignore_conflicts=True
+    )
+
+    rows = []
+    for stats in AthleteStats.objects.select_for_update().filter(
+        Q(athlete_id__in=Subquery(ranked)) | Q(best_performances__has_key=test_id)
+    ).only('id', 'athlete_id', 'best_performances'):
+        best = bests.get(stats.athlete_id)
+        if best is None:
+            stats.best_performances.pop(test_id, None)
+        else:
+            stats.best_performances[test_id] = best
+        rows.append(stats)
+    AthleteStats.objects.bulk_update(rows, ['best_performances'], batch_size=1000)
+
+
+def rebuild_personal_bests(athlete_ids):
+    """Recompute best_performances of the given athletes with one window query"""
+    sort_value = Case(
+        When(test__scoring_direction='HIGHER', then=-F('value')),
+        default=F('value'), output_field=FloatField()
+    )
+    bests = Performance.objects.filter(athlete_id__in=athlete_ids, status='VERIFIED').annotate(
+        best_row=Window(
+            RowNumber(), partition_by=[F('athlete_id'), F('test_id')],
+            order_by=[sort_value.asc(), F('created_at').asc()]
+        )
+    ).filter(best_row=1).values_list('athlete_id', 'test_id', 'id', 'value', 'created_at')
+
+    bests_by_athlete = {}
+    for athlete_id, test_id, performance_id, value, created_at in bests:
+        bests_by_athlete.setdefault(athlete_id, {})[test_id] = personal_best(performance_id, value, created_at)
+
+    existing = {
+        stats.athlete_id: stats
+        for stats in AthleteStats.objects.filter(athlete_id__in=athlete_ids).only('id', 'athlete_id')
+    }
+    rows = []
+    for athlete_id in Athlete.objects.filter(id__in=athlete_ids).values_list('id', flat=True):
+        stats = existing.get(athlete_id) or AthleteStats(athlete_id=athlete_id)
+        stats.best_performances = bests_by_athlete.get(athlete_id, {})
+        rows.append(stats)
+
+    AthleteStats.objects.bulk_create([stats for stats in rows if stats.pk is None])
+    AthleteStats.objects.bulk_update([stats for stats in rows if stats.pk is not None], ['best_performances'])
+    return len(rows)
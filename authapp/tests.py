@@ -1,3 +1,1628 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from random import Random
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connection
+from django.db.models import F
+from django.core.handlers.asgi import ASGIRequest
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import ClaimsRefreshToken
+from .models import (
+    User, Athlete, Test, Performance, OneTimeToken, IdempotencyKey, LeaderboardEntry, AthleteStats,
+    TestDistribution, Badge, AthleteBadge, SystemSettings, UploadSession
+)
+from . import leaderboard, views
+from .leaderboard import recompute_ranks, ranked_best_performances, rebuild_leaderboard
+from .ranking import InMemoryRankingBackend, DatabaseRankingBackend, warm_ranking_backend
+from .stats import (
+    COUNTERS, OVERALL_RANK_LOCK_KEY, SHIFT_MIN_ROWS, compute_overall_ranks, recount_athlete_stats,
+    rebuild_personal_bests
+)
+from .distributions import DIGEST_COMPRESSION, TDigest, rebuild_distribution
+from .media import (
+    RETRY_BASE_DELAY, UPLOAD_LEASE, LocalMediaBackend, claim_pending_uploads, process_pending_uploads
+)
+from .passwords import authenticate_credentials, hash_timings
+from .one_time_tokens import (
+    PASSWORD_RESET, EMAIL_VERIFICATION, issue_token, redeem_token, purge_expired_tokens
+)
+from .revocation import BloomFilter, RevocationList, get_revocation_list, revoke_user_tokens
 
-# Create your tests here.
+
+def bearer(user):
+    # Tokens as issued by login, carrying the role and athlete claims
+    return f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+
+
+def create_athlete(email, **fields):
+    user = User.objects.create_user(username=email, email=email, password='x')
+    profile = {
+        'first_name': 'Test', 'last_name': 'Athlete', 'date_of_birth': '2004-05-01', 'gender': 'MALE',
+        'phone': '9000000000', 'state': 'Kerala', 'district': 'Kochi', 'address': '1 Main Road',
+        'sport': 'ATHLETICS', 'category': 'SPRINTS'
+    }
+    return Athlete.objects.create(user=user, **{**profile, **fields})
+
+
+# The warm-up thread reads on a connection of its own, which cannot see the test transactions
+request_started.disconnect(warm_ranking_backend)
+
+# A periodic revocation list sync falling inside a measured block would add a query
+steady_revocations = override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=3600)
+
+
+@steady_revocations
+class MyPerformancesQueryTests(TestCase):
+    # Filtered count and one joined page query; the user and athlete come from the token
+    EXPECTED_QUERIES = 2
+    # Pages after the first skip the count
+    CURSOR_PAGE_QUERIES = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='runner@example.com', email='runner@example.com', password='x')
+        cls.athlete = Athlete.objects.create(
+            user=cls.user, first_name='Asha', last_name='Rao', date_of_birth='2004-05-01', gender='FEMALE',
+            phone='9000000000', state='Kerala', district='Kochi', address='1 Main Road',
+            sport='ATHLETICS', category='SPRINTS'
+        )
+        cls.sprint = Test.objects.create(name='100m Sprint', unit='seconds', scoring_direction='LOWER')
+        cls.jump = Test.objects.create(name='Long Jump', unit='meters', scoring_direction='HIGHER')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        self.url = reverse('get_my_performances')
+        # The first request of a process loads the revocation list; keep it out of the counts
+        self.client.get(self.url)
+
+    def submit(self, test, count, status='PENDING'):
+        for index in range(count):
+            Performance.objects.create(athlete=self.athlete, test=test, value=10 + index, status=status)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.submit(self.sprint, 1)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['data']['performances']), 1)
+
+        self.submit(self.jump, 9)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url, {'limit': 10})
+        performances = response.data['data']['performances']
+        self.assertEqual(len(performances), 10)
+        self.assertEqual(
+            {(row['test_name'], row['test_unit']) for row in performances},
+            {('100m Sprint', 'seconds'), ('Long Jump', 'meters')}
+        )
+        self.assertTrue(all(row['athlete_name'] == 'Asha Rao' for row in performances))
+
+    def test_total_respects_filters(self):
+        self.submit(self.sprint, 3)
+        self.submit(self.sprint, 2, status='VERIFIED')
+        self.submit(self.jump, 4)
+
+        response = self.client.get(self.url, {'testId': self.sprint.id, 'limit': 2})
+        self.assertEqual(response.data['data']['pagination']['total'], 5)
+        self.assertEqual(len(response.data['data']['performances']), 2)
+
+        response = self.client.get(self.url, {'testId': self.sprint.id, 'status': 'VERIFIED'})
+        self.assertEqual(response.data['data']['pagination']['total'], 2)
+        self.assertTrue(all(row['status'] == 'VERIFIED' for row in response.data['data']['performances']))
+
+    def test_cursor_pages_cover_every_row_once(self):
+        self.submit(self.sprint, 7)
+        self.submit(self.jump, 6)
+        expected = list(Performance.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen = []
+        params = {'limit': 5}
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['data']['pagination']['total'], 13)
+        while True:
+            data = response.data['data']
+            seen.extend(row['id'] for row in data['performances'])
+            if data['pagination']['nextCursor'] is None:
+                break
+            params = {'limit': 5, 'cursor': data['pagination']['nextCursor']}
+            with self.assertNumQueries(self.CURSOR_PAGE_QUERIES):
+                response = self.client.get(self.url, params)
+            self.assertIsNone(response.data['data']['pagination']['total'])
+        self.assertEqual(seen, expected)
+
+    def test_limit_is_capped_and_cursor_validated(self):
+        response = self.client.get(self.url, {'limit': 100000})
+        self.assertEqual(response.data['data']['pagination']['limit'], 100)
+
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+@steady_revocations
+class AthleteListQueryTests(TestCase):
+    # One query per page for athletes, emails and counts; the admin role comes from the token
+    EXPECTED_QUERIES = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com',
+                                             password='x', role='ADMIN')
+        cls.test = Test.objects.create(name='100m Sprint', unit='seconds', scoring_direction='LOWER')
+        for index in range(12):
+            user = User.objects.create_user(username=f'athlete{index}@example.com',
+                                            email=f'athlete{index}@example.com', password='x')
+            athlete = Athlete.objects.create(
+                user=user, first_name='Athlete', last_name=str(index), date_of_birth='2004-05-01',
+                gender='MALE', phone='9000000000', state='Kerala', district='Kochi' if index % 2 else 'Thrissur',
+                address='1 Main Road', sport='ATHLETICS' if index % 3 else 'SWIMMING', category='SPRINTS'
+            )
+            for status in ['VERIFIED'] * (index % 4) + ['PENDING']:
+                Performance.objects.create(athlete=athlete, test=cls.test, value=12 + index, status=status)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.admin))
+        self.url = reverse('get_athletes')
+        # Keep the first revocation list load out of the counts
+        self.client.get(self.url)
+
+    def test_pages_list_every_athlete_with_counts_in_bounded_queries(self):
+        expected = {
+            athlete.id: athlete.performances.filter(status='VERIFIED').count()
+            for athlete in Athlete.objects.all()
+        }
+        listed = {}
+        params = {'limit': 5}
+        while True:
+            with self.assertNumQueries(self.EXPECTED_QUERIES):
+                response = self.client.get(self.url, params)
+            data = response.data['data']
+            for row in data['athletes']:
+                self.assertNotIn(row['id'], listed)
+                self.assertTrue(row['user_email'].endswith('@example.com'))
+                listed[row['id']] = row['performance_count']
+            if data['pagination']['nextCursor'] is None:
+                break
+            params = {'limit': 5, 'cursor': data['pagination']['nextCursor']}
+        self.assertEqual(listed, expected)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads the SQLite query plan')
+    def test_page_query_stops_at_the_limit(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'limit': 5})
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[-1]['sql']}")
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        # Sorting or grouping in a temp B-tree means every athlete is read before the LIMIT applies
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_filters(self):
+        response = self.client.get(self.url, {'sport': 'SWIMMING', 'district': 'Kochi'})
+        athletes = Athlete.objects.filter(sport='SWIMMING', district='Kochi')
+        self.assertEqual({row['id'] for row in response.data['data']['athletes']},
+                         set(athletes.values_list('id', flat=True)))
+
+        response = self.client.get(self.url, {'sport': 'CHESS'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_admin(self):
+        athlete_user = User.objects.get(username='athlete0@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(athlete_user))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+@steady_revocations
+class TestCatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='coach@example.com', email='coach@example.com', password='x')
+        cls.sprint = Test.objects.create(name='100m Sprint', unit='seconds', scoring_direction='LOWER')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        self.url = reverse('get_all_tests')
+        self.client.get(self.url)
+
+    def test_cached_catalog_only_reads_the_version(self):
+        # Only the catalog version
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual([test['name'] for test in response.data['data']['tests']], ['100m Sprint'])
+
+    def test_unchanged_catalog_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        detail_url = reverse('get_test_by_id', args=[self.sprint.id])
+        detail_etag = self.client.get(detail_url)['ETag']
+        self.assertNotEqual(detail_etag, etag)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 304)
+
+    def test_saving_a_test_changes_the_catalog(self):
+        etag = self.client.get(self.url)['ETag']
+        jump = Test.objects.create(name='Long Jump', unit='meters', scoring_direction='HIGHER')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['data']['tests']), 2)
+
+        jump.is_active = False
+        jump.save()
+        self.assertEqual(self.client.get(reverse('get_test_by_id', args=[jump.id])).status_code, 404)
+        self.assertEqual(len(self.client.get(self.url).data['data']['tests']), 1)
+
+
+@steady_revocations
+class ProfileCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='swimmer@example.com', email='swimmer@example.com',
+                                            password='secret-pass-1')
+        cls.athlete = Athlete.objects.create(
+            user=cls.user, first_name='Meera', last_name='Nair', date_of_birth='2003-02-11', gender='FEMALE',
+            phone='9000000001', state='Kerala', district='Kochi', address='2 Lake Road',
+            sport='SWIMMING', category='FREESTYLE'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        self.url = reverse('get_profile')
+        self.client.get(self.url)
+
+    def test_cached_profile_only_reads_the_user(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['data']['user']['athlete']['first_name'], 'Meera')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_athlete_save_invalidates_profile_and_login(self):
+        etag = self.client.get(self.url)['ETag']
+        athlete = Athlete.objects.get(pk=self.athlete.pk)
+        athlete.first_name = 'Meenakshi'
+        athlete.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['user']['athlete']['first_name'], 'Meenakshi')
+
+        response = APIClient().post(reverse('login'), {'email': 'swimmer@example.com', 'password': 'secret-pass-1'})
+        self.assertEqual(response.data['data']['user']['profile']['firstName'], 'Meenakshi')
+        self.assertEqual(response.data['data']['user']['athlete']['first_name'], 'Meenakshi')
+
+
+@steady_revocations
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='official@example.com', email='official@example.com',
+                                            password='x')
+
+    def test_user_without_athlete_is_rejected_without_queries(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        client.get(reverse('get_my_performances'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('get_my_performances'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_refresh_restamps_claims_from_the_database(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.assertEqual(refresh.access_token['role'], 'ATHLETE')
+        User.objects.filter(pk=self.user.pk).update(role='ADMIN')
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'ADMIN')
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+
+class TokenRevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jumper@example.com', email='jumper@example.com',
+                                            password='old-pass-1')
+
+    def setUp(self):
+        # Drop revocations applied in memory by earlier tests, whose rows were rolled back
+        get_revocation_list().sync(full=True)
+
+    def earlier_tokens(self):
+        # Revocation has one-second granularity, so date the session before the revoking second
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        refresh.set_iat(at_time=timezone.now() - timedelta(seconds=5))
+        return refresh, refresh.access_token
+
+    def profile_status(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.get(reverse('get_profile')).status_code
+
+    def test_password_reset_revokes_earlier_tokens(self):
+        refresh, access = self.earlier_tokens()
+        self.assertEqual(self.profile_status(access), 200)
+        reset_token = issue_token(self.user, PASSWORD_RESET)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(reverse('reset_password'),
+                                        {'token': reset_token, 'new_password': 'new-pass-2024'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.profile_status(access), 401)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+        response = APIClient().post(reverse('login'), {'email': 'jumper@example.com', 'password': 'new-pass-2024'})
+        self.assertEqual(self.profile_status(response.data['data']['token']), 200)
+
+    def test_deactivation_revokes_tokens_and_other_saves_do_not(self):
+        _, access = self.earlier_tokens()
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = 'Kiran'
+            user.save()
+        self.assertEqual(self.profile_status(access), 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.profile_status(access), 401)
+
+    def test_logout_revokes_the_presented_tokens(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('logout'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(client.get(reverse('get_profile')).status_code, 401)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.profile_status(ClaimsRefreshToken.for_user(self.user).access_token), 200)
+
+    def test_other_workers_pick_revocations_up_on_sync(self):
+        _, access = self.earlier_tokens()
+        worker = RevocationList()
+        worker.sync(full=True)
+        self.assertFalse(worker.is_revoked(access))
+
+        revoke_user_tokens(self.user.pk)
+        self.assertFalse(worker.is_revoked(access))
+        worker.sync()
+        self.assertTrue(worker.is_revoked(access))
+        self.assertFalse(worker.is_revoked(ClaimsRefreshToken.for_user(self.user).access_token))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        for index in range(1000):
+            bloom.add(f'jti:{index}')
+        self.assertTrue(all(f'jti:{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other:{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class OneTimeTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rower@example.com', email='rower@example.com',
+                                            password='old-pass-1')
+
+    def test_tokens_are_stored_hashed_and_redeemed_once(self):
+        token = issue_token(self.user, PASSWORD_RESET)
+        self.assertFalse(OneTimeToken.objects.filter(token_hash=token).exists())
+        self.assertIsNone(redeem_token(token, EMAIL_VERIFICATION))
+
+        # One indexed DELETE ... RETURNING
+        with self.assertNumQueries(1):
+            self.assertEqual(redeem_token(token, PASSWORD_RESET), self.user.pk)
+        self.assertIsNone(redeem_token(token, PASSWORD_RESET))
+
+    def test_new_token_replaces_the_outstanding_one(self):
+        first = issue_token(self.user, PASSWORD_RESET)
+        second = issue_token(self.user, PASSWORD_RESET)
+        self.assertIsNone(redeem_token(first, PASSWORD_RESET))
+        self.assertEqual(redeem_token(second, PASSWORD_RESET), self.user.pk)
+
+    def test_reset_password_rejects_expired_and_keeps_token_on_invalid_password(self):
+        token = issue_token(self.user, PASSWORD_RESET)
+        response = APIClient().post(reverse('reset_password'), {'token': token, 'new_password': 'short'})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(OneTimeToken.objects.filter(user=self.user).exists())
+
+        OneTimeToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        response = APIClient().post(reverse('reset_password'), {'token': token, 'new_password': 'new-pass-2024'})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('old-pass-1'))
+
+    def test_verify_email(self):
+        token = issue_token(self.user, EMAIL_VERIFICATION)
+        response = APIClient().post(reverse('verify_email'), {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_email_verified)
+        self.assertEqual(APIClient().post(reverse('verify_email'), {'token': token}).status_code, 400)
+
+    def test_purge_removes_only_expired_tokens_in_batches(self):
+        for index in range(5):
+            user = User.objects.create_user(username=f'user{index}@example.com', email=f'user{index}@example.com')
+            issue_token(user, EMAIL_VERIFICATION)
+        OneTimeToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        live = issue_token(self.user, PASSWORD_RESET)
+
+        self.assertEqual(purge_expired_tokens(batch_size=2), 5)
+        self.assertEqual(redeem_token(live, PASSWORD_RESET), self.user.pk)
+
+
+class LoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='diver@example.com', email='diver@example.com',
+                                            password='dive-pass-1')
+        Athlete.objects.create(
+            user=cls.user, first_name='Tara', last_name='Das', date_of_birth='2005-07-21', gender='FEMALE',
+            phone='9000000002', state='Goa', district='Panaji', address='3 Beach Road',
+            sport='SWIMMING', category='FREESTYLE'
+        )
+
+    def login(self, password, email='diver@example.com'):
+        return APIClient().post(reverse('login'), {'email': email, 'password': password})
+
+    def test_login_reads_the_user_once(self):
+        self.login('dive-pass-1')
+        # User and athlete in one query; the profile payload comes from the cache
+        with self.assertNumQueries(1):
+            response = self.login('dive-pass-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['data']['token'])['athlete_id'], self.user.athlete.pk)
+
+    def test_rejects_wrong_password_unknown_email_and_inactive_user(self):
+        self.assertEqual(self.login('wrong-pass').status_code, 400)
+        self.assertEqual(self.login('dive-pass-1', email='nobody@example.com').status_code, 400)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('dive-pass-1').status_code, 400)
+
+    def test_asgi_requests_hash_in_the_pool_and_are_timed(self):
+        request = ASGIRequest({'type': 'http', 'method': 'POST', 'path': '/', 'headers': []}, io.BytesIO())
+        checks = hash_timings.checks
+        self.assertEqual(authenticate_credentials(request, 'diver@example.com', 'dive-pass-1'), self.user)
+        self.assertIsNone(authenticate_credentials(request, 'diver@example.com', 'wrong-pass'))
+        self.assertEqual(hash_timings.checks, checks + 2)
+
+
+class IdempotencyTests(TestCase):
+    REGISTRATION = {
+        'email': 'swimmer@example.com', 'password': 'swim-pass-2024', 'first_name': 'Mira', 'last_name': 'Shah',
+        'date_of_birth': '2006-02-11', 'gender': 'FEMALE', 'phone': '9000000003', 'state': 'Gujarat',
+        'district': 'Surat', 'address': '4 River Road', 'sport': 'SWIMMING', 'category': 'FREESTYLE'
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='thrower@example.com', email='thrower@example.com', password='x')
+        Athlete.objects.create(
+            user=cls.user, first_name='Ravi', last_name='Nair', date_of_birth='2003-09-30', gender='MALE',
+            phone='9000000004', state='Kerala', district='Kochi', address='5 Hill Road',
+            sport='ATHLETICS', category='THROWS'
+        )
+        cls.shot_put = Test.objects.create(name='Shot Put', unit='meters', scoring_direction='HIGHER')
+
+    def register(self, key, **changes):
+        return APIClient().post(reverse('register_athlete'), {**self.REGISTRATION, **changes},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def submit(self, key, value):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        return client.post(reverse('submit_performance'), {'test': self.shot_put.id, 'value': value},
+                           HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_submission(self):
+        first = self.submit('throw-1', 14.2)
+        retry = self.submit('throw-1', 14.2)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Performance.objects.filter(athlete__user=self.user).count(), 1)
+
+    def test_key_reused_with_a_different_body_is_refused(self):
+        self.assertEqual(self.submit('throw-2', 14.2).status_code, 201)
+        self.assertEqual(self.submit('throw-2', 15.0).status_code, 422)
+        self.assertEqual(Performance.objects.filter(athlete__user=self.user).count(), 1)
+
+    def test_anonymous_key_reuse_does_not_leak_another_registration(self):
+        self.assertEqual(self.register('signup').status_code, 201)
+        response = self.register('signup', email='intruder@example.com')
+        self.assertEqual(response.status_code, 422)
+        self.assertNotIn('data', response.data)
+        self.assertFalse(User.objects.filter(email='intruder@example.com').exists())
+
+    def test_registration_replay_issues_a_new_token_and_stores_none(self):
+        first = self.register('signup')
+        retry = self.register('signup')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['data']['user'], first.data['data']['user'])
+        token = AccessToken(retry.data['data']['token'])
+        self.assertEqual(str(token['user_id']), str(first.data['data']['user']['id']))
+        self.assertIsNone(IdempotencyKey.objects.get(scope='register_athlete').response_body['data']['token'])
+
+    def test_failed_request_releases_the_key(self):
+        self.assertEqual(self.register('signup', password='short').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.register('signup').status_code, 201)
+
+
+class ImportResultsTests(TestCase):
+    PROFILE = {
+        'first_name': 'Kiran', 'last_name': 'Bose', 'date_of_birth': '2002-03-14', 'gender': 'male',
+        'phone': '9000000005', 'state': 'Assam', 'district': 'Guwahati', 'address': '6 Tea Road',
+        'sport': 'athletics', 'category': 'sprints'
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sprinter@example.com', email='sprinter@example.com', password='x')
+        cls.athlete = Athlete.objects.create(
+            user=cls.user, first_name='Asha', last_name='Rao', date_of_birth='2004-05-01', gender='FEMALE',
+            phone='9000000000', state='Kerala', district='Kochi', address='1 Main Road',
+            sport='ATHLETICS', category='SPRINTS'
+        )
+        cls.sprint = Test.objects.create(name='100m Sprint', unit='seconds', scoring_direction='LOWER')
+
+    def import_records(self, records, *args):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.ndjson')
+        with open(path, 'w') as stream:
+            stream.writelines(json.dumps(record) + '\n' for record in records)
+        rejects = os.path.join(directory, 'rejects.ndjson')
+        call_command('import_results', path, '--rejects', rejects, *args, stdout=io.StringIO())
+        with open(rejects) as stream:
+            return [json.loads(line) for line in stream]
+
+    def test_imports_rows_creates_athletes_and_rebuilds_the_leaderboard(self):
+        rejects = self.import_records([
+            {'test': '100m sprint', 'email': 'sprinter@example.com', 'value': 12.1},
+            {'test': self.sprint.id, 'email': 'new@example.com', 'value': 11.8, **self.PROFILE},
+            {'test': 'Marathon', 'email': 'sprinter@example.com', 'value': 10},
+            {'test': self.sprint.id, 'email': 'sprinter@example.com', 'value': 'fast'},
+        ], '--create-athletes')
+
+        self.assertEqual(sorted(reject['line'] for reject in rejects), [3, 4])
+        created = Athlete.objects.get(user__email='new@example.com')
+        self.assertEqual((created.gender, created.category), ('MALE', 'SPRINTS'))
+        self.assertFalse(created.user.has_usable_password())
+        entries = LeaderboardEntry.objects.filter(test=self.sprint).order_by('rank')
+        self.assertEqual([(entry.athlete_id, entry.rank) for entry in entries], [(created.id, 1), (self.athlete.id, 2)])
+        self.assertEqual(AthleteStats.objects.get(athlete=created).verified_performances, 1)
+
+    def test_email_used_as_another_username_is_rejected(self):
+        User.objects.create_user(username='taken@example.com', email='other@example.com', password='x')
+        rejects = self.import_records([
+            {'test': self.sprint.id, 'email': 'taken@example.com', 'value': 11.5, **self.PROFILE},
+            {'test': self.sprint.id, 'email': 'sprinter@example.com', 'value': 12.4},
+        ], '--create-athletes')
+
+        self.assertEqual(list(rejects[0]['errors']), ['email'])
+        self.assertFalse(Athlete.objects.filter(user__username='taken@example.com').exists())
+        self.assertEqual(Performance.objects.filter(athlete=self.athlete).count(), 1)
+
+    def test_committed_chunks_get_their_leaderboard_when_a_later_chunk_fails(self):
+        records = [
+            {'test': self.sprint.id, 'email': 'sprinter@example.com', 'value': 12.4},
+            {'test': self.sprint.id, 'email': 'sprinter@example.com', 'value': 12.0},
+        ]
+        with mock.patch('authapp.management.commands.import_results.performances_added',
+                        side_effect=[None, RuntimeError('disk full')]):
+            with self.assertRaises(RuntimeError):
+                self.import_records(records, '--batch-size', '1')
+
+        self.assertEqual(Performance.objects.filter(athlete=self.athlete).count(), 1)
+        entry = LeaderboardEntry.objects.get(test=self.sprint, athlete=self.athlete)
+        self.assertEqual((entry.best_value, entry.rank), (12.4, 1))
+
+
+class RebuildStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jump = Test.objects.create(name='High Jump', unit='meters', scoring_direction='HIGHER')
+        cls.athletes = []
+        for index, values in enumerate([[1.8, 1.9], [2.0], [1.7]]):
+            user = User.objects.create_user(username=f'jumper{index}@example.com', email=f'jumper{index}@example.com')
+            athlete = Athlete.objects.create(
+                user=user, first_name='Jumper', last_name=str(index), date_of_birth='2001-01-01', gender='MALE',
+                phone=f'90000001{index:02d}', state='Punjab', district='Patiala', address='7 Field Road',
+                sport='ATHLETICS', category='JUMPS'
+            )
+            for value in values:
+                Performance.objects.create(athlete=athlete, test=cls.jump, value=value, status='VERIFIED')
+            cls.athletes.append(athlete)
+        # Every derived row lost, as after a bad deploy or a raw SQL fix
+        LeaderboardEntry.objects.all().delete()
+        TestDistribution.objects.all().delete()
+        AthleteStats.objects.all().delete()
+
+    def test_rebuilds_counters_bests_leaderboards_and_distributions(self):
+        call_command('rebuild_stats', '--workers', '0', stdout=io.StringIO())
+
+        stats = {stats.athlete_id: stats for stats in AthleteStats.objects.all()}
+        self.assertEqual(stats[self.athletes[0].id].verified_performances, 2)
+        self.assertEqual(stats[self.athletes[0].id].best_performances[self.jump.id]['value'], 1.9)
+        entries = LeaderboardEntry.objects.filter(test=self.jump).order_by('rank')
+        self.assertEqual(
+            [(entry.athlete_id, entry.best_value, entry.rank) for entry in entries],
+            [(self.athletes[1].id, 2.0, 1), (self.athletes[0].id, 1.9, 2), (self.athletes[2].id, 1.7, 3)]
+        )
+        distribution = TestDistribution.objects.get(test=self.jump)
+        self.assertEqual((distribution.count, distribution.min_value, distribution.max_value), (4, 1.7, 2.0))
+
+    def test_checkpoint_skips_finished_tests(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        checkpoint = os.path.join(directory, 'rebuild.json')
+        with open(checkpoint, 'w') as stream:
+            json.dump({'ranges': [[None, None]], 'done': [0], 'tests_done': [self.jump.id]}, stream)
+
+        call_command('rebuild_stats', '--workers', '0', '--checkpoint', checkpoint, stdout=io.StringIO())
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class LeaderboardMaintenanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='100m Sprint', unit='seconds', scoring_direction='LOWER')
+        cls.athletes = [create_athlete(f'sprinter{index}@example.com') for index in range(8)]
+
+    def board(self):
+        return set(LeaderboardEntry.objects.filter(test=self.sprint).values_list('athlete_id', 'best_value', 'rank'))
+
+    def expected_board(self):
+        bests = {}
+        for performance in Performance.objects.filter(test=self.sprint, status='VERIFIED'):
+            bests[performance.athlete_id] = min(performance.value, bests.get(performance.athlete_id, math.inf))
+        # Competition ranking: one plus the number of strictly better bests
+        return {(athlete_id, best, 1 + sum(other < best for other in bests.values())) for athlete_id, best in bests.items()}
+
+    def test_verifying_improving_and_withdrawing_shift_ranks(self):
+        first, second, third = self.athletes[:3]
+        Performance.objects.create(athlete=first, test=self.sprint, value=11.0, status='VERIFIED')
+        Performance.objects.create(athlete=second, test=self.sprint, value=12.0, status='VERIFIED')
+        pending = Performance.objects.create(athlete=third, test=self.sprint, value=10.5)
+        self.assertEqual(self.board(), {(first.id, 11.0, 1), (second.id, 12.0, 2)})
+
+        pending.status = 'VERIFIED'
+        pending.save()
+        self.assertEqual(self.board(), {(third.id, 10.5, 1), (first.id, 11.0, 2), (second.id, 12.0, 3)})
+
+        # A worse result does not replace the best; an equal best shares the rank
+        Performance.objects.create(athlete=first, test=self.sprint, value=13.0, status='VERIFIED')
+        Performance.objects.create(athlete=second, test=self.sprint, value=11.0, status='VERIFIED')
+        self.assertEqual(self.board(), {(third.id, 10.5, 1), (first.id, 11.0, 2), (second.id, 11.0, 2)})
+
+        pending.status = 'FLAGGED'
+        pending.save()
+        self.assertEqual(self.board(), {(first.id, 11.0, 1), (second.id, 11.0, 1)})
+        self.assertEqual(self.board(), self.expected_board())
+
+    def test_random_changes_keep_ranks_consistent(self):
+        # Few distinct values, so ties are frequent
+        values = [10.0, 10.5, 11.0, 11.5, 12.0]
+        statuses = ['PENDING', 'VERIFIED', 'VERIFIED', 'FLAGGED']
+        random = Random(20240501)
+        performances = []
+        for step in range(200):
+            operation = random.choice(['create', 'create', 'status', 'value', 'delete'])
+            if operation == 'create' or not performances:
+                performances.append(Performance.objects.create(
+                    athlete=random.choice(self.athletes), test=self.sprint,
+                    value=random.choice(values), status=random.choice(statuses)
+                ))
+            else:
+                performance = random.choice(performances)
+                if operation == 'status':
+                    performance.status = random.choice(statuses)
+                    performance.save()
+                elif operation == 'value':
+                    performance.value = random.choice(values)
+                    performance.save()
+                else:
+                    performances.remove(performance)
+                    performance.delete()
+            self.assertEqual(self.board(), self.expected_board(), f'after step {step} ({operation})')
+
+        # The periodic full recompute finds nothing to correct
+        self.assertEqual(recompute_ranks(), 0)
+
+
+class ScoringDirectionTests(TestCase):
+    def test_direction_is_derived_from_category_and_unit(self):
+        self.assertEqual(Test.objects.create(name='Sprint', category='SPRINTS', unit='seconds').scoring_direction, 'LOWER')
+        self.assertEqual(Test.objects.create(name='Triple Jump', category='JUMPS', unit='seconds').scoring_direction, 'HIGHER')
+        self.assertEqual(Test.objects.create(name='Squat', category='SPRINTS', unit='Kilograms').scoring_direction, 'HIGHER')
+        explicit = Test.objects.create(name='Golf', category='THROWS', unit='points', scoring_direction='LOWER')
+        self.assertEqual(Test.objects.get(pk=explicit.pk).scoring_direction, 'LOWER')
+
+    def test_higher_values_win_and_flipping_the_direction_reverses_the_board(self):
+        throw = Test.objects.create(name='Javelin', category='THROWS', unit='meters')
+        near, far = create_athlete('near@example.com'), create_athlete('far@example.com')
+        Performance.objects.create(athlete=near, test=throw, value=40.0, status='VERIFIED')
+        Performance.objects.create(athlete=far, test=throw, value=62.5, status='VERIFIED')
+        Performance.objects.create(athlete=far, test=throw, value=55.0, status='VERIFIED')
+
+        board = LeaderboardEntry.objects.filter(test=throw).order_by('rank')
+        self.assertEqual([(entry.athlete_id, entry.best_value, entry.rank) for entry in board],
+                         [(far.id, 62.5, 1), (near.id, 40.0, 2)])
+        self.assertEqual(AthleteStats.objects.get(athlete=far).best_performances[throw.id]['value'], 62.5)
+
+        throw.scoring_direction = 'LOWER'
+        throw.save()
+        board = LeaderboardEntry.objects.filter(test=throw).order_by('rank')
+        self.assertEqual([(entry.athlete_id, entry.best_value, entry.rank) for entry in board],
+                         [(near.id, 40.0, 1), (far.id, 55.0, 2)])
+
+
+class RankedBestPerformancesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='200m Sprint', unit='seconds', scoring_direction='LOWER')
+        cls.fast, cls.tied, cls.slow = (create_athlete(f'{name}@example.com') for name in ['fast', 'tied', 'slow'])
+        now = timezone.now()
+        for athlete, value, status, days_ago in [
+            (cls.fast, 21.5, 'VERIFIED', 3), (cls.fast, 22.0, 'VERIFIED', 2), (cls.fast, 20.0, 'PENDING', 1),
+            (cls.tied, 21.5, 'VERIFIED', 1), (cls.tied, 21.5, 'VERIFIED', 5),
+            (cls.slow, 23.0, 'VERIFIED', 4), (cls.slow, 19.0, 'FLAGGED', 4),
+        ]:
+            performance = Performance.objects.create(athlete=athlete, test=cls.sprint, value=value, status=status)
+            Performance.objects.filter(pk=performance.pk).update(created_at=now - timedelta(days=days_ago))
+
+    def test_one_ranked_row_per_athlete_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(ranked_best_performances(self.sprint).values_list('athlete_id', 'value', 'rank', 'created_at'))
+
+        self.assertEqual(sorted((athlete_id, value, rank) for athlete_id, value, rank, _ in rows), sorted([
+            (self.fast.id, 21.5, 1), (self.tied.id, 21.5, 1), (self.slow.id, 23.0, 3)
+        ]))
+        # Of equal bests, the earliest counts, and ties list the earlier achiever first
+        self.assertEqual(rows[0][0], self.tied.id)
+        self.assertEqual((timezone.now() - rows[0][3]).days, 5)
+
+
+class SegmentedLeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='400m Sprint', unit='seconds', scoring_direction='LOWER')
+        year = timezone.now().year
+        cls.athletes = {}
+        for name, value, gender, state, district, birth_year in [
+            ('anita', 50.0, 'FEMALE', 'Kerala', 'Kochi', year - 15),
+            ('bina', 52.0, 'FEMALE', 'Kerala', 'Thrissur', year - 25),
+            ('chetan', 48.0, 'MALE', 'Kerala', 'Kochi', year - 15),
+            ('deepa', 52.0, 'FEMALE', 'Punjab', 'Kochi', year - 15),
+            ('esha', 53.0, 'FEMALE', 'Kerala', 'Kochi', year - 17),
+        ]:
+            athlete = create_athlete(f'{name}@example.com', first_name=name.title(), gender=gender, state=state,
+                                     district=district, date_of_birth=f'{birth_year}-06-01')
+            Performance.objects.create(athlete=athlete, test=cls.sprint, value=value, status='VERIFIED')
+            cls.athletes[name] = athlete
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.athletes['anita'].user))
+        self.url = reverse('get_leaderboard', args=[self.sprint.id])
+
+    def board(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(row['athlete']['firstName'], row['rank']) for row in response.data['data']['leaderboard']]
+
+    def test_ranks_are_positions_within_the_segment(self):
+        self.assertEqual(self.board(gender='FEMALE'), [('Anita', 1), ('Bina', 2), ('Deepa', 2), ('Esha', 4)])
+        self.assertEqual(self.board(state='Kerala', district='Kochi'), [('Chetan', 1), ('Anita', 2), ('Esha', 3)])
+        self.assertEqual(self.board(ageGroup='U16', gender='FEMALE'), [('Anita', 1), ('Deepa', 2)])
+        self.assertEqual(self.board(ageGroup='SENIOR'), [('Bina', 1)])
+
+    def test_entries_follow_profile_changes(self):
+        athlete = Athlete.objects.get(pk=self.athletes['bina'].pk)
+        athlete.state = 'Punjab'
+        athlete.save()
+        self.assertEqual(self.board(state='Punjab'), [('Bina', 1), ('Deepa', 1)])
+
+    def test_unsupported_and_invalid_filters_are_rejected(self):
+        for params in [{'district': 'Kochi'}, {'district': 'Kochi', 'gender': 'FEMALE'},
+                       {'gender': 'OTHER'}, {'ageGroup': 'U12'}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class LeaderboardPagingTests(TestCase):
+    # Values with ties that straddle the page boundaries below
+    VALUES = [9.8, 10.0, 10.0, 10.0, 10.2, 10.3, 10.3, 10.5, 10.9]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='100m Dash', unit='seconds', scoring_direction='LOWER')
+        cls.athletes = []
+        for index, value in enumerate(cls.VALUES):
+            athlete = create_athlete(f'dasher{index}@example.com', first_name=f'Dasher{index}',
+                                     gender='FEMALE' if index % 2 else 'MALE')
+            Performance.objects.create(athlete=athlete, test=cls.sprint, value=value, status='VERIFIED')
+            cls.athletes.append(athlete)
+        cls.unranked = create_athlete('unranked@example.com')
+
+    def client_for(self, athlete):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(athlete.user))
+        return client
+
+    def pages(self, limit, **filters):
+        client = self.client_for(self.athletes[0])
+        rows, params = [], {'limit': limit, **filters}
+        self.page_sizes = []
+        while True:
+            data = client.get(reverse('get_leaderboard', args=[self.sprint.id]), params).data['data']
+            rows.extend((row['athlete']['firstName'], row['value'], row['rank']) for row in data['leaderboard'])
+            self.page_sizes.append(len(data['leaderboard']))
+            if data['nextCursor'] is None:
+                return rows
+            params = {'limit': limit, 'cursor': data['nextCursor'], **filters}
+
+    def expected(self, athletes):
+        values = [self.VALUES[self.athletes.index(athlete)] for athlete in athletes]
+        return [
+            (athlete.first_name, value, 1 + sum(other < value for other in values))
+            for athlete, value in zip(athletes, values)
+        ]
+
+    def test_cursor_pages_continue_ranks_across_ties(self):
+        self.assertEqual(self.pages(2), self.expected(self.athletes))
+        women = [athlete for athlete in self.athletes if athlete.gender == 'FEMALE']
+        self.assertEqual(self.pages(3, gender='FEMALE'), self.expected(women))
+
+    def test_full_last_page_has_no_cursor(self):
+        self.pages(len(self.VALUES))
+        self.assertEqual(self.page_sizes, [9])
+        self.assertEqual(self.pages(3), self.expected(self.athletes))
+        self.assertEqual(self.page_sizes, [3, 3, 3])
+        women = [athlete for athlete in self.athletes if athlete.gender == 'FEMALE']
+        self.assertEqual(self.pages(2, gender='FEMALE'), self.expected(women))
+        self.assertEqual(self.page_sizes, [2, 2])
+
+    def test_around_me(self):
+        url = reverse('get_my_leaderboard_position', args=[self.sprint.id])
+        data = self.client_for(self.athletes[5]).get(url, {'limit': 2}).data['data']
+        self.assertEqual(data['me']['rank'], 6)
+        self.assertEqual([row['athlete']['firstName'] for row in data['above']], ['Dasher3', 'Dasher4'])
+        self.assertEqual([(row['athlete']['firstName'], row['rank']) for row in data['below']],
+                         [('Dasher6', 6), ('Dasher7', 8)])
+
+        # Within a segment the window and ranks count only that segment's athletes
+        data = self.client_for(self.athletes[5]).get(url, {'limit': 1, 'gender': 'FEMALE'}).data['data']
+        self.assertEqual((data['me']['rank'], data['above'][0]['rank'], data['below'][0]['rank']), (3, 1, 4))
+
+        data = self.client_for(self.unranked).get(url).data['data']
+        self.assertIsNone(data['me'])
+
+
+class InMemoryRankingBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jump = Test.objects.create(name='Long Jump', unit='meters', scoring_direction='HIGHER')
+        cls.athletes = [create_athlete(f'leaper{index}@example.com') for index in range(6)]
+
+    def setUp(self):
+        # Another worker's backend, syncing on every read
+        self.worker = InMemoryRankingBackend()
+        self.worker.sync_interval = 0
+        self.database = DatabaseRankingBackend()
+
+    def test_board_matches_the_database(self):
+        for athlete, value in zip(self.athletes, [6.1, 7.0, 6.1, 5.5]):
+            Performance.objects.create(athlete=athlete, test=self.jump, value=value, status='VERIFIED')
+        self.assertEqual(self.worker.snapshot(self.jump), self.database.snapshot(self.jump))
+        self.assertEqual([(rank, row['athlete_id']) for rank, row in self.worker.top(self.jump, 3)],
+                         [(rank, row['athlete_id']) for rank, row in self.database.top(self.jump, 3)])
+
+        above, me, below = self.worker.around(self.jump, self.athletes[2].id, 1)
+        self.assertEqual(([rank for rank, _ in above], me[0], [rank for rank, _ in below]), ([2], 2, [4]))
+        self.assertIsNone(self.worker.around(self.jump, self.athletes[5].id, 1))
+
+    def test_other_workers_changes_are_picked_up_by_sync(self):
+        random = Random(7)
+        performances = []
+        self.worker.snapshot(self.jump)
+        for step in range(60):
+            if performances and random.random() < 0.4:
+                performance = performances.pop(random.randrange(len(performances)))
+                if random.random() < 0.5:
+                    performance.delete()
+                else:
+                    performance.status = 'FLAGGED'
+                    performance.save()
+            else:
+                performances.append(Performance.objects.create(
+                    athlete=random.choice(self.athletes), test=self.jump,
+                    value=random.choice([5.0, 5.5, 6.0, 6.5]), status='VERIFIED'
+                ))
+            self.assertEqual(self.worker.snapshot(self.jump), self.database.snapshot(self.jump), f'step {step}')
+
+    def test_rebuilt_board_is_reloaded(self):
+        Performance.objects.create(athlete=self.athletes[0], test=self.jump, value=6.0, status='VERIFIED')
+        self.worker.snapshot(self.jump)
+        # Rows changed behind the signals are only visible through a rebuild
+        Performance.objects.filter(test=self.jump).update(value=7.5)
+        rebuild_leaderboard(self.jump.id)
+        self.assertEqual(self.worker.snapshot(self.jump), {self.athletes[0].id: (7.5, 1)})
+
+    def test_refresh_applies_one_committed_change(self):
+        self.worker.sync_interval = 3600
+        Performance.objects.create(athlete=self.athletes[0], test=self.jump, value=6.0, status='VERIFIED')
+        self.worker.snapshot(self.jump)
+        Performance.objects.create(athlete=self.athletes[1], test=self.jump, value=6.4, status='VERIFIED')
+        self.assertNotIn(self.athletes[1].id, self.worker.snapshot(self.jump))
+
+        self.worker.refresh(self.jump.id, self.athletes[1].id)
+        self.assertEqual(self.worker.snapshot(self.jump), self.database.snapshot(self.jump))
+
+    def test_rows_are_fetched_outside_the_lock(self):
+        held = []
+        load_rows = self.worker._load_rows
+        def recording_load_rows(*args):
+            for row in load_rows(*args):
+                held.append(self.worker._lock.locked())
+                yield row
+        self.worker._load_rows = recording_load_rows
+
+        Performance.objects.create(athlete=self.athletes[0], test=self.jump, value=6.0, status='VERIFIED')
+        self.worker.snapshot(self.jump)
+        Performance.objects.create(athlete=self.athletes[1], test=self.jump, value=6.4, status='VERIFIED')
+        self.worker.snapshot(self.jump)
+        self.worker.refresh(self.jump.id, self.athletes[1].id)
+        self.worker.reload_interval = 0
+        self.worker.top(self.jump, 5)
+        self.worker.warm()
+        self.assertGreaterEqual(len(held), 6)
+        self.assertNotIn(True, held)
+
+    def test_warm_loads_every_board_and_keeps_newer_ones(self):
+        sprint = Test.objects.create(name='Sprint', unit='seconds', scoring_direction='LOWER')
+        Performance.objects.create(athlete=self.athletes[0], test=self.jump, value=6.0, status='VERIFIED')
+        Performance.objects.create(athlete=self.athletes[0], test=sprint, value=7.1, status='VERIFIED')
+        self.worker.sync_interval = 3600
+        self.worker.snapshot(self.jump)
+        loaded = self.worker._boards[self.jump.id]
+
+        self.worker.warm()
+        self.assertIs(self.worker._boards[self.jump.id], loaded)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.worker.snapshot(sprint), {self.athletes[0].id: (7.1, 1)})
+
+    def test_first_request_warms_in_the_background(self):
+        with mock.patch('authapp.ranking.threading.Thread') as thread, \
+                mock.patch.object(request_started, 'disconnect') as disconnect:
+            warm_ranking_backend()
+        disconnect.assert_called_once_with(warm_ranking_backend)
+        self.assertTrue(thread.call_args.kwargs['daemon'])
+        thread.return_value.start.assert_called_once_with()
+
+
+class DistributionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='60m Sprint', unit='seconds', scoring_direction='LOWER')
+        cls.athlete = create_athlete('starter@example.com')
+
+    def test_digest_quantiles_stay_close_to_exact_values(self):
+        random = Random(99)
+        values = [random.gauss(12.0, 1.5) for _ in range(20000)]
+        digest = TDigest()
+        for start in range(0, len(values), 1000):
+            digest.update(sorted(values[start:start + 1000]))
+        values.sort()
+        low, high = values[0], values[-1]
+
+        self.assertLess(len(digest.centroids), 10 * DIGEST_COMPRESSION)
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            exact = values[int(q * len(values))]
+            self.assertAlmostEqual(digest.quantile(q, low, high), exact, delta=0.05)
+            self.assertAlmostEqual(digest.cdf(exact, low, high), q, delta=0.005)
+
+    def test_verified_values_are_folded_in_and_withdrawals_mark_the_row_stale(self):
+        performances = [
+            Performance.objects.create(athlete=self.athlete, test=self.sprint, value=value, status='VERIFIED')
+            for value in [7.0, 7.5, 8.0, 9.0]
+        ]
+        Performance.objects.create(athlete=self.athlete, test=self.sprint, value=6.0, status='PENDING')
+        distribution = TestDistribution.objects.get(test=self.sprint)
+        self.assertEqual((distribution.count, distribution.min_value, distribution.max_value), (4, 7.0, 9.0))
+        self.assertEqual(sum(distribution.histogram), 4)
+        self.assertFalse(distribution.is_stale)
+
+        performances[0].status = 'FLAGGED'
+        performances[0].save()
+        distribution.refresh_from_db()
+        self.assertEqual((distribution.count, sum(distribution.histogram)), (3, 3))
+        self.assertTrue(distribution.is_stale)
+
+        distribution = rebuild_distribution(self.sprint.id)
+        self.assertEqual((distribution.count, distribution.min_value, distribution.is_stale), (3, 7.5, False))
+        self.assertAlmostEqual(TDigest(distribution.digest).quantile(0.5, 7.5, 9.0), 8.0)
+
+    def test_values_outside_the_histogram_range_widen_it(self):
+        for value in [10.0, 30.0, 40.0, 50.0, 60.0]:
+            Performance.objects.create(athlete=self.athlete, test=self.sprint, value=value, status='VERIFIED')
+        distribution = TestDistribution.objects.get(test=self.sprint)
+        self.assertLessEqual(distribution.histogram_low, 10.0)
+        self.assertGreaterEqual(distribution.histogram_high, 60.0)
+        # Not piled into the last bin
+        self.assertLess(distribution.histogram[-1], 3)
+        self.assertEqual(sum(distribution.histogram), 5)
+        self.assertTrue(distribution.is_stale)
+
+    def test_percentile_of_a_value(self):
+        for value in [7.0, 7.5, 8.0, 8.5, 9.0]:
+            Performance.objects.create(athlete=self.athlete, test=self.sprint, value=value, status='VERIFIED')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(self.athlete.user))
+        url = reverse('get_test_distribution', args=[self.sprint.id])
+
+        fast = client.get(url, {'value': 7.2}).data['data']['distribution']
+        slow = client.get(url, {'value': 8.8}).data['data']['distribution']
+        # Lower times beat more of the field
+        self.assertGreater(fast['percentile'], 70)
+        self.assertLess(slow['percentile'], 30)
+        self.assertEqual(fast['count'], 5)
+        self.assertEqual(client.get(url, {'value': 'fast'}).status_code, 400)
+
+
+class MediaPipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.athlete = create_athlete('filmed@example.com')
+        cls.jump = Test.objects.create(name='Standing Jump', unit='meters', scoring_direction='HIGHER')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=os.path.join(directory, 'media'), MEDIA_STAGING_ROOT=os.path.join(directory, 'staging'),
+            MEDIA_STAGING_HOST='web-1', MEDIA_UPLOAD_MAX_ATTEMPTS=3
+        ))
+        self.backend = LocalMediaBackend()
+
+    def submit(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(self.athlete.user))
+        image = SimpleUploadedFile('Jump.PNG', b'png-bytes', content_type='image/png')
+        response = client.post(reverse('submit_performance'), {'test': self.jump.id, 'value': 2.4, 'image': image})
+        self.assertEqual(response.status_code, 201)
+        return Performance.objects.get(pk=response.data['data']['performance']['id'])
+
+    def test_submission_is_staged_then_uploaded_by_the_worker(self):
+        performance = self.submit()
+        self.assertEqual((performance.media_status, performance.media_staged_on), ('PENDING', 'web-1'))
+        self.assertTrue(os.path.exists(performance.staged_image))
+
+        self.assertEqual(process_pending_uploads(backend=self.backend), (1, 0))
+        staged = performance.staged_image
+        performance.refresh_from_db()
+        self.assertEqual((performance.media_status, performance.staged_image), ('UPLOADED', ''))
+        self.assertFalse(os.path.exists(staged))
+        with open(os.path.join(settings.MEDIA_ROOT, 'performances', 'image', f'{performance.id}.png'), 'rb') as stored:
+            self.assertEqual(stored.read(), b'png-bytes')
+        self.assertEqual(process_pending_uploads(backend=self.backend), (0, 0))
+
+    def test_failed_uploads_back_off_and_give_up(self):
+        performance = self.submit()
+        failing = mock.Mock(spec=LocalMediaBackend)
+        failing.upload.side_effect = ConnectionError('storage unavailable')
+
+        for attempt in range(1, 4):
+            self.assertEqual(process_pending_uploads(backend=failing), (0, 1))
+            performance.refresh_from_db()
+            self.assertEqual((performance.media_attempts, performance.media_error), (attempt, 'storage unavailable'))
+            if attempt < 3:
+                self.assertEqual(performance.media_status, 'PENDING')
+                delay = performance.media_next_attempt_at - timezone.now()
+                self.assertGreater(delay, RETRY_BASE_DELAY * 2 ** (attempt - 1) - timedelta(seconds=5))
+                # Not retried before the backoff runs out
+                self.assertEqual(claim_pending_uploads(10), [])
+                Performance.objects.filter(pk=performance.pk).update(media_next_attempt_at=timezone.now())
+        self.assertEqual(performance.media_status, 'FAILED')
+        self.assertEqual(claim_pending_uploads(10), [])
+
+    def test_claims_are_leased_and_scoped_to_the_staging_host(self):
+        performance = self.submit()
+        self.assertEqual(claim_pending_uploads(10), [performance.id])
+        # Leased to the first worker
+        self.assertEqual(claim_pending_uploads(10), [])
+        Performance.objects.filter(pk=performance.pk).update(media_next_attempt_at=timezone.now() - UPLOAD_LEASE)
+        self.assertEqual(claim_pending_uploads(10), [performance.id])
+
+        Performance.objects.filter(pk=performance.pk).update(media_next_attempt_at=None, media_staged_on='web-2')
+        self.assertEqual(claim_pending_uploads(10), [])
+
+    def test_missing_staged_file_fails_at_once(self):
+        performance = self.submit()
+        os.remove(performance.staged_image)
+        self.assertEqual(process_pending_uploads(backend=self.backend), (0, 1))
+        performance.refresh_from_db()
+        self.assertEqual((performance.media_status, performance.media_attempts), ('FAILED', 1))
+
+
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.athlete = create_athlete('uploader@example.com')
+        cls.other = create_athlete('other@example.com')
+        test = Test.objects.create(name='Shuttle Run', unit='seconds', scoring_direction='LOWER')
+        cls.performance = Performance.objects.create(athlete=cls.athlete, test=test, value=9.9)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(
+            MEDIA_STAGING_ROOT=directory, MEDIA_STAGING_HOST='web-1', UPLOAD_CHUNK_SIZE=4
+        ))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.athlete.user))
+
+    def initiate(self, total_size=10):
+        response = self.client.post(reverse('initiate_upload'), {
+            'performance': self.performance.id, 'kind': 'video', 'filename': 'run.MP4', 'total_size': total_size
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['data']['upload']
+
+    def put_chunk(self, upload, index, body, client=None):
+        url = reverse('upload_chunk', args=[upload['id'], index])
+        return (client or self.client).put(url, data=body, content_type='application/octet-stream')
+
+    def status(self, upload):
+        return self.client.get(reverse('get_upload_status', args=[upload['id']])).data['data']['upload']
+
+    def test_chunks_resume_and_assemble_into_a_staged_file(self):
+        upload = self.initiate()
+        self.assertEqual((upload['chunk_size'], upload['chunk_count']), (4, 3))
+
+        self.assertEqual(self.put_chunk(upload, 2, b'ij').status_code, 200)
+        self.assertEqual(self.put_chunk(upload, 0, b'abcd').status_code, 200)
+        # The client lost its connection; the status lists what it still has to send
+        self.assertEqual(self.status(upload)['received_chunks'], [0, 2])
+        self.assertEqual(self.put_chunk(upload, 1, b'efgh').status_code, 200)
+
+        response = self.client.post(reverse('finalize_upload', args=[upload['id']]))
+        self.assertEqual(response.status_code, 200, response.data)
+        performance = Performance.objects.get(pk=self.performance.pk)
+        self.assertEqual((performance.media_status, performance.media_staged_on), ('PENDING', 'web-1'))
+        self.assertTrue(performance.staged_video.endswith('video.mp4'))
+        with open(performance.staged_video, 'rb') as staged:
+            self.assertEqual(staged.read(), b'abcdefghij')
+        self.assertEqual(self.status(upload)['status'], 'COMPLETE')
+        self.assertEqual(self.client.post(reverse('finalize_upload', args=[upload['id']])).status_code, 404)
+
+    def test_chunks_of_the_wrong_size_or_index_are_rejected(self):
+        upload = self.initiate()
+        self.assertEqual(self.put_chunk(upload, 0, b'abc').status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 0, b'abcde').status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 3, b'ab').status_code, 400)
+        self.assertEqual(self.status(upload)['received_chunks'], [])
+
+        self.assertEqual(self.put_chunk(upload, 0, b'abcd').status_code, 200)
+        response = self.client.post(reverse('finalize_upload', args=[upload['id']]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('[1, 2]', response.data['message'])
+
+    def test_sessions_belong_to_their_athlete(self):
+        upload = self.initiate()
+        intruder = APIClient()
+        intruder.credentials(HTTP_AUTHORIZATION=bearer(self.other.user))
+        self.assertEqual(self.put_chunk(upload, 0, b'abcd', client=intruder).status_code, 404)
+        self.assertEqual(intruder.get(reverse('get_upload_status', args=[upload['id']])).status_code, 404)
+
+        response = intruder.post(reverse('initiate_upload'), {
+            'performance': self.performance.id, 'kind': 'video', 'filename': 'run.mp4', 'total_size': 10
+        })
+        self.assertEqual(response.status_code, 400)
+        with override_settings(UPLOAD_MAX_FILE_SIZE=9):
+            response = self.client.post(reverse('initiate_upload'), {
+                'performance': self.performance.id, 'kind': 'video', 'filename': 'run.mp4', 'total_size': 10
+            })
+        self.assertEqual(response.status_code, 400)
+
+
+    def upload_all(self):
+        upload = self.initiate()
+        for index, body in enumerate([b'abcd', b'efgh', b'ij']):
+            self.put_chunk(upload, index, body)
+        return upload
+
+    def test_chunks_are_assembled_outside_any_transaction(self):
+        upload = self.upload_all()
+        during = {}
+        outer_savepoints = len(connection.savepoint_ids)
+        assemble_upload = views.assemble_upload
+        def observed_assemble_upload(session):
+            during['savepoints'] = len(connection.savepoint_ids)
+            during['status'] = UploadSession.objects.get(pk=session.pk).status
+            during['chunk'] = self.put_chunk(upload, 0, b'abcd').status_code
+            return assemble_upload(session)
+
+        with mock.patch.object(views, 'assemble_upload', observed_assemble_upload):
+            response = self.client.post(reverse('finalize_upload', args=[upload['id']]))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(during, {'savepoints': outer_savepoints, 'status': 'ASSEMBLING', 'chunk': 404})
+
+    def test_failed_assembly_reopens_the_session(self):
+        upload = self.initiate()
+        self.put_chunk(upload, 0, b'abcd')
+        self.assertEqual(self.client.post(reverse('finalize_upload', args=[upload['id']])).status_code, 400)
+        self.assertEqual(self.status(upload)['status'], 'OPEN')
+
+        for index, body in enumerate([b'efgh', b'ij'], start=1):
+            self.put_chunk(upload, index, body)
+        with mock.patch.object(views, 'assemble_upload', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.client.post(reverse('finalize_upload', args=[upload['id']]))
+        self.assertEqual(self.status(upload)['status'], 'OPEN')
+        self.assertEqual(self.client.post(reverse('finalize_upload', args=[upload['id']])).status_code, 200)
+
+    def test_upload_claimed_during_assembly_keeps_the_chunks_for_a_retry(self):
+        upload = self.upload_all()
+        assemble_upload = views.assemble_upload
+        def claimed_meanwhile(session):
+            Performance.objects.filter(pk=self.performance.pk).update(media_status='UPLOADING')
+            return assemble_upload(session)
+
+        with mock.patch.object(views, 'assemble_upload', claimed_meanwhile):
+            self.assertEqual(self.client.post(reverse('finalize_upload', args=[upload['id']])).status_code, 409)
+        self.assertEqual(self.status(upload)['status'], 'OPEN')
+        self.assertEqual(self.status(upload)['received_chunks'], [0, 1, 2])
+
+        Performance.objects.filter(pk=self.performance.pk).update(media_status='UPLOADED')
+        self.assertEqual(self.client.post(reverse('finalize_upload', args=[upload['id']])).status_code, 200)
+        with open(Performance.objects.get(pk=self.performance.pk).staged_video, 'rb') as staged:
+            self.assertEqual(staged.read(), b'abcdefghij')
+
+class BulkSubmitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.official = User.objects.create_user(username='official@example.com', email='official@example.com',
+                                                password='x', role='ADMIN')
+        cls.throw = Test.objects.create(name='Discus', unit='meters', scoring_direction='HIGHER')
+        cls.athletes = [create_athlete(f'discus{index}@example.com') for index in range(3)]
+
+    def post(self, user, payload):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(user))
+        return client.post(reverse('bulk_submit_performances'), payload, format='json')
+
+    def results(self, values):
+        return [{'athlete': athlete.id, 'test': self.throw.id, 'value': value}
+                for athlete, value in zip(self.athletes, values)]
+
+    def check_verified_batch(self):
+        rows = self.results([41.0, 47.5, 39.0]) + [
+            {'athlete': 'missing', 'test': self.throw.id, 'value': 50},
+            {'athlete': self.athletes[0].id, 'test': self.throw.id, 'value': 'far'},
+        ]
+        response = self.post(self.official, {'status': 'VERIFIED', 'performances': rows})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([error['index'] for error in response.data['data']['errors']], [3, 4])
+        self.assertEqual(len(response.data['data']['created']), 3)
+
+        board = LeaderboardEntry.objects.filter(test=self.throw)
+        self.assertEqual({(entry.athlete_id, entry.rank) for entry in board},
+                         {(self.athletes[1].id, 1), (self.athletes[0].id, 2), (self.athletes[2].id, 3)})
+        self.assertEqual(AthleteStats.objects.get(athlete=self.athletes[1]).verified_performances, 1)
+        self.assertEqual(TestDistribution.objects.get(test=self.throw).count, 3)
+        self.assertEqual(Performance.objects.filter(verified_by=self.official).count(), 3)
+
+    def test_verified_batch_updates_leaderboards_stats_and_distributions(self):
+        self.check_verified_batch()
+
+    def test_large_batches_rebuild_the_leaderboard_instead(self):
+        with mock.patch('authapp.signals.BULK_REBUILD_THRESHOLD', 1):
+            self.check_verified_batch()
+
+    def test_pending_batch_leaves_the_board_alone(self):
+        response = self.post(self.official, {'performances': self.results([41.0, 47.5])})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        self.assertEqual(AthleteStats.objects.get(athlete=self.athletes[0]).pending_performances, 1)
+
+    def test_rejected_batches(self):
+        self.assertEqual(self.post(self.athletes[0].user, {'performances': self.results([40.0])}).status_code, 403)
+        response = self.post(self.official, {'performances': [{'athlete': 'missing', 'test': self.throw.id}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post(self.official, {'performances': []}).status_code, 400)
+        self.assertFalse(Performance.objects.exists())
+
+
+class StatsCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tests = [Test.objects.create(name=f'Shot put {index}', unit='meters') for index in range(3)]
+        cls.badges = [
+            Badge.objects.create(name=f'Badge {index}', description='', badge_type='MILESTONE',
+                                 requirements='', points=points)
+            for index, points in enumerate([5, 10, 25])
+        ]
+        cls.athletes = [create_athlete(f'shot{index}@example.com') for index in range(4)]
+
+    def counters(self):
+        return {
+            stats.athlete_id: [getattr(stats, field) for field in COUNTERS]
+            for stats in AthleteStats.objects.filter(athlete__in=self.athletes)
+        }
+
+    def test_signals_keep_counters_equal_to_a_recount(self):
+        random = Random(13)
+        performances = []
+        for _ in range(150):
+            action = random.random()
+            if action < 0.45 or not performances:
+                performances.append(Performance.objects.create(
+                    athlete=random.choice(self.athletes), test=random.choice(self.tests),
+                    value=random.randint(1, 20), status=random.choice(['PENDING', 'VERIFIED', 'FLAGGED'])
+                ))
+            elif action < 0.7:
+                performance = random.choice(performances)
+                performance.status = random.choice(['PENDING', 'VERIFIED', 'FLAGGED'])
+                performance.save()
+            elif action < 0.8:
+                performances.pop(random.randrange(len(performances))).delete()
+            else:
+                athlete, badge = random.choice(self.athletes), random.choice(self.badges)
+                awarded = AthleteBadge.objects.filter(athlete=athlete, badge=badge).first()
+                if awarded:
+                    awarded.delete()
+                else:
+                    AthleteBadge.objects.create(athlete=athlete, badge=badge)
+
+        maintained = self.counters()
+        recount_athlete_stats([athlete.id for athlete in self.athletes])
+        self.assertEqual(maintained, self.counters())
+
+    def test_counter_deltas(self):
+        athlete = self.athletes[0]
+        performance = Performance.objects.create(athlete=athlete, test=self.tests[0], value=12)
+        awarded = AthleteBadge.objects.create(athlete=athlete, badge=self.badges[2])
+        stats = AthleteStats.objects.get(athlete=athlete)
+        self.assertEqual((stats.total_performances, stats.pending_performances, stats.total_badges,
+                          stats.total_points), (1, 1, 1, 25))
+
+        performance.status = 'VERIFIED'
+        performance.save()
+        awarded.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.pending_performances, stats.verified_performances, stats.total_badges,
+                          stats.total_points), (0, 1, 0, 0))
+
+        performance.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.total_performances, stats.verified_performances), (0, 0))
+
+    def test_drifted_counters_are_repaired(self):
+        athlete = self.athletes[1]
+        Performance.objects.create(athlete=athlete, test=self.tests[0], value=12, status='VERIFIED')
+        AthleteStats.objects.filter(athlete=athlete).update(total_performances=7, verified_performances=0)
+        self.assertEqual(recount_athlete_stats([athlete.id, self.athletes[2].id]), 2)
+        stats = AthleteStats.objects.get(athlete=athlete)
+        self.assertEqual((stats.total_performances, stats.verified_performances), (1, 1))
+        self.assertEqual(AthleteStats.objects.get(athlete=self.athletes[2]).total_performances, 0)
+
+    def test_my_stats_reads_the_counters(self):
+        athlete = self.athletes[3]
+        Performance.objects.create(athlete=athlete, test=self.tests[0], value=12, status='FLAGGED')
+        AthleteStats.objects.filter(athlete=athlete).update(total_points=40)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(athlete.user))
+        stats = client.get(reverse('get_my_stats')).data['data']['stats']
+        self.assertEqual((stats['total_performances'], stats['flagged_performances'], stats['total_points']),
+                         (1, 1, 40))
+        self.assertEqual(stats['recent_performances'][0]['status'], 'FLAGGED')
+
+
+class PersonalBestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sprint = Test.objects.create(name='60m', unit='seconds', scoring_direction='LOWER')
+        cls.jump = Test.objects.create(name='High jump', unit='meters', scoring_direction='HIGHER')
+        cls.athletes = [create_athlete(f'best{index}@example.com') for index in range(4)]
+
+    def bests(self):
+        return {
+            stats.athlete_id: stats.best_performances
+            for stats in AthleteStats.objects.filter(athlete__in=self.athletes)
+        }
+
+    def assert_bests_match_a_rebuild(self):
+        maintained = self.bests()
+        rebuild_personal_bests([athlete.id for athlete in self.athletes])
+        self.assertEqual({athlete_id: bests for athlete_id, bests in maintained.items() if bests},
+                         {athlete_id: bests for athlete_id, bests in self.bests().items() if bests})
+
+    def test_bests_follow_verification_improvement_and_withdrawal(self):
+        random = Random(14)
+        # Distinct values, so no best depends on how ties are broken
+        values = iter(random.sample(range(1, 10000), 300))
+        performances = []
+        for step in range(200):
+            action = random.random()
+            if action < 0.5 or not performances:
+                performances.append(Performance.objects.create(
+                    athlete=random.choice(self.athletes), test=random.choice([self.sprint, self.jump]),
+                    value=next(values) / 100, status=random.choice(['PENDING', 'VERIFIED'])
+                ))
+            elif action < 0.75:
+                performance = random.choice(performances)
+                performance.status = random.choice(['PENDING', 'VERIFIED', 'FLAGGED'])
+                performance.save()
+            elif action < 0.85:
+                performance = random.choice(performances)
+                performance.value = next(values) / 100
+                performance.save()
+            else:
+                performances.pop(random.randrange(len(performances))).delete()
+            if step % 50 == 49:
+                self.assert_bests_match_a_rebuild()
+
+    def test_improvements_replace_the_best(self):
+        athlete = self.athletes[0]
+        first = Performance.objects.create(athlete=athlete, test=self.jump, value=1.8, status='VERIFIED')
+        Performance.objects.create(athlete=athlete, test=self.jump, value=1.7, status='VERIFIED')
+        best = AthleteStats.objects.get(athlete=athlete).best_performances[self.jump.id]
+        self.assertEqual((best['value'], best['performance_id']), (1.8, first.id))
+
+        higher = Performance.objects.create(athlete=athlete, test=self.jump, value=1.95)
+        higher.status = 'VERIFIED'
+        higher.save()
+        best = AthleteStats.objects.get(athlete=athlete).best_performances[self.jump.id]
+        self.assertEqual((best['value'], best['performance_id']), (1.95, higher.id))
+
+        higher.delete()
+        first.status = 'FLAGGED'
+        first.save()
+        self.assertEqual(AthleteStats.objects.get(athlete=athlete).best_performances[self.jump.id]['value'], 1.7)
+
+    def test_direction_flip_and_rebuild_reset_the_bests(self):
+        athlete = self.athletes[1]
+        for value in [7.2, 7.6]:
+            Performance.objects.create(athlete=athlete, test=self.sprint, value=value, status='VERIFIED')
+        sprint = Test.objects.get(pk=self.sprint.pk)
+        sprint.scoring_direction = 'HIGHER'
+        sprint.save()
+        self.assertEqual(AthleteStats.objects.get(athlete=athlete).best_performances[self.sprint.id]['value'], 7.6)
+
+        AthleteStats.objects.filter(athlete=athlete).update(best_performances={})
+        rebuild_leaderboard(self.sprint.id)
+        self.assert_bests_match_a_rebuild()
+        self.assertIn(self.sprint.id, AthleteStats.objects.get(athlete=athlete).best_performances)
+
+    def test_my_stats_lists_the_bests(self):
+        athlete = self.athletes[2]
+        Performance.objects.create(athlete=self.athletes[3], test=self.sprint, value=7.0, status='VERIFIED')
+        sprint = Performance.objects.create(athlete=athlete, test=self.sprint, value=7.4, status='VERIFIED')
+        Performance.objects.create(athlete=athlete, test=self.jump, value=1.6, status='VERIFIED')
+        Performance.objects.create(athlete=athlete, test=self.jump, value=2.0)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(athlete.user))
+        bests = client.get(reverse('get_my_stats')).json()['data']['stats']['personal_bests']
+        self.assertEqual([(best['test_name'], best['best_value'], best['rank']) for best in bests],
+                         [('60m', 7.4, 2), ('High jump', 1.6, 1)])
+        # Same shape as every other timestamp of the API
+        self.assertEqual(bests[0]['achieved_at'], JSONEncoder().default(sprint.created_at))
+        self.assertEqual(bests[0]['performance_id'], sprint.id)
+
+
+class OverallRankTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        random = Random(15)
+        # Plenty of athletes share a score, and more than SHIFT_MIN_ROWS move together
+        users = User.objects.bulk_create([
+            User(username=f'ranked{index}@example.com', email=f'ranked{index}@example.com', password='!')
+            for index in range(SHIFT_MIN_ROWS + 30)
+        ])
+        athletes = Athlete.objects.bulk_create([
+            Athlete(user=user, first_name='Ranked', last_name='Athlete', date_of_birth='2004-05-01', gender='MALE',
+                    phone='9000000000', state='Kerala', district='Kochi', address='1 Main Road',
+                    sport='ATHLETICS', category='SPRINTS')
+            for user in users
+        ])
+        AthleteStats.objects.bulk_create([
+            AthleteStats(athlete=athlete, total_points=random.randrange(40)) for athlete in athletes
+        ])
+
+    def assert_ranked_by_points(self):
+        points = dict(AthleteStats.objects.values_list('id', 'total_points'))
+        expected = {pk: 1 + sum(other > value for other in points.values()) for pk, value in points.items()}
+        self.assertEqual(dict(AthleteStats.objects.values_list('id', 'current_rank')), expected)
+
+    def test_ranks_follow_points_with_shared_ranks_for_ties(self):
+        self.assertEqual(compute_overall_ranks(), AthleteStats.objects.count())
+        self.assert_ranked_by_points()
+        self.assertEqual(compute_overall_ranks(), 0)
+        self.assertTrue(SystemSettings.objects.filter(key=OVERALL_RANK_LOCK_KEY).exists())
+
+    def test_a_new_leader_shifts_everyone_with_one_update(self):
+        compute_overall_ranks()
+        last = AthleteStats.objects.order_by('total_points').first()
+        AthleteStats.objects.filter(pk=last.pk).update(total_points=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(compute_overall_ranks(), AthleteStats.objects.count())
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        # The shared +1 shift and the new leader's own rank
+        self.assertEqual(len(updates), 2)
+        self.assert_ranked_by_points()
+
+    def test_small_batches_write_the_same_ranks(self):
+        compute_overall_ranks(batch_size=7)
+        # Reversing the order moves almost every athlete by a different amount
+        AthleteStats.objects.update(total_points=-F('total_points'))
+        self.assertGreater(compute_overall_ranks(batch_size=7), SHIFT_MIN_ROWS)
+        self.assert_ranked_by_points()
+        self.assertEqual(compute_overall_ranks(), 0)
+
+    def test_leaderboard_ranks_are_corrected_one_test_at_a_time(self):
+        athletes = list(Athlete.objects.order_by('id')[:3])
+        tests = [Test.objects.create(name=f'Hammer {index}', unit='meters', scoring_direction='HIGHER')
+                 for index in range(2)]
+        for test in tests:
+            for athlete, value in zip(athletes, [70.0, 64.5, 61.0]):
+                Performance.objects.create(athlete=athlete, test=test, value=value, status='VERIFIED')
+            LeaderboardEntry.objects.filter(test=test).update(rank=1)
+
+        locked = []
+        lock_test = leaderboard._lock_test
+        def recording_lock_test(test_id):
+            # Each lock is taken in a savepoint, and so a transaction, of its own
+            locked.append((test_id, tuple(connection.savepoint_ids)))
+            return lock_test(test_id)
+        with mock.patch.object(leaderboard, '_lock_test', recording_lock_test):
+            self.assertEqual(recompute_ranks(), 4)
+
+        self.assertEqual(sorted(test_id for test_id, _ in locked), sorted(test.id for test in tests))
+        self.assertEqual(len({savepoints for _, savepoints in locked}), 2)
+        for test in tests:
+            self.assertEqual(sorted(LeaderboardEntry.objects.filter(test=test).values_list('rank', flat=True)),
+                             [1, 2, 3])
+
+    def test_compute_ranks_command_also_corrects_leaderboards(self):
+        test = Test.objects.create(name='Javelin', unit='meters', scoring_direction='HIGHER')
+        athletes = list(Athlete.objects.order_by('id')[:2])
+        for athlete, value in zip(athletes, [61.0, 58.5]):
+            Performance.objects.create(athlete=athlete, test=test, value=value, status='VERIFIED')
+        LeaderboardEntry.objects.filter(test=test, athlete=athletes[1]).update(rank=9)
+
+        output = io.StringIO()
+        call_command('compute_ranks', stdout=output)
+        self.assertIn(f'{AthleteStats.objects.count()} overall and 1 leaderboard ranks changed', output.getvalue())
+        self.assertEqual(LeaderboardEntry.objects.get(test=test, athlete=athletes[1]).rank, 2)
+        self.assert_ranked_by_points()
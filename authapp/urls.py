@@ -1,22 +1,49 @@
 from django.urls import path
 from .views import (
     # Authentication
-    register_athlete, login_view, get_profile,
-    forgot_password, reset_password,
+    register_athlete, login_view, logout_view, get_profile,
+    forgot_password, reset_password, verify_email,
     # Test Management  
-    get_all_tests, submit_performance, get_leaderboard
+    get_all_tests, get_test_by_id, get_test_distribution, submit_performance, bulk_submit_performances,
+    get_my_performances,
+    get_leaderboard, get_my_leaderboard_position,
+    # Statistics
+    get_my_stats,
+    # Admin
+    get_athletes,
+    # Chunked Uploads
+    initiate_upload, get_upload_status, upload_chunk, finalize_upload
 )
 
 urlpatterns = [
     # Authentication URLs - SAI Fitness API
     path("auth/register/", register_athlete, name="register_athlete"),
     path("auth/login/", login_view, name="login"), 
+    path("auth/logout/", logout_view, name="logout"),
     path("auth/profile/", get_profile, name="get_profile"), 
     path("auth/forgot-password/", forgot_password, name="forgot_password"),
     path("auth/reset-password/", reset_password, name="reset_password"),
+    path("auth/verify-email/", verify_email, name="verify_email"),
     
     # Test Management URLs
     path("tests/", get_all_tests, name="get_all_tests"),
     path("tests/submit/", submit_performance, name="submit_performance"),
+    path("tests/submit/bulk/", bulk_submit_performances, name="bulk_submit_performances"),
+    path("tests/<str:test_id>/", get_test_by_id, name="get_test_by_id"),
+    path("tests/<str:test_id>/distribution/", get_test_distribution, name="get_test_distribution"),
+    path("performances/my/", get_my_performances, name="get_my_performances"),
     path("leaderboard/<str:test_id>/", get_leaderboard, name="get_leaderboard"),
+    path("leaderboard/<str:test_id>/me/", get_my_leaderboard_position, name="get_my_leaderboard_position"),
+    
+    # Statistics URLs
+    path("stats/my/", get_my_stats, name="get_my_stats"),
+    
+    # Admin URLs
+    path("admin/athletes/", get_athletes, name="get_athletes"),
+    
+    # Chunked Upload URLs
+    path("uploads/", initiate_upload, name="initiate_upload"),
+    path("uploads/<str:session_id>/", get_upload_status, name="get_upload_status"),
+    path("uploads/<str:session_id>/chunks/<int:index>/", upload_chunk, name="upload_chunk"),
+    path("uploads/<str:session_id>/complete/", finalize_upload, name="finalize_upload"),
 ]
@@ -3,40 +3,65 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q, Max, Avg, F, Case, When
+from django.db import transaction
+from django.db.models import Count, Q, Max, Avg, F, Case, When, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.core.mail import send_mail
 from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.contrib.auth.hashers import make_password
-from datetime import timedelta, datetime
-import secrets
-import string
 import csv
 import io
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer, AthleteSerializer,
-    ForgotPasswordSerializer, ResetPasswordSerializer, TestSerializer,
+    ForgotPasswordSerializer, ResetPasswordSerializer, VerifyEmailSerializer, TestSerializer,
     TestCreateSerializer, PerformanceSerializer, PerformanceCreateSerializer,
+    BulkPerformanceCreateSerializer,
     PerformanceUpdateSerializer, LeaderboardSerializer, BadgeSerializer,
     AthleteBadgeSerializer, AthleteStatsSerializer, DashboardStatsSerializer,
-    AthleteListSerializer, NotificationSerializer
+    AthleteListSerializer, NotificationSerializer, UploadSessionSerializer,
+    UploadSessionCreateSerializer
 )
 from .models import (
     User, Athlete, Test, Performance, Badge, AthleteBadge,
-    AthleteStats, Notification, SystemSettings
+    AthleteStats, Notification, SystemSettings, TestDistribution,
+    UploadSession
 )
+from .leaderboard import (
+    SEGMENT_FILTERS, SEGMENT_COMBINATIONS, AGE_GROUPS, ENTRY_ORDERING, ENTRY_FIELDS, segment_entries,
+    with_segment_ranks, entry_key, entries_around, rank_in, is_supported_segment
+)
+from .ranking import get_ranking_backend
+from .distributions import describe_distribution
+from .pagination import InvalidCursor, encode_cursor, decode_cursor, keyset_filter
+from .media import UploadError, write_chunk, assemble_upload, stage_assembled, discard_staged, staging_host
+from .idempotency import idempotent
+from .catalog import get_catalog, catalog_etag
+from .profiles import get_profile_payload, profile_etag
+from .authentication import ClaimsRefreshToken, full_user
+from .revocation import revoke_token
+from .one_time_tokens import PASSWORD_RESET, EMAIL_VERIFICATION, issue_token, redeem_token
 
 # Utility Functions
 
-def generate_token():
-    return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
-
 def is_admin_user(user):
     return user.role == 'ADMIN'
 
+def conditional_response(request, etag, data):
+    """Response carrying `etag`, or an empty 304 when the client already has that version"""
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = Response(data, status=200)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def send_email_notification(to_email, subject, message):
     try:
         send_mail(
@@ -65,8 +90,18 @@ def health_check(request):
 
 # Authentication Views
 
+def _registration_without_token(data):
+    # Tokens are never stored with the idempotency key; a replay issues a new one
+    return {**data, "data": {**data["data"], "token": None}}
+
+def _registration_with_new_token(request, data):
+    user = User.objects.filter(pk=data["data"]["user"]["id"], is_active=True).first()
+    token = str(ClaimsRefreshToken.for_user(user).access_token) if user else None
+    return {**data, "data": {**data["data"], "token": token}}
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@idempotent('register_athlete', store=_registration_without_token, replay=_registration_with_new_token)
 def register_athlete(request):
     """Register new athlete account"""
     serializer = RegisterSerializer(data=request.data)
@@ -74,7 +109,7 @@ def register_athlete(request):
         user = serializer.save()
         
         # Send verification email
-        verification_url = f"http://localhost:3000/verify-email?token={user.email_verification_token}"
+        verification_url = f"http://localhost:3000/verify-email?token={issue_token(user, EMAIL_VERIFICATION)}"
         send_email_notification(
             to_email=user.email,
             subject="Welcome to SAI Fitness - Verify Your Email",
@@ -82,7 +117,7 @@ def register_athlete(request):
         )
         
         # Generate JWT token
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
         return Response({
             "success": True,
@@ -103,18 +138,19 @@ def register_athlete(request):
 @permission_classes([AllowAny])
 def login_view(request):
     """Authenticate user and get token"""
-    serializer = LoginSerializer(data=request.data)
+    serializer = LoginSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         user = serializer.validated_data["user"]
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
-        # Get profile data
+        # Get profile data from the cached profile payload
+        payload = get_profile_payload(user)
         profile_data = {}
-        if hasattr(user, 'athlete'):
+        if payload['athlete']:
             profile_data = {
-                "firstName": user.athlete.first_name,
-                "lastName": user.athlete.last_name,
-                "sport": user.athlete.sport
+                "firstName": payload['athlete']['first_name'],
+                "lastName": payload['athlete']['last_name'],
+                "sport": payload['athlete']['sport']
             }
         
         return Response({
@@ -122,7 +158,7 @@ def login_view(request):
             "message": "Login successful",
             "data": {
                 "user": {
-                    **UserSerializer(user).data,
+                    **payload,
                     "profile": profile_data
                 },
                 "token": str(refresh.access_token)
@@ -138,15 +174,43 @@ def login_view(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_profile(request):
-    """Get current user profile"""
-    user = request.user
-    serializer = UserSerializer(user)
+    """Get current user profile, cached per user and revalidated with its ETag"""
+    user = full_user(request.user)
     
-    return Response({
+    return conditional_response(request, profile_etag(user), {
         "success": True,
         "data": {
-            "user": serializer.data
+            "user": get_profile_payload(user)
         }
+    })
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout_view(request):
+    """Revoke the presented access token and, when given, its refresh token"""
+    refresh = None
+    if request.data.get('refresh'):
+        try:
+            refresh = ClaimsRefreshToken(request.data['refresh'])
+        except TokenError:
+            return Response({
+                "success": False,
+                "message": "Invalid refresh token"
+            }, status=400)
+        if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+            return Response({
+                "success": False,
+                "message": "Refresh token belongs to another user"
+            }, status=400)
+    
+    with transaction.atomic():
+        revoke_token(request.auth)
+        if refresh is not None:
+            revoke_token(refresh)
+    
+    return Response({
+        "success": True,
+        "message": "Logged out"
     }, status=200)
 
 # Test Management Views
@@ -154,37 +218,69 @@ def get_profile(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_all_tests(request):
-    """Retrieve all available fitness tests"""
-    tests = Test.objects.filter(is_active=True)
-    serializer = TestSerializer(tests, many=True)
+    """Retrieve all available fitness tests from the per-worker catalog cache"""
+    version, tests, _ = get_catalog()
     
-    return Response({
+    return conditional_response(request, catalog_etag(version), {
         "success": True,
         "message": "Tests retrieved successfully",
         "data": {
-            "tests": serializer.data
+            "tests": tests
         }
-    }, status=200)
+    })
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_test_by_id(request, test_id):
     """Get specific test details"""
-    try:
-        test = Test.objects.get(id=test_id, is_active=True)
-        serializer = TestSerializer(test)
-        
+    version, _, tests_by_id = get_catalog()
+    if test_id not in tests_by_id:
         return Response({
-            "success": True,
-            "data": {
-                "test": serializer.data
-            }
-        }, status=200)
+            "success": False,
+            "message": "Test not found"
+        }, status=404)
+    
+    return conditional_response(request, catalog_etag(version, test_id), {
+        "success": True,
+        "data": {
+            "test": tests_by_id[test_id]
+        }
+    })
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_test_distribution(request, test_id):
+    """Get the distribution of verified results for a test, and the percentile of ?value="""
+    try:
+        test = Test.objects.select_related('distribution').get(id=test_id)
     except Test.DoesNotExist:
         return Response({
             "success": False,
             "message": "Test not found"
         }, status=404)
+    
+    value = None
+    if request.GET.get('value'):
+        try:
+            value = float(request.GET['value'])
+        except ValueError:
+            return Response({
+                "success": False,
+                "errors": {"value": ["A number is required"]}
+            }, status=400)
+    
+    try:
+        distribution = test.distribution
+    except TestDistribution.DoesNotExist:
+        distribution = TestDistribution(test=test)
+    
+    return Response({
+        "success": True,
+        "data": {
+            "distribution": describe_distribution(distribution, test, value),
+            "testInfo": test_info(test)
+        }
+    }, status=200)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -217,6 +313,7 @@ def create_test(request):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
+@idempotent('submit_performance')
 def submit_performance(request):
     """Submit performance with media files"""
     if not hasattr(request.user, 'athlete'):
@@ -242,10 +339,201 @@ def submit_performance(request):
         "errors": serializer.errors
     }, status=400)
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_submit_performances(request):
+    """Record a batch of results for many athletes at once (Admin only)"""
+    if not is_admin_user(request.user):
+        return Response({
+            "success": False,
+            "message": "Admin access required"
+        }, status=403)
+    
+    serializer = BulkPerformanceCreateSerializer(data=request.data, context={'request': request})
+    if not serializer.is_valid():
+        return Response({
+            "success": False,
+            "errors": serializer.errors
+        }, status=400)
+    
+    performances, errors = serializer.save()
+    return Response({
+        "success": not errors,
+        "message": f"{len(performances)} performances recorded, {len(errors)} rejected",
+        "data": {
+            "created": [performance.id for performance in performances],
+            "errors": errors
+        }
+    }, status=201 if performances else 400)
+
+# Chunked Upload Views
+
+def open_upload_session(request, session_id):
+    return UploadSession.objects.filter(
+        id=session_id, user=request.user, status='OPEN', expires_at__gt=timezone.now()
+    ).first()
+
+def reopen_upload_session(session):
+    UploadSession.objects.filter(id=session.id, status='ASSEMBLING').update(
+        status='OPEN', updated_at=timezone.now()
+    )
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def initiate_upload(request):
+    """Open a resumable chunked upload for a performance video or image"""
+    serializer = UploadSessionCreateSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        session = serializer.save()
+        return Response({
+            "success": True,
+            "data": {
+                "upload": UploadSessionSerializer(session).data
+            }
+        }, status=201)
+    
+    return Response({
+        "success": False,
+        "errors": serializer.errors
+    }, status=400)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_upload_status(request, session_id):
+    """Get an upload session with the chunks received so far, for resuming"""
+    session = UploadSession.objects.filter(id=session_id, user=request.user).first()
+    if session is None:
+        return Response({
+            "success": False,
+            "message": "Upload session not found"
+        }, status=404)
+    
+    return Response({
+        "success": True,
+        "data": {
+            "upload": UploadSessionSerializer(session).data
+        }
+    })
+
+@api_view(["PUT"])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, session_id, index):
+    """Upload one chunk as the raw request body; resending a chunk replaces it"""
+    session = open_upload_session(request, session_id)
+    if session is None:
+        return Response({
+            "success": False,
+            "message": "Upload session not found or expired"
+        }, status=404)
+    
+    # Read straight from the request stream so the chunk is never buffered in memory
+    try:
+        write_chunk(session, index, request.stream or io.BytesIO())
+    except UploadError as e:
+        return Response({
+            "success": False,
+            "message": str(e)
+        }, status=400)
+    
+    return Response({
+        "success": True,
+        "data": {
+            "index": index
+        }
+    })
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def finalize_upload(request, session_id):
+    """Assemble the uploaded chunks and queue the file for the media uploader"""
+    # Claim the session briefly; the chunks are concatenated outside any transaction
+    with transaction.atomic():
+        session = open_upload_session(request, session_id)
+        if session is None:
+            return Response({
+                "success": False,
+                "message": "Upload session not found or expired"
+            }, status=404)
+        
+        session = UploadSession.objects.select_for_update().get(id=session.id)
+        uploading = Performance.objects.filter(id=session.performance_id, media_status='UPLOADING').exists()
+        if session.status != 'OPEN' or uploading:
+            return Response({
+                "success": False,
+                "message": "Upload cannot be finalized right now"
+            }, status=409)
+        session.status = 'ASSEMBLING'
+        session.save(update_fields=['status', 'updated_at'])
+    
+    try:
+        assembled = assemble_upload(session)
+    except UploadError as e:
+        reopen_upload_session(session)
+        return Response({
+            "success": False,
+            "message": str(e)
+        }, status=400)
+    except Exception:
+        reopen_upload_session(session)
+        raise
+    
+    with transaction.atomic():
+        performance = Performance.objects.select_for_update().filter(id=session.performance_id).first()
+        if performance is None:
+            return Response({
+                "success": False,
+                "message": "Upload session not found or expired"
+            }, status=404)
+        if performance.media_status == 'UPLOADING':
+            # The uploader took the previous file meanwhile; the chunks are kept for a retry
+            reopen_upload_session(session)
+            return Response({
+                "success": False,
+                "message": "Upload cannot be finalized right now"
+            }, status=409)
+        
+        path = stage_assembled(session, assembled)
+        previous = getattr(performance, f'staged_{session.kind}')
+        if previous and previous != path:
+            discard_staged(previous)
+        setattr(performance, f'staged_{session.kind}', path)
+        performance.media_status = 'PENDING'
+        performance.media_staged_on = staging_host()
+        performance.media_attempts = 0
+        performance.media_next_attempt_at = None
+        performance.media_error = ''
+        performance.save(update_fields=[
+            f'staged_{session.kind}', 'media_status', 'media_staged_on', 'media_attempts',
+            'media_next_attempt_at', 'media_error', 'updated_at'
+        ])
+        
+        session.status = 'COMPLETE'
+        session.save(update_fields=['status', 'updated_at'])
+    
+    return Response({
+        "success": True,
+        "message": "Upload complete",
+        "data": {
+            "performance": PerformanceSerializer(performance).data
+        }
+    })
+
+# Columns PerformanceSerializer reads; anything else would be loaded once per row
+PERFORMANCE_LIST_FIELDS = [
+    'id', 'test', 'test__name', 'test__unit', 'athlete', 'athlete__first_name', 'athlete__last_name',
+    'value', 'status', 'video', 'image', 'media_status', 'verified_by', 'verified_at',
+    'verification_notes', 'created_at'
+]
+
+# Newest first; walks the (athlete, created_at) index, id breaks timestamp ties
+HISTORY_ORDERING = ['-created_at', '-id']
+HISTORY_DEFAULT_LIMIT = 10
+HISTORY_MAX_LIMIT = 100
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_my_performances(request):
-    """Get athlete's own performances"""
+    """Get athlete's own performances, newest first, one cursor page at a time"""
     if not hasattr(request.user, 'athlete'):
         return Response({
             "success": False,
@@ -255,8 +543,7 @@ def get_my_performances(request):
     # Filter parameters
     test_id = request.GET.get('testId')
     status_filter = request.GET.get('status')
-    page = int(request.GET.get('page', 1))
-    limit = int(request.GET.get('limit', 10))
+    limit = parse_limit(request, HISTORY_DEFAULT_LIMIT, HISTORY_MAX_LIMIT)
     
     performances = Performance.objects.filter(athlete=request.user.athlete)
     
@@ -265,69 +552,318 @@ def get_my_performances(request):
     if status_filter:
         performances = performances.filter(status=status_filter)
     
-    # Pagination
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
+    # Counted for the first page only; later pages would repeat the scan for the same number
+    total = None if request.GET.get('cursor') else performances.count()
+    
+    # Pages continue after the cursor's key, so deep pages cost the same as the first
+    page = performances
+    if request.GET.get('cursor'):
+        try:
+            key = decode_cursor(request.GET['cursor'], len(HISTORY_ORDERING))
+        except InvalidCursor:
+            return Response({
+                "success": False,
+                "message": "Invalid cursor"
+            }, status=400)
+        page = page.filter(keyset_filter(HISTORY_ORDERING, key))
     
-    performances = performances.order_by('-created_at')[start_idx:end_idx]
-    serializer = PerformanceSerializer(performances, many=True)
+    # One row past the page tells whether another page follows
+    rows = list(page.select_related('test', 'athlete').only(
+        *PERFORMANCE_LIST_FIELDS
+    ).order_by(*HISTORY_ORDERING)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].created_at, rows[-1].id])
+    serializer = PerformanceSerializer(rows, many=True)
     
     return Response({
         "success": True,
         "data": {
             "performances": serializer.data,
             "pagination": {
-                "page": page,
                 "limit": limit,
-                "total": Performance.objects.filter(athlete=request.user.athlete).count()
+                "total": total,
+                "nextCursor": next_cursor
             }
         }
     }, status=200)
 
-# Simple leaderboard view
+# Leaderboard views
+
+LEADERBOARD_DEFAULT_LIMIT = 20
+LEADERBOARD_MAX_LIMIT = 100
+AROUND_ME_DEFAULT_LIMIT = 10
+AROUND_ME_MAX_LIMIT = 50
+
+def parse_limit(request, default, maximum):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def parse_leaderboard_filters(request):
+    """Return (applied query parameters, segment filters, errors)"""
+    # Query parameters are named like the segment columns, except ageGroup
+    applied = {name: request.GET[name] for name in (*SEGMENT_FILTERS, 'ageGroup') if request.GET.get(name)}
+    filters = {('age_group' if name == 'ageGroup' else name): value for name, value in applied.items()}
+    
+    errors = {}
+    if filters.get('gender') and filters['gender'] not in dict(Athlete.GENDER_CHOICES):
+        errors['gender'] = ["Invalid gender"]
+    if filters.get('category') and filters['category'] not in dict(Athlete.CATEGORY_CHOICES):
+        errors['category'] = ["Invalid category"]
+    if filters.get('age_group') and filters['age_group'] not in AGE_GROUPS:
+        errors['ageGroup'] = [f"Expected one of {', '.join(AGE_GROUPS)}"]
+    if not is_supported_segment(filters):
+        supported = [
+            '+'.join('ageGroup' if name == 'age_group' else name for name in combination)
+            for combination in SEGMENT_COMBINATIONS if combination
+        ]
+        errors['filters'] = [f"Unsupported combination; use one of {', '.join(supported)}"]
+    return applied, filters, errors
+
+def rank_rows(rows, filters, **previous):
+    """Pair rows with their rank: materialized on the full board, walked within a segment"""
+    if not filters:
+        return [(row['rank'], row) for row in rows]
+    return list(with_segment_ranks(rows, **previous))
+
+def leaderboard_row(rank, entry):
+    return {
+        "rank": rank,
+        "athlete": {
+            "firstName": entry['athlete__first_name'],
+            "lastName": entry['athlete__last_name'],
+            "state": entry['athlete__state'],
+            "district": entry['athlete__district']
+        },
+        "value": entry['best_value'],
+        "createdAt": entry['achieved_at']
+    }
+
+def test_info(test):
+    return {
+        "name": test.name,
+        "unit": test.unit,
+        "scoringDirection": test.scoring_direction
+    }
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_leaderboard(request, test_id):
-    """Get performance rankings"""
+    """Get performance rankings, optionally for a segment of athletes"""
     try:
         test = Test.objects.get(id=test_id)
+    except Test.DoesNotExist:
+        return Response({
+            "success": False,
+            "message": "Test not found"
+        }, status=404)
+    
+    applied, filters, errors = parse_leaderboard_filters(request)
+    if errors:
+        return Response({
+            "success": False,
+            "errors": errors
+        }, status=400)
+    
+    limit = parse_limit(request, LEADERBOARD_DEFAULT_LIMIT, LEADERBOARD_MAX_LIMIT)
+    
+    previous = {}
+    if filters or request.GET.get('cursor'):
+        entries = segment_entries(test, filters)
         
-        # Get verified performances
-        performances = Performance.objects.filter(
-            test=test, status='VERIFIED'
-        ).select_related('athlete').order_by('value')[:20]
-        
-        leaderboard_data = []
-        for rank, perf in enumerate(performances, 1):
-            leaderboard_data.append({
-                "rank": rank,
-                "athlete": {
-                    "firstName": perf.athlete.first_name,
-                    "lastName": perf.athlete.last_name,
-                    "state": perf.athlete.state,
-                    "district": perf.athlete.district
-                },
-                "value": perf.value,
-                "createdAt": perf.created_at
-            })
+        # Deep pages continue after the cursor's key instead of counting skipped rows
+        if request.GET.get('cursor'):
+            try:
+                *key, rank, position = decode_cursor(request.GET['cursor'], len(ENTRY_ORDERING) + 2)
+            except InvalidCursor:
+                return Response({
+                    "success": False,
+                    "message": "Invalid cursor"
+                }, status=400)
+            entries = entries.filter(keyset_filter(ENTRY_ORDERING, key))
+            previous = {'previous_key': key[0], 'previous_rank': rank, 'previous_position': position}
         
+        # One row past the page tells whether another page follows
+        ranked = rank_rows(list(entries.values(*ENTRY_FIELDS)[:limit + 1]), filters, **previous)
+    else:
+        # The first page of the full board is served by the ranking backend
+        ranked = get_ranking_backend().top(test, limit + 1)
+    
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        last_rank, last_row = ranked[-1]
+        last_position = previous.get('previous_position', 0) + len(ranked)
+        next_cursor = encode_cursor([*entry_key(last_row), last_rank, last_position])
+    
+    return Response({
+        "success": True,
+        "data": {
+            "leaderboard": [leaderboard_row(rank, entry) for rank, entry in ranked],
+            "total": len(ranked),
+            "nextCursor": next_cursor,
+            "filters": {**applied, "limit": limit},
+            "testInfo": test_info(test)
+        }
+    }, status=200)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_my_leaderboard_position(request, test_id):
+    """Get the caller's rank and the athletes just above and below them"""
+    if not hasattr(request.user, 'athlete'):
         return Response({
-            "success": True,
-            "data": {
-                "leaderboard": leaderboard_data,
-                "total": len(leaderboard_data),
-                "testInfo": {
-                    "name": test.name,
-                    "unit": test.unit
-                }
-            }
-        }, status=200)
-        
+            "success": False,
+            "message": "Athlete profile required"
+        }, status=400)
+    
+    try:
+        test = Test.objects.get(id=test_id)
     except Test.DoesNotExist:
         return Response({
             "success": False,
             "message": "Test not found"
         }, status=404)
+    
+    applied, filters, errors = parse_leaderboard_filters(request)
+    if errors:
+        return Response({
+            "success": False,
+            "errors": errors
+        }, status=400)
+    
+    limit = parse_limit(request, AROUND_ME_DEFAULT_LIMIT, AROUND_ME_MAX_LIMIT)
+    athlete_id = request.user.athlete.id
+    
+    if filters:
+        window = None
+        entries = segment_entries(test, filters)
+        me = entries.filter(athlete_id=athlete_id).values(*ENTRY_FIELDS).first()
+        if me is not None:
+            above, below = entries_around(entries, me, limit)
+            # Segment ranks are counted once for the top of the window, then walked
+            first = above[0] if above else me
+            first_rank, first_position = rank_in(entries, first)
+            ranked = list(with_segment_ranks(
+                above + [me] + below,
+                previous_key=first['sort_key'],
+                previous_rank=first_rank,
+                previous_position=first_position - 1
+            ))
+            window = ranked[:len(above)], ranked[len(above)], ranked[len(above) + 1:]
+    else:
+        window = get_ranking_backend().around(test, athlete_id, limit)
+    
+    data = {
+        "me": None,
+        "above": [],
+        "below": [],
+        "filters": {**applied, "limit": limit},
+        "testInfo": test_info(test)
+    }
+    if window is not None:
+        above, me, below = window
+        data.update({
+            "me": leaderboard_row(*me),
+            "above": [leaderboard_row(rank, entry) for rank, entry in above],
+            "below": [leaderboard_row(rank, entry) for rank, entry in below]
+        })
+    
+    return Response({
+        "success": True,
+        "data": data
+    }, status=200)
+
+# Statistics Views
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_my_stats(request):
+    """Get athlete's own statistics from the maintained counters"""
+    if not hasattr(request.user, 'athlete'):
+        return Response({
+            "success": False,
+            "message": "Athlete profile required"
+        }, status=400)
+    
+    stats, _ = AthleteStats.objects.get_or_create(athlete=request.user.athlete)
+    
+    return Response({
+        "success": True,
+        "data": {
+            "stats": AthleteStatsSerializer(stats).data
+        }
+    })
+
+# Admin Views
+
+# Newest first, walking the Athlete (created_at, id) index or its sport / state, district variants
+ATHLETE_LIST_ORDERING = ['-created_at', '-id']
+ATHLETE_LIST_FILTERS = ['sport', 'state', 'district']
+ATHLETE_LIST_FIELDS = [
+    'id', 'first_name', 'last_name', 'user', 'user__email', 'sport',
+    'category', 'state', 'district', 'created_at'
+]
+ATHLETE_LIST_DEFAULT_LIMIT = 50
+ATHLETE_LIST_MAX_LIMIT = 500
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_athletes(request):
+    """List athletes with their verified performance counts (Admin only)"""
+    if not is_admin_user(request.user):
+        return Response({
+            "success": False,
+            "message": "Admin access required"
+        }, status=403)
+    
+    filters = {name: request.GET[name] for name in ATHLETE_LIST_FILTERS if request.GET.get(name)}
+    if filters.get('sport') and filters['sport'] not in dict(Athlete.SPORT_CHOICES):
+        return Response({
+            "success": False,
+            "errors": {"sport": ["Invalid sport"]}
+        }, status=400)
+    limit = parse_limit(request, ATHLETE_LIST_DEFAULT_LIMIT, ATHLETE_LIST_MAX_LIMIT)
+    
+    athletes = Athlete.objects.filter(**filters)
+    if request.GET.get('cursor'):
+        try:
+            key = decode_cursor(request.GET['cursor'], len(ATHLETE_LIST_ORDERING))
+        except InvalidCursor:
+            return Response({
+                "success": False,
+                "message": "Invalid cursor"
+            }, status=400)
+        athletes = athletes.filter(keyset_filter(ATHLETE_LIST_ORDERING, key))
+    
+    # Email and verified count come from the same query as the athletes. The count is a
+    # correlated subquery: a join with GROUP BY would aggregate every athlete before the LIMIT
+    verified_count = Performance.objects.filter(
+        athlete=OuterRef('pk'), status='VERIFIED'
+    ).order_by().values('athlete').annotate(count=Count('pk')).values('count')
+    rows = list(athletes.select_related('user').only(*ATHLETE_LIST_FIELDS).annotate(
+        verified_performance_count=Coalesce(Subquery(verified_count), 0)
+    ).order_by(*ATHLETE_LIST_ORDERING)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].created_at, rows[-1].id])
+    
+    return Response({
+        "success": True,
+        "data": {
+            "athletes": AthleteListSerializer(rows, many=True).data,
+            "pagination": {
+                "limit": limit,
+                "nextCursor": next_cursor
+            },
+            "filters": filters
+        }
+    }, status=200)
 
 # Password Reset Views
 
@@ -341,17 +877,15 @@ def forgot_password(request):
         user = User.objects.get(email=email)
         
         # Generate reset token
-        reset_token = generate_token()
-        user.password_reset_token = reset_token
-        user.password_reset_expires = timezone.now() + timedelta(hours=1)
-        user.save()
+        reset_token = issue_token(user, PASSWORD_RESET)
         
         # Send reset email
         reset_url = f"http://localhost:3000/reset-password?token={reset_token}"
         send_email_notification(
             to_email=email,
             subject="SAI Fitness - Password Reset",
-            message=f"Click here to reset your password: {reset_url} (Valid for 1 hour)"
+            message=f"Click here to reset your password: {reset_url} "
+                    f"(Valid for {settings.PASSWORD_RESET_TOKEN_TTL_HOURS} hour(s))"
         )
         
         return Response({
@@ -373,11 +907,18 @@ def reset_password(request):
         token = serializer.validated_data['token']
         new_password = serializer.validated_data['new_password']
         
-        user = User.objects.get(password_reset_token=token)
-        user.set_password(new_password)
-        user.password_reset_token = None
-        user.password_reset_expires = None
-        user.save()
+        # The token is consumed only if the new password is saved
+        with transaction.atomic():
+            user_id = redeem_token(token, PASSWORD_RESET)
+            if user_id is None:
+                return Response({
+                    "success": False,
+                    "errors": {"token": ["Invalid or expired reset token"]}
+                }, status=400)
+            
+            user = User.objects.get(pk=user_id)
+            user.set_password(new_password)
+            user.save()
         
         return Response({
             "success": True,
@@ -391,22 +932,25 @@ def reset_password(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
-def reset_password(request):
-    """Reset password with token"""
-    serializer = ResetPasswordSerializer(data=request.data)
+def verify_email(request):
+    """Confirm the user's email address with the token from the welcome email"""
+    serializer = VerifyEmailSerializer(data=request.data)
     if serializer.is_valid():
-        token = serializer.validated_data['token']
-        new_password = serializer.validated_data['new_password']
-        
-        user = User.objects.get(password_reset_token=token)
-        user.set_password(new_password)
-        user.password_reset_token = None
-        user.password_reset_expires = None
-        user.save()
+        with transaction.atomic():
+            user_id = redeem_token(serializer.validated_data['token'], EMAIL_VERIFICATION)
+            if user_id is None:
+                return Response({
+                    "success": False,
+                    "errors": {"token": ["Invalid or expired verification token"]}
+                }, status=400)
+            
+            user = User.objects.get(pk=user_id)
+            user.is_email_verified = True
+            user.save(update_fields=['is_email_verified', 'updated_at'])
         
         return Response({
             "success": True,
-            "message": "Password reset successful"
+            "message": "Email verified successfully"
         }, status=200)
     
     return Response({
@@ -11,4 +11,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --noinput
 
 # Run database migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Build percentile distributions that are missing or stale
+python manage.py rebuild_distributions --stale
\ No newline at end of file
@@ -7,5 +7,8 @@ python manage.py collectstatic --noinput
 # Run database migrations
 python manage.py migrate --noinput
 
+# Start the media uploader in this container: it reads the files gunicorn stages on local disk
+(while true; do python manage.py run_media_uploader; sleep 5; done) &
+
 # Start Gunicorn server
 exec gunicorn --bind=0.0.0.0:$PORT --workers=4 --timeout=600 --access-logfile=- --error-logfile=- Aaarohan_Backend.wsgi:application
\ No newline at end of file